@@ -55,8 +55,24 @@ export const registerUser = async (username, password) => {
   return response.json();
 };
 
+// List endpoints are cursor-paginated and return { next, previous, results }.
+// getPage() loads the page behind a `next` link; getAllPages() follows them all.
+export const getPage = (url) => api.get(url);
+export const getAllPages = async (request) => {
+  let response = await request;
+  const items = [...response.data.results];
+  while (response.data.next) {
+    response = await getPage(response.data.next);
+    items.push(...response.data.results);
+  }
+  return items;
+};
+
 // Study Materials using axios instance
-export const getStudyMaterials = () => api.get('/materials/',{
+// List rows leave out extracted_text; pass { expand: 'extracted_text' } or
+// use getStudyMaterial() to get it
+export const getStudyMaterials = (params = {}) => api.get('/materials/',{
+  params,
   headers: {
     'Content-Type': 'application/json',
     'Authorization': `Bearer ${localStorage.getItem('token')}`,
@@ -68,10 +84,19 @@ export const uploadStudyMaterial = (formData) => api.post('/materials/', formDat
     
   },
 });
+export const getStudyMaterial = (id) => api.get(`/materials/${id}/`);
+// Ask a question about a material; answered from the most relevant parts of
+// it. Response: { answer, sources: [{ chunk, start, end, score }] }
+export const askMaterial = (id, question) => api.post(`/materials/${id}/ask/`, { question });
+export const uploadMaterialRevision = (id, formData) => api.post(`/materials/${id}/revisions/`, formData, {
+  headers: {
+    'Content-Type': 'multipart/form-data',
+  },
+});
 export const deleteStudyMaterial = (id) => api.delete(`/materials/${id}/`);
 
 // Generated Content using axios instance
-export const getGeneratedContent = () => api.get('/content/');
+export const getGeneratedContent = (params = {}) => api.get('/content/', { params });
 
 // Quizzes using axios instance
 export const getQuizzes = () => api.get('/quizzes/');
@@ -80,17 +105,26 @@ export const createQuiz = (data) => api.post('/quizzes/', data);
 // Dashboard using axios instance
 export const getDashboardStats = () => api.get('/dashboard/stats/');
 export const getRecentActivity = () => api.get('/dashboard/activity/');
+// Paginated feed; pass the previous page's `next` URL to load the following page
+export const getActivityFeed = (next = null) => api.get(next || '/activity/');
+// Full-text search over materials and generated notes/summaries, best matches
+// first. params: { type: 'material' | 'content', page, page_size }. Titles and
+// snippets are escaped HTML with the matched words in <mark>.
+export const search = (q, params = {}) => api.get('/search/', { params: { q, ...params } });
 
 export const generateContent = (data) => api.post('/generate-content/', data);
+// Generate several content types at once: { material_id, content_types: ['summary', 'notes', ...] }
+export const generateAllContent = (data) => api.post('/generate-content/batch/', data);
 export const getQuizDetails = (id) => api.get(`/quizzes/${id}/`);
 // export const submitQuizResults = (data) => api.post('/quiz-results/', data);
 
+// Answers are graded by the server; the response has the score and the
+// graded answers, each with the correct answer
 export const submitQuizResults = (data) => api.post('/quiz-results/', {
     quiz_id: data.quiz_id,  // Explicitly reference the quiz_id
-    score: data.score,
-    total_questions: data.total_questions,
-    answers: data.answers
+    answers: data.answers.map(({ questionId, selected }) => ({ questionId, selected }))
   });
+export const correctQuestionAnswer = (questionId, answer) => api.post(`/questions/${questionId}/answer/`, { answer });
 export const getUserStats = () => api.get('/user-stats/');
 
 export const getQuizHistory = (quizId) => api.get(`/quizzes/${quizId}/history/`);
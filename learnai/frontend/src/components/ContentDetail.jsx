@@ -6,7 +6,6 @@ import {
   BookOpen, 
   FileText, 
   FileQuestion, 
-  Check, 
   X, 
   RefreshCw,
   Loader2,
@@ -289,23 +288,13 @@ export default function ContentDetail() {
                   <div key={index} className="p-4 border border-gray-200 rounded-lg">
                     <h3 className="text-lg font-medium mb-3">{index + 1}. {question.question_text}</h3>
                     <div className="space-y-2">
+                      {/* Answers aren't sent; they are only revealed once the quiz is submitted */}
                       {question.options?.map((option, optIndex) => (
                         <div 
                           key={optIndex}
-                          className={`p-3 border rounded-lg ${
-                            question.answer === option 
-                              ? 'border-green-500 bg-green-50' 
-                              : 'border-gray-200 hover:bg-gray-50'
-                          }`}
+                          className="p-3 border rounded-lg border-gray-200 hover:bg-gray-50"
                         >
-                          <div className="flex items-center">
-                            {question.answer === option ? (
-                              <Check className="w-5 h-5 text-green-500 mr-2" />
-                            ) : (
-                              <div className="w-5 h-5 mr-2"></div>
-                            )}
-                            {option}
-                          </div>
+                          {option}
                         </div>
                       ))}
                     </div>
@@ -2,7 +2,7 @@ import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import { FileText, BookOpen, FileQuestion, Sparkles, Loader2, Eye, XCircle } from "lucide-react";
 import Layout from "./Layout";
-import { getStudyMaterials, generateContent as generateContentApi } from "../api/api.jsx";
+import { getStudyMaterials, getAllPages, generateContent as generateContentApi } from "../api/api.jsx";
 import api from "../api/api.jsx";
 
 export default function GeneratedContent() {
@@ -17,8 +17,7 @@ export default function GeneratedContent() {
   useEffect(() => {
     const fetchMaterials = async () => {
       try {
-        const response = await getStudyMaterials();
-        setMaterials(response.data);
+        setMaterials(await getAllPages(getStudyMaterials({ fields: 'id,title,file_type,uploaded_at' })));
       } catch (error) {
         console.error("Error fetching materials:", error);
         setError("Failed to load materials");
@@ -2,7 +2,7 @@ import { useState, useEffect } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import { FileText, FileX, Loader2, ArrowLeft, Sparkles } from "lucide-react";
 import Layout from "./Layout";
-import { getStudyMaterials } from "../api/api.jsx";
+import { getStudyMaterial } from "../api/api.jsx";
 
 export default function MaterialDetail() {
   const { id } = useParams();
@@ -15,13 +15,8 @@ export default function MaterialDetail() {
   useEffect(() => {
     const fetchMaterial = async () => {
       try {
-        const response = await getStudyMaterials();
-        const foundMaterial = response.data.find(m => m.id === parseInt(id));
-        if (foundMaterial) {
-          setMaterial(foundMaterial);
-        } else {
-          navigate('/materials');
-        }
+        const response = await getStudyMaterial(id);
+        setMaterial(response.data);
       } catch (error) {
         console.error("Error fetching material:", error);
         navigate('/materials');
@@ -2,11 +2,13 @@ import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import { FileUp, FileText, FileInput, FileX, Loader2 } from "lucide-react";
 import Layout from "./Layout";
-import { getStudyMaterials, uploadStudyMaterial, deleteStudyMaterial } from "../api/api.jsx";
+import { getStudyMaterials, getPage, uploadStudyMaterial, deleteStudyMaterial } from "../api/api.jsx";
 
 export default function StudyMaterials() {
   const [materials, setMaterials] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [uploading, setUploading] = useState(false);
   const [file, setFile] = useState(null);
   const [title, setTitle] = useState("");
@@ -16,7 +18,8 @@ export default function StudyMaterials() {
     const fetchMaterials = async () => {
       try {
         const response = await getStudyMaterials();
-        setMaterials(response.data);
+        setMaterials(response.data.results);
+        setNextPage(response.data.next);
       } catch (error) {
         console.error("Error fetching materials:", error);
       } finally {
@@ -27,6 +30,19 @@ export default function StudyMaterials() {
     fetchMaterials();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await getPage(nextPage);
+      setMaterials([...materials, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error("Error fetching materials:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleUpload = async (e) => {
     e.preventDefault();
     if (!file) return;
@@ -174,6 +190,15 @@ export default function StudyMaterials() {
                   </div>
                 </div>
               ))}
+              {nextPage && (
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="w-full py-2 text-sm text-indigo-700 bg-indigo-50 rounded-lg hover:bg-indigo-100 disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              )}
             </div>
           )}
         </div>
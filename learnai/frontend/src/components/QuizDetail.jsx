@@ -168,7 +168,7 @@ function QuizResultsView({
                 </p>
                 {!answer?.correct && (
                   <p className="text-sm">
-                    <span className="font-medium">Correct answer:</span> {question.answer}
+                    <span className="font-medium">Correct answer:</span> {answer?.answer}
                   </p>
                 )}
               </div>
@@ -226,18 +226,12 @@ export default function QuizDetail() {
   }, [id, navigate, location.state]);
 
   const handleNextQuestion = () => {
-    const isCorrect = selectedOption === quiz.questions[currentQuestion].answer;
-    const newAnswers = [...answers, {
+    const newAnswers = [...answers.slice(0, currentQuestion), {
       questionId: quiz.questions[currentQuestion].id,
-      selected: selectedOption,
-      correct: isCorrect
+      selected: selectedOption
     }];
     
     setAnswers(newAnswers);
-    
-    if (isCorrect) {
-      setScore(score + 1);
-    }
 
     if (currentQuestion < quiz.questions.length - 1) {
       setCurrentQuestion(currentQuestion + 1);
@@ -250,17 +244,14 @@ export default function QuizDetail() {
   const completeQuiz = async (answerData) => {
     setSubmitting(true);
     try {
-      const finalScore = score + (selectedOption === quiz.questions[currentQuestion].answer ? 1 : 0);
-      
-      await submitQuizResults({
+      const response = await submitQuizResults({
         quiz_id: id,
-        score: finalScore,
-        total_questions: quiz.questions.length,
         answers: answerData
       });
       
       setQuizCompleted(true);
-      setScore(finalScore);
+      setScore(response.data.score);
+      setAnswers(response.data.answers);
       
       // Refresh history after completion
       const historyResponse = await getQuizHistory(id);
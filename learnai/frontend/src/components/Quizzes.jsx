@@ -2,18 +2,21 @@ import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import { FileQuestion, Clock, CheckCircle, XCircle, Loader2 } from "lucide-react";
 import Layout from "./Layout";
-import { getQuizzes } from "../api/api.jsx";
+import { getQuizzes, getPage } from "../api/api.jsx";
 
 export default function Quizzes() {
   const [quizzes, setQuizzes] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
   useEffect(() => {
     const fetchQuizzes = async () => {
       try {
         const response = await getQuizzes();
-        setQuizzes(response.data);
+        setQuizzes(response.data.results);
+        setNextPage(response.data.next);
       } catch (error) {
         console.error("Error fetching quizzes:", error);
       } finally {
@@ -24,6 +27,19 @@ export default function Quizzes() {
     fetchQuizzes();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await getPage(nextPage);
+      setQuizzes([...quizzes, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error("Error fetching quizzes:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleQuizClick = (quiz) => {
     if (quiz.is_completed) {
       // Navigate directly to results view for completed quizzes
@@ -130,6 +146,15 @@ export default function Quizzes() {
             ))
           )}
         </div>
+        {nextPage && (
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="mt-6 w-full py-2 text-sm text-indigo-700 bg-indigo-50 rounded-lg hover:bg-indigo-100 disabled:opacity-50"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        )}
       </div>
     </Layout>
   );
@@ -88,13 +88,47 @@ WSGI_APPLICATION = 'learnai.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite in WAL mode, so reads aren't blocked by a transaction writing.
+# Write transactions take the lock when they begin (BEGIN IMMEDIATE) and
+# wait up to 'timeout' seconds for it. Reads go through the read-only
+# 'replica' connection to the same file (see learnai_app/routers.py).
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA temp_store=MEMORY'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_INIT_COMMAND,
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': SQLITE_INIT_COMMAND + ';PRAGMA query_only=1',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['learnai_app.routers.ReadReplicaRouter']
+
+# Writes that still find the database locked after the timeout are retried
+# this many times (see learnai_app/db.py)
+DB_LOCK_RETRIES = 3
+DB_LOCK_RETRY_BASE_DELAY = 0.5  # seconds, doubled on every retry
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -161,4 +195,117 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 
-GEMINI_API_KEY ='AIzgitBM0'
\ No newline at end of file
+GEMINI_API_KEY ='AIzgitBM0'
+
+
+# Background text extraction (see learnai_app/jobs.py)
+# Run the workers with: python manage.py run_extraction_worker
+EXTRACTION_WORKERS = None  # None = one worker thread per CPU
+EXTRACTION_POLL_INTERVAL = 2.0  # seconds
+EXTRACTION_JOB_MAX_ATTEMPTS = 5
+EXTRACTION_RETRY_BASE_DELAY = 10  # seconds, doubled on every failed attempt
+EXTRACTION_RETRY_MAX_DELAY = 600  # seconds
+EXTRACTION_JOB_TIMEOUT = 900  # seconds before a running job is considered abandoned
+EXTRACTION_STALE_SWEEP_INTERVAL = 60  # seconds between checks for abandoned jobs
+
+# PDF pages are extracted in a process pool (see learnai_app/extraction.py)
+PDF_EXTRACTION_WORKERS = None  # None = one process per CPU
+PDF_PAGES_PER_TASK = 8
+PDF_PARALLEL_MIN_PAGES = 16  # smaller documents are extracted in-process
+
+# Extracted text is streamed through a spooled temp file that stays in memory
+# up to EXTRACTION_SPOOL_MAX_MEMORY bytes. Anything past the page/byte caps
+# is dropped and the material is flagged with text_truncated.
+EXTRACTION_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+EXTRACTION_MAX_PAGES = 2000
+EXTRACTION_MAX_BYTES = 20 * 1024 * 1024
+
+# Uploads are hashed while they stream in and stored once per distinct file
+# (see learnai_app/blobs.py)
+FILE_UPLOAD_HANDLERS = [
+    'learnai_app.uploadhandlers.HashingMemoryFileUploadHandler',
+    'learnai_app.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+# Generated content types that identical uploads may share between users
+SHARED_CONTENT_TYPES = ['summary', 'notes']
+
+# Cache of Gemini responses (see learnai_app/llm_cache.py)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_MEMORY_ENTRIES = 256  # per process
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024  # database tier
+LLM_CACHE_EVICT_EVERY_BYTES = 4 * 1024 * 1024  # written per process between size checks
+
+# Materials longer than this many (estimated) tokens are generated in chunks
+# that run concurrently and are merged (see ai_service.generate_chunked)
+AI_CHUNK_TOKEN_BUDGET = 12000
+AI_MAP_CONCURRENCY = 4
+# Materials that would need more chunks than this are compressed to their
+# most central sentences first (see learnai_app/budget.py)
+AI_MAX_CHUNKS = 40
+
+# Most AI generations allowed in flight per process; further requests get a
+# 429 with Retry-After. The async endpoint (generate-content/async/) needs an
+# ASGI server, e.g. daphne learnai.asgi:application
+AI_MAX_CONCURRENT_GENERATIONS = 200
+AI_RETRY_AFTER_SECONDS = 5
+
+# Gemini API gateway (see learnai_app/gateway.py)
+GEMINI_TIMEOUT = 60  # seconds per call
+GEMINI_MAX_RETRIES = 3
+GEMINI_RETRY_BASE_DELAY = 1.0  # seconds, doubled on every retry
+GEMINI_REQUESTS_PER_MINUTE = 60  # keep in line with the API quota
+GEMINI_BURST = 10
+GEMINI_BREAKER_THRESHOLD = 5  # consecutive failures before failing fast
+GEMINI_BREAKER_RESET = 30  # seconds before a trial call is let through
+
+# Bulk upload (materials/bulk/): files per request, after expanding ZIPs
+BULK_UPLOAD_MAX_FILES = 200
+BULK_UPLOAD_MAX_FILE_SIZE = 100 * 1024 * 1024  # per file, including ZIP members
+BULK_UPLOAD_MAX_TOTAL_SIZE = 1024 * 1024 * 1024  # all ZIP members of an upload, unzipped
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# Dashboard counters are cached per user and dropped whenever they change.
+# The default cache is per process; with several server processes point
+# CACHES at a shared backend (e.g. Redis) so every process sees the drop.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+STATS_CACHE_TIMEOUT = 300  # seconds
+ANSWER_KEY_CACHE_TIMEOUT = 3600  # seconds; see learnai_app/grading.py
+
+# Extracted text and generated content are stored compressed, see
+# learnai_app/compression.py. 'zstd' needs the zstandard package and can use
+# a dictionary made with the train_compression_dictionary command.
+TEXT_COMPRESSION = 'zlib'
+TEXT_COMPRESSION_LEVEL = None  # None = the codec's default
+TEXT_COMPRESSION_DICTIONARY = None  # path to a trained zstd dictionary
+TEXT_COMPRESSION_MIN_BYTES = 256  # shorter values are stored uncompressed
+
+# Full-text search (see learnai_app/search.py)
+SEARCH_BACKEND = 'learnai_app.search.FTS5SearchBackend'
+SEARCH_MAX_TERMS = 16  # words of a query past this are ignored
+
+# Retrieval over material chunks (see learnai_app/retrieval.py). Quizzes and
+# flashcards of materials longer than RETRIEVAL_PROMPT_TOKENS are generated
+# from the most central chunks instead of the whole text.
+RETRIEVAL_VECTORIZER = 'learnai_app.retrieval.HashingVectorizer'
+RETRIEVAL_DIMENSIONS = 2048
+RETRIEVAL_CHUNK_TOKENS = 256
+RETRIEVAL_CONTENT_TYPES = ['quiz', 'flashcards']
+RETRIEVAL_PROMPT_TOKENS = 6000
+RETRIEVAL_ASK_TOKENS = 3000  # excerpts sent with a question about a material
+RETRIEVAL_CANDIDATES = 64  # chunks considered when filling a prompt
+RETRIEVAL_MMR_LAMBDA = 0.7  # 1 = relevance only, 0 = diversity only
+
+# Token estimates and prompt budgets per model (see learnai_app/tokens.py).
+# No prompt sent to a model is longer than its max_input_tokens.
+AI_MODEL_BUDGETS = {
+    'gemini-1.5-flash': {'chars_per_token': 4.0, 'max_input_tokens': 48000},
+}
+
+# Text extractors per file type, tried in order until one can read a file
+# (see learnai_app/extractors.py). Entries here replace the defaults for
+# their file type, e.g. {'docx': ['learnai_app.extractors.extract_textract']}.
+TEXT_EXTRACTORS = {}
@@ -0,0 +1,51 @@
+"""
+Recording user activity for the feed (see ActivityEvent).
+
+Events are written from the model signals in signals.py, and explicitly by
+code that creates rows with bulk_create(). The feed text is built here once,
+when the event happens.
+"""
+from .models import ActivityEvent
+
+ACTION_MAX_LENGTH = ActivityEvent._meta.get_field('action').max_length
+
+
+def _event(user_id, kind, object_id, action, created_at):
+    return ActivityEvent(
+        user_id=user_id,
+        kind=kind,
+        object_id=object_id,
+        action=action[:ACTION_MAX_LENGTH],
+        created_at=created_at,
+    )
+
+
+def material_event(material):
+    return _event(material.user_id, ActivityEvent.MATERIAL, material.id,
+                  f"Uploaded {material.title}", material.uploaded_at)
+
+
+def content_event(content):
+    return _event(content.user_id, ActivityEvent.CONTENT, content.id,
+                  f"Generated {content.get_content_type_display()} for {content.material.title}",
+                  content.created_at)
+
+
+def quiz_event(quiz):
+    action = f"Generated Quiz for {quiz.material.title}" if quiz.material_id else f"Generated {quiz.title}"
+    return _event(quiz.user_id, ActivityEvent.QUIZ, quiz.id, action, quiz.created_at)
+
+
+def result_event(result):
+    return _event(result.user_id, ActivityEvent.RESULT, result.id,
+                  f"Completed {result.quiz.title} ({result.score}/{result.total_questions})",
+                  result.completed_at)
+
+
+def record(event):
+    event.save()
+    return event
+
+
+def record_many(events):
+    return ActivityEvent.objects.bulk_create(events)
@@ -1,9 +1,16 @@
-import google.generativeai as genai
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import connections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import hashlib
 import json
 import logging
 import re
 
+from . import budget, llm_cache
+from .gateway import GatewayError, get_gateway
+
 # Set up basic logging
 logging.basicConfig(level=logging.ERROR)  # Configure logging to handle errors
 
@@ -19,47 +26,22 @@ def extract_json_from_text(text):
         return match.group(1)
     return text  # fallback
 
-def generate_content(material_text, content_type):
-    """
-    Generate different types of content using Gemini AI.
-
-    Args:
-        material_text (str): The input study material.
-        content_type (str): The type of content to generate ('summary', 'notes', 'flashcards', 'quiz').
-
-    Returns:
-        dict: A dictionary containing the generated content and its type, or None on error.
-              - 'content': The generated content (str, list, or dict).
-              - 'type': The content type (str).
-    """
-    # Initialize the Gemini client
-    try:
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-    except Exception as e:
-        logging.error(f"Error configuring Gemini API: {e}")
-        return None  # Important: Return None on error
+# Prompt templates, keyed by content type. Each template's text is part of
+# the response cache key, so editing a prompt invalidates its cached
+# responses automatically. Bump PROMPT_VERSION when the way responses are
+# parsed changes without the prompt text changing.
+PROMPT_VERSION = 1
 
-    model_name = 'gemini-1.5-flash'  # Use the recommended model
-    model = genai.GenerativeModel(model_name)
-
-    try:
-        if content_type == 'summary':
-            prompt = f"""
+PROMPT_TEMPLATES = {
+    'summary': """
                 Please generate a concise and well-structured summary of the following study material.
                 The summary should capture all key concepts, main ideas, and important details.
                 Use clear headings and bullet points for better readability.
 
                 Study Material:
                 {material_text}
-                """
-            response = model.generate_content(prompt)
-            return {
-                'content': response.text,
-                'type': 'summary'
-            }
-
-        elif content_type == 'notes':
-            prompt = f"""
+                """,
+    'notes': """
                 Transform this study material into comprehensive study notes.
                 Organize the content with clear headings, subheadings, and bullet points.
                 Include definitions of key terms, important concepts, and relevant examples.
@@ -67,15 +49,8 @@ def generate_content(material_text, content_type):
 
                 Study Material:
                 {material_text}
-                """
-            response = model.generate_content(prompt)
-            return {
-                'content': response.text,
-                'type': 'notes'
-            }
-
-        elif content_type == 'flashcards':
-            prompt = f"""
+                """,
+    'flashcards': """
                 Create a set of flashcards (10-15 cards) from this study material.
                 For each flashcard, provide a clear question or term on the front,
                 and a concise, accurate answer or definition on the back.
@@ -83,25 +58,8 @@ def generate_content(material_text, content_type):
 
                 Study Material:
                 {material_text}
-                """
-            response = model.generate_content(prompt)
-            try:
-                json_text = extract_json_from_text(response.text)
-                flashcards = json.loads(json_text)
-                return {
-                    'content': flashcards,
-                    'type': 'flashcards'
-                }
-            except json.JSONDecodeError:
-                error_message = "Could not parse flashcards JSON.  Check the Gemini output."
-                logging.error(error_message)
-                return {
-                    'content': [{'front': 'Parsing Error', 'back': error_message}],
-                    'type': 'flashcards'
-                }
-
-        elif content_type == 'quiz':
-            prompt = f"""
+                """,
+    'quiz': """
         Generate a 10-question quiz based EXCLUSIVELY on the following study material.
         Questions should directly test understanding of the key concepts in the material.
         Include multiple choice questions with 4 options each.
@@ -118,30 +76,430 @@ def generate_content(material_text, content_type):
         
         Study Material:
         {material_text}
-        """
-            response = model.generate_content(prompt)
-            try:
-                json_text = extract_json_from_text(response.text)
-                quiz = json.loads(json_text)
-                return {
-                    'content': quiz,
-                    'type': 'quiz'
-                }
-            except json.JSONDecodeError:
-                error_message = "Could not parse quiz JSON. Check the Gemini output."
-                logging.error(error_message)
-                return {
-                    'content': [{
-                        'question_text': 'Parsing Error',
-                        'options': ['Error', 'Error', 'Error', 'Error'],
-                        'answer': 'Error'
-                    }],
-                    'type': 'quiz'
-                }
-        else:
-            logging.error(f"Invalid content type: {content_type}")
-            return None  # Handle invalid content types
+        """,
+    # Reduce step of map-reduce generation: merges the summaries of the
+    # chunks of a long material
+    'summary_reduce': """
+                The following are summaries of consecutive parts of one study material.
+                Combine them into a single concise and well-structured summary of the whole material.
+                Keep all key concepts, main ideas, and important details, and remove repetition.
+                Use clear headings and bullet points for better readability.
+
+                Partial Summaries:
+                {material_text}
+                """,
+    # Questions about a material, answered from excerpts of it (see
+    # retrieval.py)
+    'ask': """
+                Answer the question below using only the following excerpts from a study material.
+                If the excerpts don't contain the answer, say so instead of guessing.
+                Keep the answer short and clear.
+
+                Excerpts:
+                {material_text}
+
+                Question:
+                {question}
+                """,
+}
+
+CONTENT_TYPES = ['summary', 'notes', 'flashcards', 'quiz']
+
+# Upper bounds on what the reduce step keeps when merging chunk results
+MAX_QUIZ_QUESTIONS = 10
+MAX_FLASHCARDS = 30
+
+MODEL_NAME = 'gemini-1.5-flash'  # Use the recommended model
+
+
+def prompt_version(content_type):
+    """
+    Version string of a content type's prompt: PROMPT_VERSION plus a digest
+    of the template text.
+    """
+    template = PROMPT_TEMPLATES[content_type]
+    return f"{PROMPT_VERSION}-{hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]}"
+
 
+def generate_content(material_text, content_type):
+    """
+    Generate different types of content using Gemini AI.
+
+    Materials longer than fits in one prompt (see budget.py) are split into
+    chunks that are generated concurrently and merged (see
+    generate_chunked()). Responses are cached by material text, content
+    type, prompt version and model (see llm_cache.py), so an identical
+    request from any user is answered without calling Gemini.
+
+    Args:
+        material_text (str): The input study material.
+        content_type (str): The type of content to generate ('summary', 'notes', 'flashcards', 'quiz').
+
+    Returns:
+        dict: A dictionary containing the generated content and its type, or None on error.
+              - 'content': The generated content (str, list, or dict).
+              - 'type': The content type (str).
+              - 'input_tokens': Estimated tokens of the prompts (int).
+    """
+    if content_type not in CONTENT_TYPES:
+        logging.error(f"Invalid content type: {content_type}")
+        return None  # Handle invalid content types
+
+    chunks = budget.split(material_text, PROMPT_TEMPLATES[content_type], MODEL_NAME)
+    if len(chunks) > 1:
+        result = generate_chunked(chunks, content_type)
+    else:
+        result = generate_cached(chunks[0], content_type)
+    return _with_input_tokens(result, content_type, chunks)
+
+
+def _with_input_tokens(result, content_type, chunks):
+    """
+    Add the estimated input tokens of the prompts made from the chunks of
+    the material to a result. A cached result counts as if it had been
+    generated, so the figure is comparable across generations.
+    """
+    if result is None:
+        return None
+    tokens = sum(budget.prompt_tokens(PROMPT_TEMPLATES[content_type], chunk, MODEL_NAME) for chunk in chunks)
+    return {**result, 'input_tokens': tokens}
+
+
+def _cache_key(material_text, template_name):
+    return llm_cache.make_key(material_text, template_name, prompt_version(template_name), MODEL_NAME)
+
+
+def _cache_result(key, result, template_name):
+    llm_cache.set(key, result, content_type=template_name, model_name=MODEL_NAME,
+                  prompt_version=prompt_version(template_name))
+
+
+def generate_cached(material_text, template_name):
+    """
+    Generate content from one prompt template, going through the response
+    cache.
+    """
+    key = _cache_key(material_text, template_name)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result, cacheable = _generate_content(material_text, template_name)
+    if result is not None and cacheable:
+        _cache_result(key, result, template_name)
+    return result
+
+
+def stream_content(material_text, content_type):
+    """
+    Generate content like generate_content(), but yield the text as Gemini
+    produces it.
+
+    Yields {'delta': str} items with pieces of the response text, then one
+    {'result': dict or None} item with the same result generate_content()
+    would have returned. For flashcards and quizzes the deltas are the raw
+    JSON text. Cached results and materials long enough to need map-reduce
+    arrive as a single delta.
+    """
+    if content_type not in CONTENT_TYPES:
+        logging.error(f"Invalid content type: {content_type}")
+        yield {'result': None}
+        return
+
+    chunks = budget.split(material_text, PROMPT_TEMPLATES[content_type], MODEL_NAME)
+    material_text = chunks[0]
+    key = _cache_key(material_text, content_type)
+    if len(chunks) > 1:
+        result = generate_chunked(chunks, content_type)
+    else:
+        result = llm_cache.get(key)
+    if result is not None or len(chunks) > 1:
+        if result is not None and isinstance(result['content'], str):
+            yield {'delta': result['content']}
+        yield {'result': _with_input_tokens(result, content_type, chunks)}
+        return
+
+    try:
+        prompt = PROMPT_TEMPLATES[content_type].format(material_text=material_text)
+        parts = []
+        for chunk in get_gateway().generate(prompt, MODEL_NAME, stream=True):
+            if chunk.text:
+                parts.append(chunk.text)
+                yield {'delta': chunk.text}
+    except Exception as e:
+        logging.error(f"Error streaming content: {e}")
+        yield {'result': None}
+        return
+
+    result, cacheable = parse_response("".join(parts), content_type)
+    if cacheable:
+        _cache_result(key, result, content_type)
+    yield {'result': _with_input_tokens(result, content_type, chunks)}
+
+
+def _in_thread(func, *args):
+    # Worker threads get their own database connections, one per alias (the
+    # cache uses the database, and its reads go to the replica); close them
+    # when the task is done instead of leaking them.
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+def generate_chunked(chunks, content_type):
+    """
+    Map-reduce generation for materials too long for one prompt.
+
+    Every chunk is generated concurrently (map) and the results are merged
+    (reduce), so latency follows the slowest chunk rather than the length of
+    the material. Chunk results are cached individually, which means a
+    material that changed in one place only regenerates that chunk.
+    """
+    workers = min(len(chunks), getattr(settings, 'AI_MAP_CONCURRENCY', 4))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(lambda chunk: _in_thread(generate_cached, chunk, content_type), chunks))
+    return reduce_results(content_type, partials)
+
+
+def iter_generate_many(material_text, content_types, texts=None):
+    """
+    Generate several content types for one material concurrently, yielding
+    (content_type, result) pairs as each one finishes. The wall-clock time
+    is that of the slowest generation rather than the sum of all of them.
+    texts maps content types to a text to use instead of material_text.
+    """
+    content_types = list(dict.fromkeys(content_types))
+    if not content_types:
+        return
+    texts = texts or {}
+    with ThreadPoolExecutor(max_workers=len(content_types)) as pool:
+        futures = {
+            pool.submit(_in_thread, generate_content, texts.get(content_type, material_text), content_type): content_type
+            for content_type in content_types
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def generate_many(material_text, content_types):
+    """
+    Generate several content types concurrently. Returns a dict of
+    content_type -> result (None for failed generations).
+    """
+    return dict(iter_generate_many(material_text, content_types))
+
+
+def _normalize(text):
+    return re.sub(r'\W+', ' ', str(text)).strip().lower()
+
+
+def _dedupe_round_robin(item_lists, key_field, limit, placeholder):
+    """
+    Merge per-chunk item lists, dropping duplicates (by normalized
+    key_field) and parsing-error placeholders. Items are taken round-robin
+    across chunks so the result covers the whole material even when it is
+    cut at limit.
+    """
+    seen = set()
+    merged = []
+    iterators = [iter(items) for items in item_lists]
+    while iterators and len(merged) < limit:
+        for iterator in list(iterators):
+            item = next(iterator, None)
+            if item is None:
+                iterators.remove(iterator)
+                continue
+            if not isinstance(item, dict):
+                continue
+            key = _normalize(item.get(key_field, ''))
+            if not key or key == placeholder or key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+            if len(merged) >= limit:
+                break
+    return merged
+
+
+def _merge_partials(content_type, partials):
+    """
+    Merge per-chunk results without calling Gemini. For summaries this is
+    only the input of the reduce call: the partial summaries joined up.
+    """
+    if content_type in ('summary', 'notes'):
+        # Text results are only correct if every part of the material made it
+        if any(partial is None for partial in partials):
+            logging.error(f"Generating {content_type} failed for {partials.count(None)} of {len(partials)} chunks")
+            return None
+        return {
+            'content': "\n\n".join(partial['content'] for partial in partials),
+            'type': content_type
+        }
+
+    item_lists = [
+        partial['content'] for partial in partials
+        if partial is not None and isinstance(partial['content'], list)
+    ]
+    if not item_lists:
+        return None
+    if content_type == 'flashcards':
+        return {
+            'content': _dedupe_round_robin(item_lists, 'front', MAX_FLASHCARDS, 'parsing error'),
+            'type': 'flashcards'
+        }
+    return {
+        'content': _dedupe_round_robin(item_lists, 'question_text', MAX_QUIZ_QUESTIONS, 'parsing error'),
+        'type': 'quiz'
+    }
+
+
+def _as_summary(reduced):
+    if reduced is None:
+        return None
+    return {
+        'content': reduced['content'],
+        'type': 'summary'
+    }
+
+
+def reduce_results(content_type, partials):
+    """
+    Merge the per-chunk results of generate_chunked() into one result.
+    Partial summaries are merged by one more Gemini call.
+    """
+    merged = _merge_partials(content_type, partials)
+    if content_type == 'summary' and merged is not None:
+        return _as_summary(generate_cached(merged['content'], 'summary_reduce'))
+    return merged
+
+
+def answer_question(excerpts, question):
+    """
+    Answer a question about a material from excerpts of it, going through
+    the response cache. Returns {'content': answer text, 'type': 'ask'} or
+    None on error.
+    """
+    key = _cache_key(f"{question}\n\n{excerpts}", 'ask')
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result, cacheable = _generate_content(excerpts, 'ask', question=question)
+    if result is not None and cacheable:
+        _cache_result(key, result, 'ask')
+    return result
+
+
+def _generate_content(material_text, content_type, **fields):
+    """
+    Call Gemini through the gateway. Returns (result, cacheable);
+    placeholder results for responses that could not be parsed are not
+    cacheable. fields fills template placeholders other than material_text.
+    """
+    prompt = PROMPT_TEMPLATES[content_type].format(material_text=material_text, **fields)
+    try:
+        response = get_gateway().generate(prompt, MODEL_NAME)
+        return parse_response(response.text, content_type)
+    except GatewayError as e:
+        logging.warning(f"Gemini API unavailable: {e}")
+        return None, False
     except Exception as e:
         logging.error(f"Error generating content: {e}")
-        return None  # Important: Return None on error
+        return None, False  # Important: Return None on error
+
+
+async def agenerate_content(material_text, content_type):
+    """
+    Async version of generate_content() for ASGI views. Uses the async
+    Gemini client, so a waiting generation holds no thread; chunks of long
+    materials are generated concurrently with asyncio.gather().
+    """
+    if content_type not in CONTENT_TYPES:
+        logging.error(f"Invalid content type: {content_type}")
+        return None  # Handle invalid content types
+
+    chunks = await sync_to_async(budget.split)(material_text, PROMPT_TEMPLATES[content_type], MODEL_NAME)
+    if len(chunks) == 1:
+        return _with_input_tokens(await agenerate_cached(chunks[0], content_type), content_type, chunks)
+
+    partials = await asyncio.gather(*(agenerate_cached(chunk, content_type) for chunk in chunks))
+    merged = _merge_partials(content_type, list(partials))
+    if content_type == 'summary' and merged is not None:
+        merged = _as_summary(await agenerate_cached(merged['content'], 'summary_reduce'))
+    return _with_input_tokens(merged, content_type, chunks)
+
+
+async def agenerate_cached(material_text, template_name):
+    """
+    Async version of generate_cached().
+    """
+    key = _cache_key(material_text, template_name)
+    cached = await sync_to_async(llm_cache.get)(key)
+    if cached is not None:
+        return cached
+
+    result, cacheable = await _agenerate_content(material_text, template_name)
+    if result is not None and cacheable:
+        await sync_to_async(_cache_result)(key, result, template_name)
+    return result
+
+
+async def _agenerate_content(material_text, content_type):
+    prompt = PROMPT_TEMPLATES[content_type].format(material_text=material_text)
+    try:
+        response = await get_gateway().agenerate(prompt, MODEL_NAME)
+        return parse_response(response.text, content_type)
+    except GatewayError as e:
+        logging.warning(f"Gemini API unavailable: {e}")
+        return None, False
+    except Exception as e:
+        logging.error(f"Error generating content: {e}")
+        return None, False  # Important: Return None on error
+
+
+def parse_response(text, content_type):
+    """
+    Turn the text of a Gemini response into a result dict.
+    Returns (result, cacheable).
+    """
+    if content_type == 'flashcards':
+        try:
+            json_text = extract_json_from_text(text)
+            flashcards = json.loads(json_text)
+            return {
+                'content': flashcards,
+                'type': 'flashcards'
+            }, True
+        except json.JSONDecodeError:
+            error_message = "Could not parse flashcards JSON.  Check the Gemini output."
+            logging.error(error_message)
+            return {
+                'content': [{'front': 'Parsing Error', 'back': error_message}],
+                'type': 'flashcards'
+            }, False
+
+    elif content_type == 'quiz':
+        try:
+            json_text = extract_json_from_text(text)
+            quiz = json.loads(json_text)
+            return {
+                'content': quiz,
+                'type': 'quiz'
+            }, True
+        except json.JSONDecodeError:
+            error_message = "Could not parse quiz JSON. Check the Gemini output."
+            logging.error(error_message)
+            return {
+                'content': [{
+                    'question_text': 'Parsing Error',
+                    'options': ['Error', 'Error', 'Error', 'Error'],
+                    'answer': 'Error'
+                }],
+                'type': 'quiz'
+            }, False
+
+    return {
+        'content': text,
+        'type': content_type
+    }, True
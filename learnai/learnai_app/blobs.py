@@ -0,0 +1,120 @@
+"""
+Content-addressed storage for uploaded files.
+
+Every distinct file is stored once as a ContentBlob keyed by its SHA-256.
+StudyMaterial rows for identical uploads point at the same blob, share its
+stored file and reuse its extracted text instead of extracting it again.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import search
+from .models import ContentBlob, GeneratedContent, StudyMaterial
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file):
+    """
+    SHA-256 of a Django File. Uploads that went through the hashing upload
+    handlers already carry it; anything else is hashed chunk by chunk.
+    """
+    digest = getattr(file, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def store_blob(file):
+    """
+    Return the ContentBlob for the contents of an uploaded file, storing
+    the file only if no identical one has been stored before.
+    """
+    digest = hash_file(file)
+    blob = ContentBlob.objects.filter(digest=digest).first()
+    if blob is not None:
+        return blob
+
+    blob = ContentBlob(digest=digest, size=file.size)
+    blob.file.save(file.name, file, save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # Someone stored the same file at the same time; keep theirs
+        blob.file.delete(save=False)
+        blob = ContentBlob.objects.get(digest=digest)
+    return blob
+
+
+def material_fields(blob):
+    """
+    Field values for a new StudyMaterial stored in a blob. The blob's
+    extracted text is reused when it has already been extracted.
+    """
+    fields = {
+        'blob': blob,
+        'content_hash': blob.digest,
+        'file': blob.file.name,
+    }
+    if blob.processed:
+        fields.update(
+            extracted_text=blob.extracted_text,
+            text_truncated=blob.text_truncated,
+            processed=True,
+        )
+    return fields
+
+
+def share_extracted_text(material):
+    """
+    Record a material's freshly extracted text on its blob and hand it to
+    every other material with the same contents that is still waiting.
+    """
+    if not material.blob_id:
+        return
+    fields = {
+        'extracted_text': material.extracted_text,
+        'text_truncated': material.text_truncated,
+        'processed': True,
+    }
+    ContentBlob.objects.filter(pk=material.blob_id).update(**fields)
+    waiting = list(
+        StudyMaterial.objects.filter(blob_id=material.blob_id, processed=False).only('id', 'user_id', 'title')
+    )
+    StudyMaterial.objects.filter(pk__in=[m.pk for m in waiting], processed=False).update(**fields)
+    # update() sends no post_save, so the waiting materials are indexed here
+    for waiting_material in waiting:
+        waiting_material.extracted_text = material.extracted_text
+    search.index_materials(waiting)
+
+
+def shared_generation(material, content_type):
+    """
+    Reuse content generated for an identical upload, so the same lecture
+    uploaded by many students is only sent to Gemini once. Only types in
+    SHARED_CONTENT_TYPES are shared; flashcards and quizzes are generated
+    fresh so every student gets their own set.
+
+    Returns an ai_service-style response dict, or None.
+    """
+    # Quizzes are stored without their answers, so can't be shared anyway
+    if not material.content_hash or content_type == 'quiz' or content_type not in getattr(settings, 'SHARED_CONTENT_TYPES', []):
+        return None
+    shared = GeneratedContent.objects.filter(
+        material__content_hash=material.content_hash,
+        content_type=content_type,
+    ).exclude(material=material).order_by('-updated_at').first()
+    if shared is None:
+        return None
+    return {
+        'content': shared.content,
+        'type': content_type,
+    }
@@ -0,0 +1,72 @@
+"""
+Token budgets for prompts.
+
+Every prompt has to fit its model's max_input_tokens (AI_MODEL_BUDGETS).
+A material is split into chunks that each fit in one prompt, at most
+AI_CHUNK_TOKEN_BUDGET tokens, and long materials are generated map-reduce
+from all of their chunks, so nothing is lost. Only a material that would
+need more than AI_MAX_CHUNKS chunks is shrunk first, with the extractive
+compressor (see extractive.py), so one generation costs a bounded number
+of tokens however large the upload.
+"""
+import logging
+import re
+
+from django.conf import settings
+
+from . import extractive
+from .chunking import BOUNDARY_MIN_FILL, chunk_text
+from .tokens import chars_per_token, estimate_tokens, model_budget
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_RE = re.compile(r'\{\w+\}')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def template_tokens(template, model_name):
+    """
+    Estimated tokens of a prompt template without the material.
+    """
+    return estimate_tokens(PLACEHOLDER_RE.sub('', template), model_name)
+
+
+def prompt_tokens(template, material_text, model_name):
+    """
+    Estimated input tokens of a prompt made from template and material_text.
+    """
+    return template_tokens(template, model_name) + estimate_tokens(material_text, model_name)
+
+
+def chunk_tokens(template, model_name):
+    """
+    Tokens of material that go in one prompt made from template: at most
+    AI_CHUNK_TOKEN_BUDGET, and never more than the model takes.
+    """
+    room = model_budget(model_name)['max_input_tokens'] - template_tokens(template, model_name)
+    return max(min(_setting('AI_CHUNK_TOKEN_BUDGET', 12000), room), 1)
+
+
+def split(material_text, template, model_name):
+    """
+    The chunks of material_text to make prompts from with template, each
+    within chunk_tokens(). Text that fits comes back as a single chunk.
+    """
+    max_tokens = chunk_tokens(template, model_name)
+    chunks = chunk_text(material_text, max_tokens, model_name)
+    max_chunks = _setting('AI_MAX_CHUNKS', 40)
+    if len(chunks) <= max_chunks:
+        return chunks
+
+    # Chunks may end once they are half full (see chunking.pack()), so
+    # compress to what max_chunks of those hold
+    max_chars = int(max_chunks * max_tokens * BOUNDARY_MIN_FILL * chars_per_token(model_name))
+    compressed = extractive.compress(material_text, max_chars)
+    logger.info(
+        f"Compressed material from {estimate_tokens(material_text, model_name)} to "
+        f"{estimate_tokens(compressed, model_name)} tokens for {model_name}"
+    )
+    return chunk_text(compressed, max_tokens, model_name)[:max_chunks]
@@ -0,0 +1,183 @@
+"""
+Bulk upload of study materials.
+
+Many files, or ZIP archives of them, are accepted in one multipart request.
+Every part is streamed to a temporary file by the upload handlers (and hashed
+on the way), ZIP members are streamed out the same way, and each file is then
+moved into the content-addressed blob store. The StudyMaterial rows and their
+extraction jobs are created with one bulk INSERT each; the extraction itself
+is left to the worker pool.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+from . import activity, search, stats
+from .blobs import material_fields, store_blob
+from .jobs import enqueue_extractions
+from .models import ContentBlob, StudyMaterial
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+def _zip_member_file(archive, info, max_size):
+    """
+    Stream a ZIP member into a temporary upload file, hashing it on the way.
+    The size is checked while reading since the ZIP header can't be trusted.
+    """
+    name = os.path.basename(info.filename)
+    upload = TemporaryUploadedFile(
+        name,
+        mimetypes.guess_type(name)[0] or 'application/octet-stream',
+        info.file_size,
+        None,
+    )
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with archive.open(info) as member:
+            for chunk in iter(lambda: member.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge()
+                hasher.update(chunk)
+                upload.write(chunk)
+    except BaseException:
+        upload.close()
+        raise
+    upload.size = size
+    upload.seek(0)
+    upload.content_hash = hasher.hexdigest()
+    return upload
+
+
+def iter_upload_files(uploaded_files):
+    """
+    Yield (name, file, error) for every file in the request, expanding ZIP
+    archives into their members. file is None when error is set.
+
+    At most BULK_UPLOAD_MAX_FILES entries are yielded and at most
+    BULK_UPLOAD_MAX_TOTAL_SIZE bytes are decompressed. Both are checked
+    against the ZIP directory before a member is extracted, and the rest of
+    an archive is skipped once either is reached, so an archive with
+    thousands of members or a ZIP bomb costs no more than the limits.
+    """
+    max_size = _setting('BULK_UPLOAD_MAX_FILE_SIZE', 100 * 1024 * 1024)
+    max_files = _setting('BULK_UPLOAD_MAX_FILES', 200)
+    max_total = _setting('BULK_UPLOAD_MAX_TOTAL_SIZE', 1024 * 1024 * 1024)
+    count = 0
+    total = 0  # bytes decompressed from archives
+    for uploaded in uploaded_files:
+        if count >= max_files:
+            yield uploaded.name, None, f'No more than {max_files} files per upload'
+            continue
+        if not uploaded.name.lower().endswith('.zip'):
+            count += 1
+            yield uploaded.name, uploaded, None
+            continue
+        try:
+            archive = zipfile.ZipFile(uploaded)
+        except zipfile.BadZipFile:
+            yield uploaded.name, None, 'Not a valid ZIP archive'
+            continue
+        with archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+                    continue
+                if count >= max_files:
+                    yield uploaded.name, None, f'No more than {max_files} files per upload; the rest of the archive was skipped'
+                    break
+                count += 1
+                if StudyMaterial.file_type_for(name) is None:
+                    yield info.filename, None, 'Unsupported file type'
+                    continue
+                if info.file_size > max_size:
+                    yield info.filename, None, 'File is too large'
+                    continue
+                if total + info.file_size > max_total:
+                    yield uploaded.name, None, 'Upload is too large once unzipped; the rest of the archive was skipped'
+                    break
+                # The sizes in the ZIP directory can't be trusted, so the
+                # member is also cut off at what is left of the total
+                limit = min(max_size, max_total - total)
+                try:
+                    file = _zip_member_file(archive, info, limit)
+                except FileTooLarge:
+                    total += limit
+                    yield info.filename, None, 'File is too large'
+                    continue
+                except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                    yield info.filename, None, f'Could not read file from archive: {e}'
+                    continue
+                total += file.size
+                yield info.filename, file, None
+
+
+def ingest(user, uploaded_files):
+    """
+    Store every uploaded file and create its StudyMaterial and extraction
+    job. Returns a manifest with one status entry per file, in upload order.
+    """
+    manifest = []
+    materials = []  # (manifest entry, unsaved StudyMaterial)
+
+    for name, file, error in iter_upload_files(uploaded_files):
+        entry = {'name': name, 'status': 'rejected', 'material_id': None, 'job_id': None}
+        manifest.append(entry)
+        if error:
+            entry['error'] = error
+            continue
+        file_type = StudyMaterial.file_type_for(file.name)
+        if file_type is None:
+            entry['error'] = 'Unsupported file type'
+            continue
+
+        try:
+            existed = ContentBlob.objects.filter(digest=getattr(file, 'content_hash', '')).exists()
+            blob = store_blob(file)
+        except Exception as e:
+            logger.error(f"Could not store uploaded file {name}: {e}")
+            entry['error'] = 'Could not store file'
+            continue
+        finally:
+            file.close()
+
+        entry['duplicate'] = existed
+        materials.append((entry, StudyMaterial(
+            user=user,
+            title=os.path.splitext(os.path.basename(name))[0][:255],
+            file_type=file_type,
+            **material_fields(blob),
+        )))
+
+    if materials:
+        created = StudyMaterial.objects.bulk_create([material for _, material in materials])
+        # bulk_create() sends no post_save, so the counter, the activity
+        # feed and the search index are updated here
+        stats.adjust(user.id, materials_count=len(created))
+        activity.record_many([activity.material_event(material) for material in created])
+        search.index_materials(created)
+        jobs = enqueue_extractions(created)
+        for (entry, _), material in zip(materials, created):
+            job = jobs.get(material.id)
+            entry['material_id'] = material.id
+            entry['job_id'] = job.id if job else None
+            entry['status'] = 'processed' if material.processed else ('queued' if job else 'stored')
+
+    return manifest
@@ -0,0 +1,108 @@
+"""
+Splitting extracted text into chunks that fit a token budget.
+
+Text is first cut into sections at heading lines, sections that are still
+too large are cut at paragraph breaks, then at line breaks, and as a last
+resort at a fixed width. The pieces are then packed back together, in
+order, into chunks of at most the budget. Cutting at the same places every
+time keeps chunk boundaries stable across small edits of a document.
+
+Packing picks where chunks end from the pieces themselves: once a chunk is
+half full it ends after the first piece whose hash marks it as a boundary.
+An edit then only changes the chunks around it, and the chunks after it
+line up with the old ones again at the next boundary piece, so their
+cached results are reused (see ai_service.generate_chunked()).
+
+Tokens are estimated with tokens.estimate_tokens(), for the model the
+chunks are for.
+"""
+import re
+import zlib
+
+from .tokens import chars_per_token, estimate_tokens
+
+# Markdown headings, numbered headings ("2.", "3.1 Scope") and short lines
+# in capitals ("INTRODUCTION")
+HEADING_RE = re.compile(
+    r'^(?:#{1,6}\s+\S.*|(?:\d+\.)+\d*\s+[A-Z].{0,80}|[A-Z][A-Z0-9 ,:&\-]{3,80})$',
+    re.MULTILINE,
+)
+
+# About one piece in BOUNDARY_EVERY ends a chunk that is at least
+# BOUNDARY_MIN_FILL of the budget
+BOUNDARY_EVERY = 4
+BOUNDARY_MIN_FILL = 0.5
+
+
+def split_on_headings(text):
+    """
+    Cut text into sections, each starting at a heading line.
+    """
+    starts = [match.start() for match in HEADING_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    return [text[a:b] for a, b in zip(starts, starts[1:]) if text[a:b].strip()]
+
+
+def _split_to_fit(piece, max_tokens, model_name=None):
+    """
+    Cut a piece that is over budget at paragraph breaks, then line breaks,
+    then at a fixed width.
+    """
+    if estimate_tokens(piece, model_name) <= max_tokens:
+        return [piece]
+    for separator in ('\n\n', '\n'):
+        parts = piece.split(separator)
+        # Keep the separator with the text before it
+        parts = [part + separator for part in parts[:-1]] + parts[-1:]
+        parts = [part for part in parts if part]
+        # A piece that only ends with the separator is cut at the next one
+        if len(parts) > 1:
+            pieces = []
+            for part in parts:
+                pieces.extend(_split_to_fit(part, max_tokens, model_name))
+            return pieces
+    width = max(int(max_tokens * chars_per_token(model_name)), 1)
+    return [piece[i:i + width] for i in range(0, len(piece), width)]
+
+
+def is_boundary(piece):
+    return zlib.crc32(piece.encode('utf-8')) % BOUNDARY_EVERY == 0
+
+
+def pack(pieces, max_tokens, model_name=None):
+    """
+    Join consecutive pieces into chunks of at most max_tokens, ending a
+    chunk early at a boundary piece once it is BOUNDARY_MIN_FILL full.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece, model_name)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(''.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+        if current_tokens >= max_tokens * BOUNDARY_MIN_FILL and is_boundary(piece):
+            chunks.append(''.join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(''.join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def chunk_text(text, max_tokens, model_name=None):
+    """
+    Split text into chunks of at most max_tokens of model_name, on heading
+    boundaries where possible. Text that already fits comes back as a
+    single chunk.
+    """
+    if estimate_tokens(text, model_name) <= max_tokens:
+        return [text]
+    pieces = []
+    for section in split_on_headings(text):
+        pieces.extend(_split_to_fit(section, max_tokens, model_name))
+    return pack(pieces, max_tokens, model_name)
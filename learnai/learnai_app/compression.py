@@ -0,0 +1,97 @@
+"""
+Compression of the large text columns (extracted text, generated content).
+
+A stored value is one tag byte followed by the payload:
+
+    0  UTF-8 text, for values too short to be worth compressing
+    1  zlib
+    2  zstd
+    3  zstd with the dictionary in TEXT_COMPRESSION_DICTIONARY
+
+TEXT_COMPRESSION picks the codec used for new values; values already stored
+with another codec can still be read. zstd needs the optional 'zstandard'
+package. A dictionary trained on our own texts (see the
+train_compression_dictionary command) helps most with short texts, which
+don't repeat enough for the compressor to learn from them alone.
+"""
+import functools
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for TEXT_COMPRESSION = 'zstd'
+    zstandard = None
+
+RAW, ZLIB, ZSTD, ZSTD_DICT = b'\x00', b'\x01', b'\x02', b'\x03'
+CODECS = ['zlib', 'zstd']
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImproperlyConfigured("zstd compression needs the 'zstandard' package")
+
+
+@functools.lru_cache(maxsize=None)
+def load_dictionary(path):
+    _require_zstandard()
+    with open(path, 'rb') as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+def _dictionary():
+    path = _setting('TEXT_COMPRESSION_DICTIONARY', None)
+    return load_dictionary(str(path)) if path else None
+
+
+def compress(text, codec=None, level=None, dictionary=None):
+    """
+    Compress text into the tagged format. codec, level and dictionary
+    default to the TEXT_COMPRESSION settings; dictionary=False compresses
+    without one even if a dictionary is configured.
+    """
+    data = text.encode('utf-8')
+    if len(data) < _setting('TEXT_COMPRESSION_MIN_BYTES', 256):
+        return RAW + data
+    codec = codec or _setting('TEXT_COMPRESSION', 'zlib')
+    level = level if level is not None else _setting('TEXT_COMPRESSION_LEVEL', None)
+    if codec == 'zlib':
+        return ZLIB + zlib.compress(data, 6 if level is None else level)
+    if codec == 'zstd':
+        _require_zstandard()
+        if dictionary is None:
+            dictionary = _dictionary()
+        elif dictionary is False:
+            dictionary = None
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level, dict_data=dictionary)
+        return (ZSTD_DICT if dictionary is not None else ZSTD) + compressor.compress(data)
+    raise ImproperlyConfigured(f"Unknown TEXT_COMPRESSION {codec!r}, expected one of {CODECS}")
+
+
+def decompress(value, dictionary=None):
+    """
+    Text back out of a value made by compress().
+    """
+    value = bytes(value)
+    tag, payload = value[:1], value[1:]
+    if tag == RAW:
+        data = payload
+    elif tag == ZLIB:
+        data = zlib.decompress(payload)
+    elif tag in (ZSTD, ZSTD_DICT):
+        _require_zstandard()
+        if tag == ZSTD_DICT and dictionary is None:
+            dictionary = _dictionary()
+            if dictionary is None:
+                raise ImproperlyConfigured("Value was compressed with a dictionary but TEXT_COMPRESSION_DICTIONARY is not set")
+        decompressor = zstandard.ZstdDecompressor(dict_data=dictionary if tag == ZSTD_DICT else None)
+        data = decompressor.decompress(payload)
+    else:
+        raise ValueError(f"Unknown compression tag {tag!r}")
+    return data.decode('utf-8')
@@ -0,0 +1,62 @@
+"""
+Process-wide limit on concurrent AI generations.
+
+Generation endpoints take a slot before calling Gemini and answer 429 with
+a Retry-After header when none is free, instead of queueing requests until
+the process runs out of memory or the API quota runs out.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+class Saturated(Exception):
+    pass
+
+
+class GenerationLimiter:
+    """
+    A non-blocking counting semaphore. It uses a threading lock rather than
+    an asyncio primitive so sync views, async views and streaming responses
+    in the same process share one limit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, count=1):
+        with self._lock:
+            if self.active + count > self.limit:
+                return False
+            self.active += count
+            return True
+
+    def release(self, count=1):
+        with self._lock:
+            self.active = max(self.active - count, 0)
+
+    @contextmanager
+    def slot(self):
+        if not self.try_acquire():
+            raise Saturated()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+limiter = GenerationLimiter(getattr(settings, 'AI_MAX_CONCURRENT_GENERATIONS', 200))
+
+
+def saturated_response():
+    retry_after = getattr(settings, 'AI_RETRY_AFTER_SECONDS', 5)
+    response = JsonResponse(
+        {'error': 'Too many generations in progress. Please try again shortly.'},
+        status=429,
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,58 @@
+"""
+SQLite concurrency support.
+
+The database runs in WAL mode (see DATABASES in settings), so readers never
+wait for a writer, and reads go through a separate read-only connection
+(see routers.py). Writers still take turns: write transactions take the lock
+when they begin and wait up to the busy timeout for it. The write paths that
+compete with long-running writers are wrapped in retry_on_lock(), which runs
+the whole transaction again, after a jittered backoff, if the lock is still
+taken when the timeout runs out.
+"""
+import functools
+import logging
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_locked_error(exc):
+    return isinstance(exc, (OperationalError, sqlite3.OperationalError)) and any(
+        message in str(exc) for message in LOCKED_MESSAGES
+    )
+
+
+def retry_on_lock(func=None, *, attempts=None, base_delay=None, using='default'):
+    """
+    Decorator retrying a function when the database is locked, up to
+    DB_LOCK_RETRIES times. The function has to be safe to run again, which
+    is the case for a function that does all its writes in one transaction.
+
+    Called inside an outer transaction the function runs once: a locked
+    error there aborts the outer transaction, which is the unit to retry.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return func(*args, **kwargs)
+            retries = attempts if attempts is not None else getattr(settings, 'DB_LOCK_RETRIES', 3)
+            delay = base_delay if base_delay is not None else getattr(settings, 'DB_LOCK_RETRY_BASE_DELAY', 0.5)
+            for attempt in range(retries + 1):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if not is_locked_error(e) or attempt == retries:
+                        raise
+                    logger.warning(f"Database locked in {func.__name__} (attempt {attempt + 1}), retrying")
+                    time.sleep(random.uniform(0, delay * (2 ** attempt)))
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
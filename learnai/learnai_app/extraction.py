@@ -0,0 +1,332 @@
+"""
+Text extraction engine.
+
+PDFs are split into page ranges that are extracted in a pool of worker
+processes and put back together in page order. Pages are streamed through
+generators and collected in a spooled temporary file, so no more than the
+EXTRACTION_MAX_BYTES cap of text is ever kept, however large the document
+is. The finished text is read back into memory in one piece to be saved,
+so memory use is bounded by that cap, not constant. Nothing in here
+touches the database, so the functions can run in a child process without
+Django set up; storing the per-page results is done by jobs.py.
+
+Every page also has a fingerprint of what its text is extracted from, so a
+new revision of a document only has to extract the pages that changed.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# page_number is 0-based; text is '' for pages without a text layer and
+# None when extraction failed, in which case error says why. text is also
+# None, with no error, for a page skipped because its fingerprint was known.
+# fingerprint is '' when the page could not be fingerprinted.
+PageResult = namedtuple('PageResult', ['page_number', 'text', 'error', 'fingerprint'], defaults=[''])
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def pdf_page_count(path):
+    with open(path, 'rb') as pdf_file:
+        return len(PdfReader(pdf_file).pages)
+
+
+def _resolved(obj):
+    return obj.get_object() if obj is not None else None
+
+
+def page_fingerprint(page):
+    """
+    SHA-256 of what the text of a PDF page is extracted from: its content
+    stream, the forms it draws and the fonts it uses. Object numbers are
+    left out, so a page keeps its fingerprint when the document around it
+    is edited and saved again.
+    """
+    hasher = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        hasher.update(contents.get_data())
+    hasher.update(str(page.get('/Rotate', 0)).encode('utf-8'))
+    resources = _resolved(page.get('/Resources')) or {}
+    fonts = _resolved(resources.get('/Font')) or {}
+    for name in sorted(fonts):
+        font = _resolved(fonts[name])
+        hasher.update(f"{name}|{font.get('/BaseFont')}".encode('utf-8'))
+        encoding = font.get('/Encoding')
+        if isinstance(encoding, str):
+            hasher.update(encoding.encode('utf-8'))
+        to_unicode = _resolved(font.get('/ToUnicode'))
+        if to_unicode is not None:
+            hasher.update(to_unicode.get_data())
+    xobjects = _resolved(resources.get('/XObject')) or {}
+    for name in sorted(xobjects):
+        xobject = _resolved(xobjects[name])
+        if xobject.get('/Subtype') == '/Form':
+            hasher.update(name.encode('utf-8'))
+            hasher.update(xobject.get_data())
+    return hasher.hexdigest()
+
+
+def pdf_page_fingerprints(path, page_numbers):
+    """
+    The fingerprints of the given pages of a PDF, as {page_number: digest}.
+    Pages that can't be fingerprinted are left out, and are extracted as
+    if they were new.
+    """
+    fingerprints = {}
+    with open(path, 'rb') as pdf_file:
+        pdf_reader = PdfReader(pdf_file)
+        for page_number in page_numbers:
+            try:
+                fingerprints[page_number] = page_fingerprint(pdf_reader.pages[page_number])
+            except Exception as e:
+                logger.warning(f"Could not fingerprint page {page_number + 1} of {path}: {e}")
+    return fingerprints
+
+
+def page_ranges(page_numbers, pages_per_task):
+    """
+    Group sorted page numbers into lists of at most pages_per_task pages.
+    """
+    page_numbers = list(page_numbers)
+    return [
+        page_numbers[i:i + pages_per_task]
+        for i in range(0, len(page_numbers), pages_per_task)
+    ]
+
+
+def iter_page_range(path, page_numbers, known=frozenset()):
+    """
+    Yield a PageResult for each of the given pages of a PDF, with the page's
+    fingerprint. Pages whose fingerprint is in known are not extracted. One
+    bad page is reported in its PageResult instead of failing the whole
+    range.
+    """
+    with open(path, 'rb') as pdf_file:
+        pdf_reader = PdfReader(pdf_file)
+        for page_number in page_numbers:
+            fingerprint = ''
+            try:
+                page = pdf_reader.pages[page_number]
+                try:
+                    fingerprint = page_fingerprint(page)
+                except Exception as e:
+                    logger.warning(f"Could not fingerprint page {page_number + 1} of {path}: {e}")
+                if fingerprint and fingerprint in known:
+                    yield PageResult(page_number, None, None, fingerprint)
+                    continue
+                text = page.extract_text() or ''
+                yield PageResult(page_number, text, None, fingerprint)
+            except Exception as e:
+                yield PageResult(page_number, None, f"{type(e).__name__}: {e}", fingerprint)
+
+
+def extract_page_range(path, page_numbers, known=frozenset()):
+    # Runs inside a pool process; results have to be pickled back as a list
+    return list(iter_page_range(path, page_numbers, known))
+
+
+def pool_size():
+    return _setting('PDF_EXTRACTION_WORKERS', None) or os.cpu_count() or 1
+
+
+def get_pool():
+    """
+    The process pool shared by every extraction in this process. It is
+    created on first use and kept for the life of the process so the
+    start-up cost is paid once, not per document.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' because the extraction worker command is multi-threaded
+            # and forking a threaded process can deadlock the child.
+            _pool = ProcessPoolExecutor(
+                max_workers=pool_size(),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def iter_pdf_pages(path, pages=None, parallel=None, known=frozenset()):
+    """
+    Yield the text of a PDF page by page, in page order.
+
+    Args:
+        path (str): Path of the PDF file.
+        pages (iterable): 0-based page numbers to extract; all pages if None.
+        parallel (bool): Force the process pool on or off. By default it is
+            only used for documents with at least PDF_PARALLEL_MIN_PAGES pages,
+            below which the pool overhead costs more than it saves.
+        known (frozenset): Page fingerprints whose text the caller already
+            has; those pages are fingerprinted but not extracted.
+
+    Yields:
+        PageResult: One per page.
+
+    Only a small window of page ranges is in flight at a time, so finished
+    pages never pile up in memory waiting for the consumer.
+    """
+    if pages is None:
+        pages = range(pdf_page_count(path))
+    pages = sorted(pages)
+    if not pages:
+        return
+
+    if parallel is None:
+        parallel = len(pages) >= _setting('PDF_PARALLEL_MIN_PAGES', 16)
+    if not parallel:
+        yield from iter_page_range(path, pages, known)
+        return
+
+    pool = get_pool()
+    ranges = iter(page_ranges(pages, _setting('PDF_PAGES_PER_TASK', 8)))
+    pending = deque(pool.submit(extract_page_range, path, r, known) for r in islice(ranges, pool_size() * 2))
+    try:
+        while pending:
+            range_results = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(pool.submit(extract_page_range, path, next_range, known))
+            yield from range_results
+    finally:
+        # The consumer may stop early (e.g. on hitting a size cap)
+        for future in pending:
+            future.cancel()
+
+
+def extract_pdf_pages(path, pages=None, parallel=None):
+    """
+    Extract the text of a PDF page by page. Returns a list of PageResult
+    tuples in page order; see iter_pdf_pages() for the arguments.
+    """
+    return list(iter_pdf_pages(path, pages=pages, parallel=parallel))
+
+
+def join_pages(page_results):
+    """
+    Join page texts the same way the original extractor did: every page with
+    text followed by a newline.
+    """
+    return "".join(result.text + "\n" for result in page_results if result.text)
+
+
+class TextSpool:
+    """
+    Collects extracted text in a SpooledTemporaryFile: it stays in memory up
+    to EXTRACTION_SPOOL_MAX_MEMORY bytes and rolls over to disk after that.
+    Text beyond EXTRACTION_MAX_BYTES is dropped and the spool is marked as
+    truncated.
+    """
+
+    def __init__(self, max_memory=None, max_bytes=None):
+        self.max_memory = max_memory if max_memory is not None else _setting('EXTRACTION_SPOOL_MAX_MEMORY', 8 * 1024 * 1024)
+        self.max_bytes = max_bytes if max_bytes is not None else _setting('EXTRACTION_MAX_BYTES', 20 * 1024 * 1024)
+        self.file = tempfile.SpooledTemporaryFile(max_size=self.max_memory, mode='w+b')
+        self.size = 0
+        self.truncated = False
+
+    @property
+    def full(self):
+        return self.truncated or self.size >= self.max_bytes
+
+    def write(self, text):
+        if not text:
+            return
+        if self.full:
+            self.truncated = True
+            return
+        data = text.encode('utf-8')
+        room = self.max_bytes - self.size
+        if len(data) > room:
+            # Cut on a character boundary
+            data = data[:room].decode('utf-8', errors='ignore').encode('utf-8')
+            self.truncated = True
+        self.file.write(data)
+        self.size += len(data)
+
+    def write_pages(self, page_results):
+        """
+        Write page texts the same way join_pages() joins them, stopping as
+        soon as the byte cap is reached.
+        """
+        for result in page_results:
+            if not result.text:
+                continue
+            if self.full:
+                self.truncated = True
+                break
+            self.write(result.text + "\n")
+
+    def getvalue(self):
+        # The whole text, up to max_bytes of it, is read back into memory
+        self.file.seek(0)
+        return self.file.read().decode('utf-8')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def capped_page_numbers(page_count):
+    """
+    The pages of a document that will be extracted: the first
+    EXTRACTION_MAX_PAGES of them.
+    """
+    return range(min(page_count, _setting('EXTRACTION_MAX_PAGES', 2000)))
+
+
+def extract_pdf_text(path):
+    """
+    Extract the whole text of a PDF, within the page and byte caps.
+    Raises if any page failed.
+    """
+    failed = []
+
+    def check(page_results):
+        for result in page_results:
+            if result.error:
+                failed.append(result.page_number)
+            yield result
+
+    page_numbers = capped_page_numbers(pdf_page_count(path))
+    with TextSpool() as spool:
+        spool.write_pages(check(iter_pdf_pages(path, pages=page_numbers)))
+        if failed:
+            raise PageExtractionError(failed)
+        return spool.getvalue()
+
+
+class PageExtractionError(Exception):
+    def __init__(self, page_numbers):
+        self.page_numbers = page_numbers
+        super().__init__(f"Could not extract page(s) {', '.join(str(n + 1) for n in page_numbers)}")
@@ -0,0 +1,147 @@
+"""
+Extractive compression: shrink a text by keeping only its most central
+sentences.
+
+Sentences are ranked with TextRank: PageRank over the graph whose edge
+weights are the cosine similarities of the sentences' TF-IDF vectors (see
+retrieval.HashingVectorizer). The similarity matrix is never built; with V
+the matrix of unit-length sentence vectors, multiplying by it is
+V @ (V.T @ x), so every iteration costs O(non-zero entries of V) and a
+book-length text with tens of thousands of sentences ranks in well under a
+second. V is kept sparse, as arrays of its non-zero entries, so memory
+grows with the number of words rather than sentences x dimensions. The
+best sentences that fit are kept, in their original order.
+"""
+import re
+
+import numpy as np
+
+from .retrieval import HashingVectorizer
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a blank line
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+DAMPING = 0.85
+ITERATIONS = 30
+TOLERANCE = 1e-6
+
+# Sentences are hashed this many at a time, so the Python lists of terms
+# stay small
+VECTORIZE_BATCH = 2000
+
+
+def split_sentences(text):
+    """
+    [start, end] offsets of the sentences of text, each including the
+    whitespace after it.
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_END_RE.finditer(text):
+        if text[start:match.start()].strip():
+            spans.append([start, match.end()])
+        start = match.end()
+    if text[start:].strip():
+        spans.append([start, len(text)])
+    return spans
+
+
+class SparseRows:
+    """
+    A matrix stored as the row, column and value of each non-zero entry.
+    """
+
+    def __init__(self, rows, columns, values, shape):
+        self.rows = rows
+        self.columns = columns
+        self.values = values
+        self.shape = shape
+
+    def dot(self, y):
+        # V @ y
+        return np.bincount(self.rows, weights=self.values * y[self.columns], minlength=self.shape[0])
+
+    def tdot(self, x):
+        # V.T @ x
+        return np.bincount(self.columns, weights=self.values * x[self.rows], minlength=self.shape[1])
+
+
+def sentence_vectors(sentences, vectorizer=None):
+    """
+    Unit-length TF-IDF vectors of the sentences, as SparseRows. Same
+    weighting as HashingVectorizer.fit_transform().
+    """
+    vectorizer = vectorizer or HashingVectorizer()
+    dimensions = vectorizer.dimensions
+    rows, columns, counts = [], [], []
+    for start in range(0, len(sentences), VECTORIZE_BATCH):
+        batch_rows, batch_columns = [], []
+        for row, sentence in enumerate(sentences[start:start + VECTORIZE_BATCH], start):
+            buckets = vectorizer.buckets(sentence)
+            batch_rows.extend([row] * len(buckets))
+            batch_columns.extend(buckets)
+        # One entry per (sentence, dimension), counting repeats
+        keys, batch_counts = np.unique(
+            np.array(batch_rows, dtype=np.int64) * dimensions + np.array(batch_columns, dtype=np.int64),
+            return_counts=True,
+        )
+        rows.append((keys // dimensions).astype(np.int32))
+        columns.append((keys % dimensions).astype(np.int32))
+        counts.append(batch_counts.astype(np.float32))
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int32)
+    values = np.log1p(np.concatenate(counts)) if counts else np.zeros(0, dtype=np.float32)
+
+    document_frequency = np.bincount(columns, minlength=dimensions)
+    weights = (np.log((1 + len(sentences)) / (1 + document_frequency)) + 1).astype(np.float32)
+    values *= weights[columns]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(sentences)))
+    values /= np.maximum(norms[rows], 1e-12).astype(np.float32)
+    return SparseRows(rows, columns, values, (len(sentences), dimensions))
+
+
+def textrank(vectors):
+    """
+    TextRank scores for unit-length sentence vectors (SparseRows, one
+    sentence per row).
+    """
+    n = vectors.shape[0]
+    if n < 3:
+        return np.ones(n)
+
+    def similarity_times(x):
+        # (V @ V.T - I) @ x: a sentence isn't linked to itself
+        return vectors.dot(vectors.tdot(x)) - x
+
+    degree = similarity_times(np.ones(n))
+    degree[degree <= 0] = 1  # sentences sharing no words with any other
+    rank = np.full(n, 1 / n)
+    for _ in range(ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * similarity_times(rank / degree)
+        if np.abs(updated - rank).sum() < TOLERANCE:
+            return updated
+        rank = updated
+    return rank
+
+
+def compress(text, max_chars):
+    """
+    The highest-ranked sentences of text that fit in max_chars, in their
+    original order. Text that already fits comes back unchanged.
+    """
+    if len(text) <= max_chars:
+        return text
+    spans = split_sentences(text)
+    if not spans:
+        return text[:max_chars]
+    sentences = [text[start:end] for start, end in spans]
+    scores = textrank(sentence_vectors(sentences))
+
+    kept, used = [], 0
+    for i in np.argsort(-scores, kind='stable'):
+        length = len(sentences[i])
+        if used + length > max_chars:
+            continue  # a shorter sentence may still fit
+        kept.append(i)
+        used += length
+    return ''.join(sentences[i] for i in sorted(kept))
@@ -0,0 +1,242 @@
+"""
+Text extractors for uploaded files, keyed by file_type.
+
+Every file type has a list of extractors (TEXT_EXTRACTORS, dotted paths)
+that are tried in order until one can read the file. The defaults read
+DOCX, PPTX and plain text in-process and fall back to textract for anything
+they can't read, such as legacy .ppt files, for which textract runs an
+external program.
+
+DOCX and PPTX files are ZIP archives of XML parts. Their text is streamed
+straight out of the parts with lxml's iterparse(), which is several times
+faster than building python-docx or python-pptx object models and keeps
+only the current paragraph in memory. Plain text is decoded as it is read,
+in the encoding guessed from the start of the file; textract would read it
+in the platform encoding and fail on anything else.
+
+An extractor is a generator function taking the path of a file and
+yielding its text in pieces, so a large file never has to be held in
+memory twice and extraction can stop at the EXTRACTION_MAX_BYTES cap (see
+jobs.py). One that can't read a file raises UnsupportedFile, or any other
+error, before yielding anything.
+"""
+import codecs
+import io
+import logging
+import posixpath
+import zipfile
+from functools import lru_cache
+
+import charset_normalizer
+import textract
+from django.conf import settings
+from django.utils.module_loading import import_string
+from lxml import etree
+
+from .extraction import extract_pdf_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACTORS = {
+    'pdf': ['learnai_app.extractors.extract_pdf'],
+    'docx': ['learnai_app.extractors.extract_docx', 'learnai_app.extractors.extract_textract'],
+    'ppt': ['learnai_app.extractors.extract_pptx', 'learnai_app.extractors.extract_textract'],
+    'txt': ['learnai_app.extractors.extract_plain_text', 'learnai_app.extractors.extract_textract'],
+}
+
+WORDPROCESSING = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DRAWING = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+PRESENTATION = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+RELATIONSHIPS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELATIONSHIPS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Plain text is read and decoded this many characters at a time, and the
+# encoding is guessed from this many bytes at the start of the file
+TEXT_READ_SIZE = 64 * 1024
+
+# UTF-32 first: the UTF-32-LE BOM starts with the UTF-16-LE one
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+class UnsupportedFile(Exception):
+    """
+    Raised by an extractor for a file it can't read, so the next extractor
+    for the file type is tried.
+    """
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def extract_pdf(path):
+    yield extract_pdf_text(path)
+
+
+def iter_paragraphs(source, namespace):
+    """
+    Yield the text of every paragraph of an OOXML part, in document order.
+    namespace is that of the part's paragraph (p), run (r) and text (t)
+    elements. A paragraph nested in another, like a text box in a Word
+    paragraph, comes out before the one it is in.
+    """
+    paragraph, run = namespace + 'p', namespace + 'r'
+    text, tab, line_break = namespace + 't', namespace + 'tab', namespace + 'br'
+    parts = []
+    for _, element in etree.iterparse(source, events=('end',), tag=(paragraph, text, tab, line_break)):
+        if element.tag == text:
+            parts.append(element.text or '')
+        elif element.tag == paragraph:
+            yield ''.join(parts)
+            parts = []
+            # Drop what has been read, so memory doesn't grow with the part
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        elif element.getparent().tag in (run, paragraph):
+            # Tab stops in paragraph properties aren't text
+            parts.append('\t' if element.tag == tab else '\n')
+
+
+def _open_package(path, description):
+    if not zipfile.is_zipfile(path):
+        raise UnsupportedFile(f"Not a {description} file")
+    return zipfile.ZipFile(path)
+
+
+def extract_docx(path):
+    """
+    The paragraphs of the body of a Word document, tables included, one per
+    line.
+    """
+    with _open_package(path, '.docx') as package:
+        with package.open('word/document.xml') as part:
+            for text in iter_paragraphs(part, WORDPROCESSING):
+                yield text + '\n'
+
+
+def _part_name(source, target):
+    # Relationship targets are relative to the folder of the source part
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+
+
+def slide_parts(package):
+    """
+    The names of the slide parts of a presentation, in slide order.
+    """
+    with package.open('ppt/_rels/presentation.xml.rels') as part:
+        targets = {
+            relationship.get('Id'): relationship.get('Target')
+            for relationship in etree.parse(part).getroot().iter(PACKAGE_RELATIONSHIPS + 'Relationship')
+        }
+    with package.open('ppt/presentation.xml') as part:
+        slide_ids = etree.parse(part).getroot().iter(PRESENTATION + 'sldId')
+        return [_part_name('ppt/presentation.xml', targets[slide_id.get(RELATIONSHIPS + 'id')]) for slide_id in slide_ids]
+
+
+def extract_pptx(path):
+    """
+    The text of a PowerPoint presentation, slide by slide, with a blank line
+    between slides. Legacy .ppt files aren't ZIP archives and are left to
+    the next extractor.
+    """
+    with _open_package(path, '.pptx') as package:
+        for name in slide_parts(package):
+            with package.open(name) as part:
+                for text in iter_paragraphs(part, DRAWING):
+                    yield text + '\n'
+            yield '\n'
+
+
+def detect_encoding(sample):
+    """
+    The encoding of a text file, guessed from the bytes at its start: a BOM
+    if there is one, else UTF-8 if the bytes are valid UTF-8, else
+    charset_normalizer's best guess.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Incremental, so a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    matches = charset_normalizer.from_bytes(sample)
+    best = matches.best()
+    if best is None:
+        return 'cp1252'
+    # Western text often fits several code pages equally well; of those,
+    # Windows-1252 is the one it was most likely written in. A match lists
+    # the code pages that decode the sample to the same text besides its own.
+    for match in matches:
+        if 'cp1252' in match.could_be_from_charset and (match.chaos, match.coherence) == (best.chaos, best.coherence):
+            return 'cp1252'
+    return best.encoding
+
+
+def extract_plain_text(path):
+    """
+    A text file decoded as it is read, in its own encoding. Line endings
+    are normalized to '\\n' and undecodable bytes become U+FFFD.
+    """
+    with open(path, 'rb') as f:
+        encoding = detect_encoding(f.read(TEXT_READ_SIZE))
+        f.seek(0)
+        with io.TextIOWrapper(f, encoding=encoding, errors='replace') as stream:
+            while True:
+                piece = stream.read(TEXT_READ_SIZE)
+                if not piece:
+                    break
+                yield piece
+
+
+def extract_textract(path):
+    yield textract.process(path).decode('utf-8')
+
+
+@lru_cache(maxsize=None)
+def _load(path):
+    return import_string(path)
+
+
+def extractors_for(file_type):
+    paths = {**DEFAULT_EXTRACTORS, **_setting('TEXT_EXTRACTORS', {})}.get(file_type)
+    if not paths:
+        raise UnsupportedFile(f"No text extractor for {file_type!r} files")
+    return [_load(path) for path in paths]
+
+
+def iter_text(path, file_type):
+    """
+    Yield the text of a file in pieces, from the first of the extractors for
+    its file type that can read it. Raises the last extractor's error if
+    none can.
+    """
+    error = None
+    for extractor in extractors_for(file_type):
+        pieces = extractor(path)
+        try:
+            first = next(pieces, '')
+        except Exception as e:
+            if not isinstance(e, UnsupportedFile):
+                logger.warning(f"{extractor.__name__} could not read {path}: {type(e).__name__}: {e}")
+            error = e
+            continue
+        yield first
+        yield from pieces
+        return
+    raise error
+
+
+def extract_text(path, file_type):
+    return ''.join(iter_text(path, file_type))
@@ -0,0 +1,69 @@
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from . import compression
+
+
+class CompressedValue(bytes):
+    """
+    A value as read from the database, not decompressed yet.
+    """
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    Decompresses the stored value the first time the attribute is read, so
+    rows that are loaded but whose text isn't used never pay for it.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = compression.decompress(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """
+    A TextField stored compressed in a binary column (see compression.py).
+
+    Reads and writes text like a TextField, but the column holds bytes, so
+    it can't be filtered on except for isnull. Rows written before the
+    column was compressed still hold plain text and are read as is.
+    """
+    descriptor_class = CompressedTextDescriptor
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value
+        return CompressedValue(value)
+
+    def to_python(self, value):
+        if isinstance(value, CompressedValue):
+            return compression.decompress(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # A value that was never read is written back as it was loaded
+        if self.attname in model_instance.__dict__:
+            return model_instance.__dict__[self.attname]
+        return super().pre_save(model_instance, add)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        if not isinstance(value, CompressedValue):
+            value = compression.compress(self.to_python(value))
+        return connection.Database.Binary(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
@@ -0,0 +1,248 @@
+"""
+Gateway for all calls to the Gemini API.
+
+One GeminiGateway is created per process (see get_gateway()). It configures
+the client once and reuses its models and connections, applies a timeout to
+every call, retries transient errors with jittered exponential backoff,
+paces requests with a token bucket matching our quota, and trips a circuit
+breaker when the API keeps failing so callers fail fast instead of piling
+up behind a dead upstream.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import google.generativeai as genai
+from django.conf import settings
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: overload, rate limiting and timeouts
+TRANSIENT_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class GatewayError(Exception):
+    pass
+
+
+class CircuitOpen(GatewayError):
+    pass
+
+
+class RateLimited(GatewayError):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() takes a token and returns how long
+    the caller has to wait before using it, which works for both blocking
+    and asyncio callers.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Take a token and return the seconds to wait before using it. If the
+        wait would be longer than max_wait, no token is taken and None is
+        returned, so refused callers don't eat into the quota.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. While open every call is
+    refused; after `reset_timeout` seconds one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpen("Gemini API circuit is open")
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return
+            if self.state == self.HALF_OPEN:
+                # A trial call is already in flight; if it never reported
+                # back, allow another after reset_timeout
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpen("Gemini API circuit is half-open")
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Opening Gemini API circuit after {self.failures} failure(s)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class GeminiGateway:
+    def __init__(self, api_key, timeout=60, max_retries=3, retry_base_delay=1.0,
+                 requests_per_minute=60, burst=10, breaker_threshold=5, breaker_reset=30):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._models = {}
+        self._configured = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            api_key=settings.GEMINI_API_KEY,
+            timeout=getattr(settings, 'GEMINI_TIMEOUT', 60),
+            max_retries=getattr(settings, 'GEMINI_MAX_RETRIES', 3),
+            retry_base_delay=getattr(settings, 'GEMINI_RETRY_BASE_DELAY', 1.0),
+            requests_per_minute=getattr(settings, 'GEMINI_REQUESTS_PER_MINUTE', 60),
+            burst=getattr(settings, 'GEMINI_BURST', 10),
+            breaker_threshold=getattr(settings, 'GEMINI_BREAKER_THRESHOLD', 5),
+            breaker_reset=getattr(settings, 'GEMINI_BREAKER_RESET', 30),
+        )
+
+    def model(self, model_name):
+        """
+        The GenerativeModel for a model name. The client is configured once
+        and models are kept, so their transport and connections are reused.
+        """
+        with self._lock:
+            if not self._configured:
+                genai.configure(api_key=self.api_key)
+                self._configured = True
+            if model_name not in self._models:
+                self._models[model_name] = genai.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform between 0 and the exponential delay
+        return random.uniform(0, self.retry_base_delay * (2 ** attempt))
+
+    def _rate_wait(self):
+        wait = self.bucket.reserve(max_wait=self.timeout)
+        if wait is None:
+            raise RateLimited(f"Gemini request quota exhausted for more than {self.timeout:.0f}s")
+        return wait
+
+    def generate(self, prompt, model_name, stream=False):
+        """
+        Call generate_content() with timeout, rate limiting, retries and the
+        circuit breaker. With stream=True only opening the stream is retried.
+        """
+        model = self.model(model_name)
+        for attempt in range(self.max_retries + 1):
+            # The breaker first, so a refused call doesn't take a token
+            self.breaker.before_call()
+            wait = self._rate_wait()
+            time.sleep(wait)
+            try:
+                response = model.generate_content(
+                    prompt, stream=stream, request_options={'timeout': self.timeout},
+                )
+            except TRANSIENT_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Transient Gemini error (attempt {attempt + 1}): {e}")
+                time.sleep(self._backoff(attempt))
+                continue
+            except google_exceptions.ClientError:
+                # The API answered; the request itself was bad
+                self.breaker.record_success()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return response
+
+    async def agenerate(self, prompt, model_name):
+        """
+        Async version of generate(), using the async Gemini client.
+        """
+        model = self.model(model_name)
+        for attempt in range(self.max_retries + 1):
+            # The breaker first, so a refused call doesn't take a token
+            self.breaker.before_call()
+            wait = self._rate_wait()
+            await asyncio.sleep(wait)
+            try:
+                response = await model.generate_content_async(
+                    prompt, request_options={'timeout': self.timeout},
+                )
+            except TRANSIENT_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Transient Gemini error (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except google_exceptions.ClientError:
+                # The API answered; the request itself was bad
+                self.breaker.record_success()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return response
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = GeminiGateway.from_settings()
+        return _gateway
@@ -0,0 +1,133 @@
+"""
+Server-side grading of quiz submissions.
+
+Each quiz has an answer key, question id -> normalized correct answer, built
+with one query and cached under the quiz's answers_version. Changing a
+question bumps the version in the database, so every process stops reading
+the old key at once, whatever cache backend is configured. A submission is
+graded against the key in a single pass. When an answer is
+corrected, the answers already given to that question are re-graded in bulk
+and the scores of the affected results recomputed.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Question, Quiz, QuizAnswer, QuizResult
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """
+    Answers are compared ignoring case and differences in whitespace.
+    """
+    return WHITESPACE_RE.sub(' ', str(text)).strip().casefold()
+
+
+def _cache_key(quiz):
+    return f'answer-key:{quiz.id}:{quiz.answers_version}'
+
+
+def answer_key(quiz):
+    """
+    The answer key of a quiz: {question_id: normalized answer}.
+    """
+    key = cache.get(_cache_key(quiz))
+    if key is None:
+        key = {
+            question_id: normalize(answer)
+            for question_id, answer in Question.objects.filter(quiz_id=quiz.id).values_list('id', 'answer')
+        }
+        cache.set(_cache_key(quiz), key, getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 3600))
+    return key
+
+
+def invalidate(quiz_id):
+    Quiz.objects.filter(id=quiz_id).update(answers_version=F('answers_version') + 1)
+
+
+def grade(quiz, answers):
+    """
+    Grade (question_id, selected) pairs. Answers to questions that aren't
+    part of the quiz are dropped, and only the first answer to a question
+    counts. Returns (score, total_questions, graded) where graded is a list
+    of (question_id, selected, is_correct).
+    """
+    key = answer_key(quiz)
+    graded = []
+    seen = set()
+    for question_id, selected in answers:
+        if question_id not in key or question_id in seen:
+            continue
+        seen.add(question_id)
+        graded.append((question_id, selected, normalize(selected) == key[question_id]))
+    score = sum(1 for _, _, is_correct in graded if is_correct)
+    return score, len(key), graded
+
+
+def regrade_questions(question_ids, batch_size=500):
+    """
+    Re-grade every stored answer to the given questions against their
+    current correct answer, then recompute the score of each affected result.
+    Returns (answers changed, results changed).
+    """
+    correct = {
+        question_id: normalize(answer)
+        for question_id, answer in Question.objects.filter(id__in=question_ids).values_list('id', 'answer')
+    }
+    changed = []
+    result_ids = set()
+    answers = QuizAnswer.objects.filter(question_id__in=correct).only(
+        'id', 'question_id', 'quiz_result_id', 'selected_option', 'is_correct',
+    )
+    for answer in answers.iterator(chunk_size=batch_size):
+        is_correct = normalize(answer.selected_option) == correct[answer.question_id]
+        if is_correct != answer.is_correct:
+            answer.is_correct = is_correct
+            changed.append(answer)
+            result_ids.add(answer.quiz_result_id)
+
+    with transaction.atomic():
+        QuizAnswer.objects.bulk_update(changed, ['is_correct'], batch_size=batch_size)
+        results = list(
+            QuizResult.objects.filter(id__in=result_ids)
+            .annotate(correct_answers=Count('answers', filter=Q(answers__is_correct=True)))
+        )
+        for result in results:
+            result.score = result.correct_answers
+        QuizResult.objects.bulk_update(results, ['score'], batch_size=batch_size)
+
+        # Quizzes showing one of these results as their latest
+        scores = {result.id: result.score for result in results}
+        quizzes = list(Quiz.objects.filter(latest_result__in=scores).only('id', 'latest_result', 'latest_score'))
+        for quiz in quizzes:
+            quiz.latest_score = scores[quiz.latest_result_id]
+        Quiz.objects.bulk_update(quizzes, ['latest_score'], batch_size=batch_size)
+    return len(changed), len(results)
+
+
+def regrade_quizzes(quiz_ids, batch_size=500):
+    """
+    Re-grade every stored answer of the given quizzes, one quiz at a time.
+    """
+    answers_changed = results_changed = 0
+    for quiz_id in quiz_ids:
+        question_ids = list(Question.objects.filter(quiz_id=quiz_id).values_list('id', flat=True))
+        answers, results = regrade_questions(question_ids, batch_size=batch_size)
+        answers_changed += answers
+        results_changed += results
+    return answers_changed, results_changed
+
+
+def correct_answer(question, answer):
+    """
+    Change the correct answer of a question and re-grade past submissions.
+    """
+    with transaction.atomic():
+        question.answer = answer
+        question.save(update_fields=['answer'])  # bumps the quiz's answers_version, see signals.py
+        return regrade_questions([question.id])
@@ -0,0 +1,326 @@
+"""
+Background text extraction.
+
+Uploads only enqueue an ExtractionJob; the run_extraction_worker management
+command claims due jobs and runs them outside the request/response cycle.
+
+A new revision of a PDF copies the text of every page whose fingerprint it
+shares with the previous revision and only extracts the rest, so the work
+grows with the size of the edit rather than the size of the document.
+"""
+import logging
+import os
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import retrieval
+from .blobs import share_extracted_text
+from .db import retry_on_lock
+from .extractors import iter_text
+from .extraction import (
+    PageExtractionError,
+    TextSpool,
+    capped_page_numbers,
+    iter_pdf_pages,
+    pdf_page_count,
+    pdf_page_fingerprints,
+)
+from .models import ExtractedPage, ExtractionJob
+
+logger = logging.getLogger(__name__)
+
+# Extracted pages are written to the database this many at a time
+PAGE_BATCH_SIZE = 50
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_extraction(material):
+    """
+    Queue text extraction for a material. Returns the job, or None if the
+    material has nothing to extract.
+    """
+    if not material.needs_extraction:
+        return None
+    return ExtractionJob.objects.create(
+        material=material,
+        max_attempts=_setting('EXTRACTION_JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def enqueue_extractions(materials):
+    """
+    Queue text extraction for many materials with one INSERT. Returns a
+    dict of material id -> job.
+    """
+    max_attempts = _setting('EXTRACTION_JOB_MAX_ATTEMPTS', 5)
+    jobs = ExtractionJob.objects.bulk_create([
+        ExtractionJob(material=material, max_attempts=max_attempts)
+        for material in materials
+        if material.needs_extraction
+    ])
+    return {job.material_id: job for job in jobs}
+
+
+def backoff_delay(attempts):
+    """
+    Seconds to wait before the next attempt: exponential in the number of
+    attempts made so far, capped, with full jitter so retries of jobs that
+    failed together don't all come back at the same moment.
+    """
+    base = _setting('EXTRACTION_RETRY_BASE_DELAY', 10)
+    cap = _setting('EXTRACTION_RETRY_MAX_DELAY', 600)
+    return random.uniform(0, min(cap, base * (2 ** max(attempts - 1, 0))))
+
+
+@retry_on_lock
+def claim_next_job():
+    """
+    Atomically move the oldest due job from 'queued' to 'running'.
+
+    The claim is a conditional UPDATE, so two workers racing for the same
+    row can't both win it. Returns the claimed job or None.
+    """
+    now = timezone.now()
+    candidates = ExtractionJob.objects.filter(
+        status=ExtractionJob.QUEUED,
+        run_after__lte=now,
+    ).order_by('run_after').values_list('pk', flat=True)[:10]
+
+    for pk in candidates:
+        claimed = ExtractionJob.objects.filter(pk=pk, status=ExtractionJob.QUEUED).update(
+            status=ExtractionJob.RUNNING,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ExtractionJob.objects.select_related('material').get(pk=pk)
+    return None
+
+
+@retry_on_lock
+def _store_pages(material, page_results):
+    ExtractedPage.objects.bulk_create(
+        [
+            ExtractedPage(
+                material=material,
+                page_number=result.page_number,
+                text=result.text or '',
+                error=result.error or '',
+                fingerprint=result.fingerprint,
+            )
+            for result in page_results
+        ],
+        update_conflicts=True,
+        unique_fields=['material', 'page_number'],
+        update_fields=['text', 'error', 'fingerprint', 'extracted_at'],
+    )
+
+
+def previous_page_texts(material):
+    """
+    The extracted pages of the material's previous revision, as
+    {fingerprint: text}. Pages stored before fingerprints were kept get
+    theirs from the previous revision's file.
+    """
+    previous = material.previous_revision
+    if previous is None or previous.file_type != 'pdf':
+        return {}
+    pages = list(previous.pages.filter(error='').only('page_number', 'text', 'fingerprint'))
+    missing = [page for page in pages if not page.fingerprint]
+    if missing and previous.file and os.path.exists(previous.file.path):
+        fingerprints = pdf_page_fingerprints(previous.file.path, [page.page_number for page in missing])
+        for page in missing:
+            page.fingerprint = fingerprints.get(page.page_number, '')
+        retry_on_lock(ExtractedPage.objects.bulk_update)(missing, ['fingerprint'], batch_size=PAGE_BATCH_SIZE)
+    return {page.fingerprint: page.text for page in pages if page.fingerprint}
+
+
+def extract_pdf_material(material):
+    """
+    Extract a PDF material page by page, storing every page as an
+    ExtractedPage. Pages already stored without an error are not extracted
+    again, so a retry only redoes the pages that failed last time.
+
+    Pages of a new revision that are unchanged from the previous revision
+    are copied from there instead of being extracted (see
+    previous_page_texts()); the extraction workers fingerprint every page
+    they read and skip the text of the ones already known.
+
+    Pages are streamed to the database in batches of PAGE_BATCH_SIZE and the
+    final text is assembled in a TextSpool. The returned text is a single
+    string, so memory use is bounded by the EXTRACTION_MAX_BYTES cap rather
+    than independent of the document. Only the first EXTRACTION_MAX_PAGES
+    pages are read.
+
+    Returns (text, truncated), or raises PageExtractionError listing the
+    pages that still failed (their rows keep the error for the next attempt).
+    """
+    path = material.file.path
+    page_count = pdf_page_count(path)
+    page_numbers = capped_page_numbers(page_count)
+    done = set(material.pages.filter(error='').values_list('page_number', flat=True))
+    todo = [n for n in page_numbers if n not in done]
+
+    previous = previous_page_texts(material)
+    reused = 0
+    failed = []
+    batch = []
+    for result in iter_pdf_pages(path, pages=todo, known=frozenset(previous)):
+        if result.text is None and not result.error:
+            result = result._replace(text=previous[result.fingerprint])
+            reused += 1
+        if result.error:
+            failed.append(result.page_number)
+        batch.append(result)
+        if len(batch) >= PAGE_BATCH_SIZE:
+            _store_pages(material, batch)
+            batch = []
+    if batch:
+        _store_pages(material, batch)
+    if material.previous_revision_id:
+        logger.info(
+            f"Material {material.id} (revision {material.revision}): "
+            f"{reused} of {len(todo)} pages unchanged from material {material.previous_revision_id}"
+        )
+    if failed:
+        raise PageExtractionError(failed)
+
+    pages = material.pages.filter(
+        page_number__lt=len(page_numbers),
+    ).order_by('page_number').only('text')
+    with TextSpool() as spool:
+        spool.write_pages(pages.iterator(chunk_size=PAGE_BATCH_SIZE))
+        return spool.getvalue(), spool.truncated or page_count > len(page_numbers)
+
+
+def extract_material_text(material):
+    """
+    Extract the text of any material within the EXTRACTION_MAX_BYTES cap.
+    Returns (text, truncated); the text is held in memory in full, so the
+    cap is also what bounds memory use.
+    """
+    if material.file_type == 'pdf':
+        return extract_pdf_material(material)
+    with TextSpool() as spool:
+        for piece in iter_text(material.file.path, material.file_type):
+            spool.write(piece)
+            if spool.truncated:
+                break  # the rest of the file is never read
+        return spool.getvalue(), spool.truncated
+
+
+def run_job(job):
+    """
+    Extract the text for a claimed job and record the outcome on both the
+    job and its material.
+    """
+    material = job.material
+    if material.processed:
+        # An identical upload was extracted while this job was queued
+        return _finish(job)
+
+    try:
+        text, truncated = extract_material_text(material)
+    except Exception as e:
+        return fail_job(job, e)
+
+    job = _save_text(job, material, text, truncated)
+    # The retrieval index is built here, off the request path, rather than
+    # when the material is first used for a prompt
+    retrieval.index_material(material)
+    return job
+
+
+def fail_job(job, error):
+    """
+    Record a failed attempt: back in the queue after backoff_delay(), or
+    'failed' for good once max_attempts attempts have been made.
+    """
+    logger.error(f"Extraction of material {job.material_id} failed (attempt {job.attempts}): {error}")
+    job.last_error = str(error)
+    if job.attempts >= job.max_attempts:
+        job.status = ExtractionJob.FAILED
+        job.finished_at = timezone.now()
+    else:
+        job.status = ExtractionJob.QUEUED
+        job.run_after = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+    retry_on_lock(job.save)(update_fields=['status', 'last_error', 'run_after', 'finished_at'])
+    return job
+
+
+@retry_on_lock
+def _save_text(job, material, text, truncated):
+    # One transaction, so a retry after a lock timeout starts from scratch
+    with transaction.atomic():
+        material.extracted_text = text
+        material.text_truncated = truncated
+        material.processed = True
+        material.save(update_fields=['extracted_text', 'text_truncated', 'processed'])
+        share_extracted_text(material)
+        return _finish(job)
+
+
+@retry_on_lock
+def _finish(job):
+    job.status = ExtractionJob.DONE
+    job.last_error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'last_error', 'finished_at'])
+    return job
+
+
+@retry_on_lock
+def requeue_stale_jobs():
+    """
+    Put 'running' jobs whose worker died back in the queue. A job is stale
+    once it has been running for longer than EXTRACTION_JOB_TIMEOUT seconds.
+    A stale job that has used up its attempts is marked 'failed' instead, so
+    a file that kills the worker every time isn't retried forever.
+
+    Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = ExtractionJob.objects.filter(
+        status=ExtractionJob.RUNNING,
+        started_at__lt=now - timedelta(seconds=_setting('EXTRACTION_JOB_TIMEOUT', 900)),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=ExtractionJob.FAILED,
+        last_error='The worker stopped while extracting this material',
+        finished_at=now,
+    )
+    requeued = stale.update(status=ExtractionJob.QUEUED, run_after=now)
+    return requeued, failed
+
+
+def latest_job_for(material):
+    return ExtractionJob.objects.filter(material=material).order_by('-created_at').first()
+
+
+def extraction_status(material):
+    """
+    Status payload for the materials/<pk>/status/ endpoint.
+    """
+    job = latest_job_for(material)
+    if job is None:
+        status = ExtractionJob.DONE if material.processed else None
+    else:
+        status = job.status
+    return {
+        'material_id': material.id,
+        'processed': material.processed,
+        'status': status,
+        'attempts': job.attempts if job else 0,
+        'max_attempts': job.max_attempts if job else 0,
+        'last_error': job.last_error if job else '',
+        'run_after': job.run_after if job else None,
+        'finished_at': job.finished_at if job else None,
+    }
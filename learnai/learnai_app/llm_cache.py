@@ -0,0 +1,240 @@
+"""
+Two-tier cache for Gemini responses.
+
+The first tier is an in-process LRU holding LLM_CACHE_MEMORY_ENTRIES
+responses. The second is the LLMCacheEntry table, which is shared by every
+process and evicts the least recently used entries once it holds more than
+LLM_CACHE_MAX_BYTES of responses. Adding up the size of the table reads
+every row, so each process only does it after writing another
+LLM_CACHE_EVICT_EVERY_BYTES; the table can outgrow the limit by that much
+per process in between.
+
+Keys are a digest of the material text, content type, prompt version and
+model name, so the same request from any user hits the cache and changing a
+prompt or model misses it.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# last_used_at is only written back to the database when it is at least this
+# old, so hot entries don't cost a write on every hit.
+TOUCH_INTERVAL = timedelta(minutes=5)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def make_key(material_text, content_type, prompt_version, model_name):
+    text_digest = hashlib.sha256(material_text.encode('utf-8')).hexdigest()
+    return hashlib.sha256(
+        f"{text_digest}|{content_type}|{prompt_version}|{model_name}".encode('utf-8')
+    ).hexdigest()
+
+
+class Counters:
+    NAMES = ['memory_hits', 'db_hits', 'misses', 'sets', 'memory_evictions', 'db_evictions']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+
+    def reset(self):
+        with self._lock:
+            self._values = dict.fromkeys(self.NAMES, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class LRUCache:
+    """
+    A thread-safe in-process LRU of a fixed number of entries.
+    """
+
+    def __init__(self, max_entries, counters):
+        self.max_entries = max_entries
+        self.counters = counters
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.counters.incr('memory_evictions')
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class WriteTally:
+    """
+    Bytes this process has written to the database tier since it last
+    checked the size of the table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    def add(self, size):
+        """
+        Count size more bytes. True, and starts over, once the total reaches
+        LLM_CACHE_EVICT_EVERY_BYTES.
+        """
+        with self._lock:
+            self.pending += size
+            if self.pending < _setting('LLM_CACHE_EVICT_EVERY_BYTES', 4 * 1024 * 1024):
+                return False
+            self.pending = 0
+            return True
+
+
+counters = Counters()
+memory = LRUCache(_setting('LLM_CACHE_MEMORY_ENTRIES', 256), counters)
+writes = WriteTally()
+
+
+def enabled():
+    return _setting('LLM_CACHE_ENABLED', True)
+
+
+def get(key):
+    """
+    Return the cached response for a key, or None.
+    """
+    if not enabled():
+        return None
+
+    # Both tiers hold the JSON text, so every caller gets its own copy
+    serialized = memory.get(key)
+    if serialized is not None:
+        counters.incr('memory_hits')
+        return json.loads(serialized)
+
+    try:
+        entry = LLMCacheEntry.objects.filter(key=key).only('value', 'last_used_at').first()
+    except DatabaseError as e:
+        logger.warning(f"Could not read LLM cache entry: {e}")
+        entry = None
+    if entry is None:
+        counters.incr('misses')
+        return None
+
+    counters.incr('db_hits')
+    now = timezone.now()
+    if now - entry.last_used_at > TOUCH_INTERVAL:
+        try:
+            LLMCacheEntry.objects.filter(pk=entry.pk).update(last_used_at=now)
+        except DatabaseError:
+            pass  # Only affects eviction order
+    memory.set(key, entry.value)
+    return json.loads(entry.value)
+
+
+def set(key, value, content_type, model_name, prompt_version):
+    """
+    Store a response in both tiers.
+    """
+    if not enabled():
+        return
+    serialized = json.dumps(value)
+    memory.set(key, serialized)
+    counters.incr('sets')
+
+    entry = LLMCacheEntry(
+        key=key,
+        content_type=content_type,
+        model_name=model_name,
+        prompt_version=prompt_version,
+        value=serialized,
+        size=len(serialized.encode('utf-8')),
+        last_used_at=timezone.now(),
+    )
+    try:
+        # A single upsert statement rather than update_or_create(), whose
+        # read-then-write is prone to lock errors under concurrent writers
+        LLMCacheEntry.objects.bulk_create(
+            [entry],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['value', 'size', 'last_used_at'],
+        )
+        if writes.add(entry.size):
+            evict()
+    except DatabaseError as e:
+        # The cache must never fail a generation
+        logger.warning(f"Could not store LLM cache entry: {e}")
+
+
+def evict():
+    """
+    Delete the least recently used database entries until the table holds
+    at most LLM_CACHE_MAX_BYTES of responses. Returns the number deleted.
+    """
+    max_bytes = _setting('LLM_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+    total = LLMCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= max_bytes:
+        return 0
+
+    victims = []
+    for pk, size in LLMCacheEntry.objects.order_by('last_used_at').values_list('pk', 'size').iterator():
+        if total <= max_bytes:
+            break
+        victims.append(pk)
+        total -= size
+
+    deleted, _ = LLMCacheEntry.objects.filter(pk__in=victims).delete()
+    counters.incr('db_evictions', deleted)
+    return deleted
+
+
+def stats():
+    """
+    Hit/miss/eviction counters of this process, plus the size of both tiers.
+    """
+    data = counters.snapshot()
+    lookups = data['memory_hits'] + data['db_hits'] + data['misses']
+    data['hit_rate'] = round((data['memory_hits'] + data['db_hits']) / lookups, 3) if lookups else 0
+    data['memory_entries'] = len(memory)
+    usage = LLMCacheEntry.objects.aggregate(total=Sum('size'))
+    data['db_entries'] = LLMCacheEntry.objects.count()
+    data['db_bytes'] = usage['total'] or 0
+    return data
+
+
+def clear():
+    memory.clear()
+    LLMCacheEntry.objects.all().delete()
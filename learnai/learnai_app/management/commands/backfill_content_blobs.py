@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from learnai_app.blobs import hash_file
+from learnai_app.models import ContentBlob, StudyMaterial
+
+
+class Command(BaseCommand):
+    help = "Hash materials uploaded before deduplication and attach them to content blobs."
+
+    def handle(self, *args, **options):
+        attached = missing = 0
+        materials = StudyMaterial.objects.filter(content_hash='').order_by('id')
+        for material in materials.iterator(chunk_size=100):
+            try:
+                with material.file.open('rb') as f:
+                    digest = hash_file(f)
+            except FileNotFoundError:
+                missing += 1
+                continue
+
+            # The first copy's existing file becomes the blob's file; the
+            # other materials keep theirs, since moving files is not needed
+            # for the extraction and generation sharing.
+            blob, _ = ContentBlob.objects.get_or_create(
+                digest=digest,
+                defaults={'file': material.file.name, 'size': material.file.size},
+            )
+            if material.processed and not blob.processed:
+                blob.extracted_text = material.extracted_text
+                blob.text_truncated = material.text_truncated
+                blob.processed = True
+                blob.save(update_fields=['extracted_text', 'text_truncated', 'processed'])
+
+            material.blob = blob
+            material.content_hash = digest
+            material.save(update_fields=['blob', 'content_hash'])
+            attached += 1
+
+        self.stdout.write(f"Attached {attached} material(s); {missing} file(s) missing")
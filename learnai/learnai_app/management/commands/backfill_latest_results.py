@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from learnai_app.models import Quiz
+from learnai_app.quizzes import refresh_latest_results
+
+
+class Command(BaseCommand):
+    help = "Fill in the latest-result columns of quizzes from their stored results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        quiz_ids = Quiz.objects.order_by('id').values_list('id', flat=True)
+        updated = refresh_latest_results(quiz_ids.iterator(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} quiz(zes)"))
@@ -0,0 +1,175 @@
+import os
+import random
+import tempfile
+import time
+import zipfile
+from collections import defaultdict
+from xml.sax.saxutils import escape
+
+import pptx
+from django.core.management.base import BaseCommand, CommandError
+
+from learnai_app.extractors import extract_textract, extractors_for
+from learnai_app.models import StudyMaterial
+
+WORDS = (
+    "cell membrane protein energy enzyme reaction transport signal gene chromosome equation velocity "
+    "market demand supply inflation theorem proof matrix vector algorithm complexity network protocol "
+    "revolution empire treaty economy climate ecosystem population résumé naïve café"
+).split()
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+def sentence(rng):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(8, 24))).capitalize() + '.'
+
+
+def paragraph(rng):
+    return ' '.join(sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def write_txt(path, rng, paragraphs, encoding):
+    with open(path, 'w', encoding=encoding, newline='\r\n') as f:
+        f.write('\n\n'.join(paragraph(rng) for _ in range(paragraphs)))
+
+
+RUN_PROPERTIES = '<w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri"/><w:sz w:val="22"/><w:lang w:val="en-GB"/></w:rPr>'
+PARAGRAPH_PROPERTIES = '<w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs><w:spacing w:after="160"/></w:pPr>'
+
+
+def write_docx(path, rng, paragraphs):
+    # A minimal WordprocessingML package, written by hand. Like Word, it
+    # gives every run its formatting and puts each sentence in a run.
+    def run(text):
+        return f'<w:r>{RUN_PROPERTIES}<w:t xml:space="preserve">{escape(text)} </w:t></w:r>'
+
+    def p(*sentences):
+        return f'<w:p>{PARAGRAPH_PROPERTIES}{"".join(run(text) for text in sentences)}</w:p>'
+
+    body = []
+    for i in range(paragraphs):
+        body.append(p(*(sentence(rng) for _ in range(rng.randint(2, 6)))))
+        if i % 50 == 49:
+            rows = ''.join(
+                '<w:tr>' + ''.join(f'<w:tc>{p(rng.choice(WORDS))}</w:tc>' for _ in range(3)) + '</w:tr>'
+                for _ in range(4)
+            )
+            body.append(f'<w:tbl>{rows}</w:tbl>')
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', DOCX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', DOCX_RELS)
+        archive.writestr('word/document.xml', document)
+
+
+def write_pptx(path, rng, paragraphs):
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]  # title and content
+    for _ in range(max(paragraphs // 5, 1)):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = sentence(rng)
+        frame = slide.placeholders[1].text_frame
+        frame.text = sentence(rng)
+        for _ in range(4):
+            frame.add_paragraph().text = sentence(rng)
+    presentation.save(path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the in-process text extractors against textract, per file type, "
+        "on the given files or on a generated corpus of TXT (UTF-8 and cp1252), DOCX and PPTX files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="Files to extract; a corpus is generated if none are given.")
+        parser.add_argument('--files', type=int, default=10, help="Generated files per format.")
+        parser.add_argument('--paragraphs', type=int, default=300, help="Paragraphs per generated file.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per extractor; the best run is reported.")
+
+    def handle(self, *args, **options):
+        if options['paths']:
+            self.bench(options['paths'], options['repeat'])
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            self.bench(self.corpus(directory, options['files'], options['paragraphs']), options['repeat'])
+
+    def corpus(self, directory, files, paragraphs):
+        rng = random.Random(0)
+        writers = [
+            ('utf8.txt', lambda path: write_txt(path, rng, paragraphs, 'utf-8')),
+            ('cp1252.txt', lambda path: write_txt(path, rng, paragraphs, 'cp1252')),
+            ('docx', lambda path: write_docx(path, rng, paragraphs)),
+            ('pptx', lambda path: write_pptx(path, rng, paragraphs)),
+        ]
+        paths = []
+        for suffix, write in writers:
+            for i in range(files):
+                path = os.path.join(directory, f'doc{i}.{suffix}')
+                write(path)
+                paths.append(path)
+        return paths
+
+    def bench(self, paths, repeat):
+        groups = defaultdict(list)
+        for path in paths:
+            name = os.path.basename(path)
+            if StudyMaterial.file_type_for(name) not in StudyMaterial.EXTRACTABLE_TYPES:
+                raise CommandError(f"Not an extractable file type: {path}")
+            # Group generated TXT files by encoding too
+            groups[name.split('.', 1)[-1]].append(path)
+
+        self.stdout.write(
+            f"{'format':>10} {'files':>5} {'MB':>7} {'native MB/s':>12} {'textract MB/s':>14} "
+            f"{'speed-up':>9} {'native words':>13} {'textract words':>15}"
+        )
+        for group, group_paths in sorted(groups.items()):
+            file_type = StudyMaterial.file_type_for(group_paths[0])
+            native = extractors_for(file_type)[0]
+            size = sum(os.path.getsize(path) for path in group_paths) / 1024 / 1024
+            native_time, native_words = self.best_of(repeat, group_paths, native)
+            textract_time, textract_words = self.best_of(repeat, group_paths, extract_textract)
+            textract_rate = f"{size / textract_time:14.1f}" if textract_time else f"{'failed':>14}"
+            speed_up = f"{textract_time / native_time:8.1f}x" if textract_time else f"{'-':>9}"
+            self.stdout.write(
+                f"{group:>10} {len(group_paths):>5} {size:>7.2f} {size / native_time:>12.1f} {textract_rate} "
+                f"{speed_up} {native_words:>13} {textract_words if textract_time else '-':>15}"
+            )
+
+    def best_of(self, repeat, paths, extractor):
+        """
+        Best time to extract all the files with one extractor, and the
+        number of words it found. (0, 0) if it failed on any of them.
+        """
+        best, words = None, 0
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            try:
+                texts = [''.join(extractor(path)) for path in paths]
+            except Exception as e:
+                self.stderr.write(f"{extractor.__name__}: {type(e).__name__}: {e}")
+                return 0, 0
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            words = sum(len(text.split()) for text in texts)
+        return best, words
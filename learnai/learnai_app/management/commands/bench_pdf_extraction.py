@@ -0,0 +1,75 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from PyPDF2 import PdfReader
+
+from learnai_app.extraction import extract_pdf_pages, extract_pdf_text, join_pages, shutdown_pool
+
+
+def sequential_extract(path):
+    # The loop StudyMaterial.extract_text() used before the extraction engine
+    text = ""
+    with open(path, 'rb') as pdf_file:
+        pdf_reader = PdfReader(pdf_file)
+        for page_num in range(len(pdf_reader.pages)):
+            page = pdf_reader.pages[page_num]
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    return text
+
+
+class Command(BaseCommand):
+    help = "Compare pages/sec of the page-parallel PDF extractor against the old sequential loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="PDF files to extract.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per extractor; the best run is reported.")
+        parser.add_argument(
+            '--memory', action='store_true',
+            help="Also report the peak Python memory of the old loop and of the streaming extractor.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            # Start the pool before timing so process start-up isn't counted
+            extract_pdf_pages(options['paths'][0], pages=[0], parallel=True)
+            for path in options['paths']:
+                self.bench(path, options['repeat'])
+                if options['memory']:
+                    self.bench_memory(path)
+        finally:
+            shutdown_pool()
+
+    def bench(self, path, repeat):
+        sequential_time, sequential_text = self.best_of(repeat, lambda: sequential_extract(path))
+        parallel_time, parallel_text = self.best_of(
+            repeat, lambda: join_pages(extract_pdf_pages(path, parallel=True))
+        )
+        page_count = len(PdfReader(path).pages)
+
+        self.stdout.write(path)
+        self.stdout.write(f"  pages:      {page_count}")
+        self.stdout.write(f"  sequential: {page_count / sequential_time:8.1f} pages/sec ({sequential_time:.3f}s)")
+        self.stdout.write(f"  parallel:   {page_count / parallel_time:8.1f} pages/sec ({parallel_time:.3f}s)")
+        self.stdout.write(f"  speed-up:   {sequential_time / parallel_time:8.2f}x")
+        if parallel_text != sequential_text:
+            self.stdout.write(self.style.WARNING("  output differs from the sequential extractor"))
+
+    def bench_memory(self, path):
+        for label, func in [('sequential', sequential_extract), ('streaming', extract_pdf_text)]:
+            tracemalloc.start()
+            text = func(path)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"  {label + ' peak:':16}{peak / 1024 / 1024:8.1f} MiB for {len(text)} chars")
+
+    def best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
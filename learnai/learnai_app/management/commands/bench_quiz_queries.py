@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from learnai_app.models import Question, Quiz, QuizAnswer, QuizResult, StudyMaterial
+from learnai_app.quizzes import create_quiz, save_result
+
+
+class Rollback(Exception):
+    pass
+
+
+def per_row_create(user, material, questions_data):
+    # How quizzes were stored before quizzes.create_quiz()
+    quiz = Quiz.objects.create(user=user, material=material, title=f"Quiz: {material.title}")
+    for question_data in questions_data:
+        Question.objects.create(
+            quiz=quiz,
+            question_text=question_data.get('question_text', ''),
+            answer=question_data.get('answer', ''),
+            options=question_data.get('options', [])
+        )
+    return quiz
+
+
+def per_row_submit(user, quiz, score, total_questions, answers):
+    # How submissions were stored before quizzes.save_result()
+    quiz_result = QuizResult.objects.create(
+        user=user, quiz=quiz, score=score, total_questions=total_questions, completed=True
+    )
+    for answer in answers:
+        try:
+            question = Question.objects.get(id=answer['questionId'], quiz=quiz)
+            QuizAnswer.objects.create(
+                quiz_result=quiz_result,
+                question=question,
+                selected_option=answer['selected'],
+                is_correct=answer['correct']
+            )
+        except Question.DoesNotExist:
+            continue
+    return quiz_result
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries needed to store a generated quiz and a submission, for several quiz "
+        "sizes. Fails if the count grows with the number of questions. Nothing is kept in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[5, 50], help="Numbers of questions to try.")
+
+    def handle(self, *args, **options):
+        counts = {}
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username='bench-quiz-queries')
+                material = StudyMaterial.objects.create(user=user, title='Benchmark', file='bench.txt')
+                for size in options['sizes']:
+                    counts[size] = self.measure(user, material, size)
+                raise Rollback()
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{'questions':>10} {'create':>8} {'per-row':>8} {'submit':>8} {'per-row':>8}")
+        for size, (create, old_create, submit, old_submit) in counts.items():
+            self.stdout.write(f"{size:>10} {create:>8} {old_create:>8} {submit:>8} {old_submit:>8}")
+
+        smallest, largest = counts[min(counts)], counts[max(counts)]
+        if largest[0] > smallest[0] or largest[2] > smallest[2]:
+            raise CommandError("Query count grows with the number of questions")
+
+    def measure(self, user, material, size):
+        questions_data = [
+            {'question_text': f"Question {i}?", 'answer': 'A', 'options': ['A', 'B', 'C', 'D']}
+            for i in range(size)
+        ]
+
+        with CaptureQueriesContext(connection) as create_queries:
+            quiz = create_quiz(user, material, questions_data)
+        with CaptureQueriesContext(connection) as old_create_queries:
+            old_quiz = per_row_create(user, material, questions_data)
+
+        answers = [
+            {'questionId': question_id, 'selected': 'A', 'correct': True}
+            for question_id in quiz.questions.values_list('id', flat=True)
+        ]
+        with CaptureQueriesContext(connection) as submit_queries:
+            save_result(user, quiz, answers)
+        old_answers = [
+            {'questionId': question_id, 'selected': 'A', 'correct': True}
+            for question_id in old_quiz.questions.values_list('id', flat=True)
+        ]
+        with CaptureQueriesContext(connection) as old_submit_queries:
+            per_row_submit(user, old_quiz, size, size, old_answers)
+
+        return (
+            len(create_queries), len(old_create_queries),
+            len(submit_queries), len(old_submit_queries),
+        )
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from learnai_app.db import is_locked_error, retry_on_lock
+
+# The connection setup before WAL: rollback journal, deferred transactions
+# and Django's default busy timeout
+BASELINE = {'init_command': '', 'transaction_mode': 'DEFERRED', 'timeout': 5, 'retry': False}
+
+
+def configured_profile():
+    options = settings.DATABASES['default'].get('OPTIONS', {})
+    return {
+        'init_command': options.get('init_command', ''),
+        'transaction_mode': options.get('transaction_mode') or 'DEFERRED',
+        'timeout': options.get('timeout', 5),
+        'retry': True,
+    }
+
+
+def connect(path, profile, read_only=False):
+    db = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    statements = [s for s in profile['init_command'].split(';') if s.strip()]
+    if read_only:
+        statements.append('PRAGMA query_only=1')
+    for statement in statements:
+        db.execute(statement)
+    return db
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel readers and writers against a scratch SQLite database, once with the old "
+        "connection setup (rollback journal, deferred transactions) and once with the one configured "
+        "in DATABASES, and compare throughput, read latency and lock errors. The project database "
+        "isn't touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--payload-kb', type=int, default=256, help="Size of the text each write stores.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'profile':>10} {'reads/s':>9} {'p99 read':>9} {'writes/s':>9} {'locked':>7} {'retried':>8}"
+        )
+        for name, profile in (('baseline', BASELINE), ('configured', configured_profile())):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, profile, options['rows'])
+                stats = self.run(path, profile, options)
+            latencies = sorted(stats['latencies']) or [0]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"{name:>10} {stats['reads'] / options['seconds']:>9.0f} {p99 * 1000:>7.1f}ms "
+                f"{stats['writes'] / options['seconds']:>9.1f} {stats['locked']:>7} {stats['retried']:>8}"
+            )
+
+    def seed(self, path, profile, rows):
+        db = connect(path, profile)
+        db.execute('CREATE TABLE material (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, body TEXT)')
+        db.execute('CREATE INDEX material_user ON material (user_id)')
+        db.executemany(
+            'INSERT INTO material (user_id, title, body) VALUES (?, ?, ?)',
+            [(i % 50, f"Material {i}", '') for i in range(rows)],
+        )
+        db.close()
+
+    def run(self, path, profile, options):
+        stats = {'reads': 0, 'writes': 0, 'locked': 0, 'retried': 0, 'latencies': []}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        payload = 'x' * (options['payload_kb'] * 1024)
+
+        def reader(worker):
+            db = connect(path, profile, read_only=True)
+            reads, latencies, locked = 0, [], 0
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    db.execute(
+                        'SELECT id, title FROM material WHERE user_id = ? ORDER BY id DESC LIMIT 20',
+                        (reads % 50,),
+                    ).fetchall()
+                except sqlite3.OperationalError as e:
+                    if not is_locked_error(e):
+                        raise
+                    locked += 1
+                    continue
+                latencies.append(time.monotonic() - started)
+                reads += 1
+            db.close()
+            with lock:
+                stats['reads'] += reads
+                stats['latencies'].extend(latencies)
+                stats['locked'] += locked
+
+        def writer(worker):
+            db = connect(path, profile)
+            counts = {'writes': 0, 'locked': 0, 'attempts': 0}
+
+            def write(row):
+                counts['attempts'] += 1
+                try:
+                    db.execute(f"BEGIN {profile['transaction_mode']}")
+                    # Read then write in one transaction, like saving extracted text
+                    db.execute('SELECT title FROM material WHERE id = ?', (row,)).fetchone()
+                    db.execute('UPDATE material SET body = ? WHERE id = ?', (payload, row))
+                    db.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                    raise
+
+            if profile['retry']:
+                write = retry_on_lock(write)
+            row = worker
+            while time.monotonic() < deadline:
+                try:
+                    write(row % options['rows'] + 1)
+                except sqlite3.OperationalError as e:
+                    if not is_locked_error(e):
+                        raise
+                    counts['locked'] += 1
+                    continue
+                counts['writes'] += 1
+                row += options['writers']
+            db.close()
+            with lock:
+                stats['writes'] += counts['writes']
+                stats['locked'] += counts['locked']
+                stats['retried'] += counts['attempts'] - counts['writes'] - counts['locked']
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
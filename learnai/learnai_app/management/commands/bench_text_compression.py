@@ -0,0 +1,76 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from learnai_app import compression
+
+from .train_compression_dictionary import corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the texts in the database in a scratch SQLite file uncompressed and with each available "
+        "codec, and compare file size and the time to read a row's text back. The project database "
+        "isn't touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=2000, help="Number of stored texts to use.")
+        parser.add_argument('--copies', type=int, default=1, help="Store every text this many times, for a larger table.")
+        parser.add_argument('--reads', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        texts = corpus(options['samples']) * options['copies']
+        if not texts:
+            raise CommandError("No extracted text or generated content stored yet")
+
+        variants = [('plain', None), ('zlib', {'codec': 'zlib'})]
+        if compression.zstandard is not None:
+            variants.append(('zstd', {'codec': 'zstd', 'dictionary': False}))
+            if compression._dictionary() is not None:
+                variants.append(('zstd+dict', {'codec': 'zstd'}))
+        else:
+            self.stdout.write("zstandard is not installed, skipping zstd")
+
+        self.stdout.write(f"{len(texts)} texts, {sum(len(t.encode('utf-8')) for t in texts)} bytes of UTF-8")
+        self.stdout.write(f"{'storage':>10} {'file size':>12} {'ratio':>6} {'write':>8} {'read p50':>9} {'read p99':>9}")
+        baseline = None
+        for name, codec in variants:
+            size, write_time, latencies = self.measure(texts, codec, options['reads'])
+            baseline = baseline or size
+            self.stdout.write(
+                f"{name:>10} {size:>12} {baseline / size:>5.1f}x {write_time:>7.2f}s "
+                f"{statistics.median(latencies) * 1e6:>7.0f}us {latencies[int(len(latencies) * 0.99)] * 1e6:>7.0f}us"
+            )
+
+    def measure(self, texts, codec, reads):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            db = sqlite3.connect(path)
+            db.execute('CREATE TABLE material (id INTEGER PRIMARY KEY, body BLOB)')
+            started = time.perf_counter()
+            db.executemany('INSERT INTO material (body) VALUES (?)', [
+                (text if codec is None else compression.compress(text, **codec),) for text in texts
+            ])
+            db.commit()
+            write_time = time.perf_counter() - started
+            db.execute('VACUUM')
+            size = os.path.getsize(path)
+
+            # Read a row and get its text, as a detail view does
+            latencies = []
+            for _ in range(reads):
+                row_id = random.randint(1, len(texts))
+                started = time.perf_counter()
+                value = db.execute('SELECT body FROM material WHERE id = ?', (row_id,)).fetchone()[0]
+                if codec is not None:
+                    compression.decompress(value)
+                latencies.append(time.perf_counter() - started)
+            db.close()
+        latencies.sort()
+        return size, write_time, latencies
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from learnai_app import retrieval
+from learnai_app.models import StudyMaterial
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the retrieval index of every extracted material that has none or an out-of-date one, "
+        "e.g. after changing RETRIEVAL_VECTORIZER or RETRIEVAL_CHUNK_TOKENS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Rebuild indexes that are up to date too.")
+
+    def handle(self, *args, **options):
+        built = current = 0
+        chunks = vector_bytes = 0
+        started = time.perf_counter()
+        materials = (
+            StudyMaterial.objects.filter(processed=True).exclude(extracted_text=None)
+            .select_related('vector_index').defer('vector_index__vectors', 'vector_index__weights')
+        )
+        for material in materials.iterator(chunk_size=50):
+            index = getattr(material, 'vector_index', None)
+            text = material.extracted_text or ''
+            if (not options['rebuild'] and index is not None
+                    and index.text_digest == retrieval.text_digest(text)
+                    and index.vectorizer == retrieval.vectorizer().name):
+                current += 1
+                continue
+            chunk_index = retrieval.build_index(material)
+            built += 1
+            chunks += len(chunk_index)
+            vector_bytes += chunk_index.vectors.nbytes
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {built} indexes ({chunks} chunks, {vector_bytes // 1024} KiB of vectors before compression) in "
+            f"{time.perf_counter() - started:.1f}s; {current} were up to date"
+        ))
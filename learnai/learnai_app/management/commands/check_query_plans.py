@@ -0,0 +1,12 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that every query of the hot read endpoints uses an index. Runs the query plan tests "
+        "(learnai_app.tests.test_query_plans) against a test database, so nothing touches the live one."
+    )
+
+    def handle(self, *args, **options):
+        call_command('test', 'learnai_app.tests.test_query_plans', verbosity=options['verbosity'])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from learnai_app import search
+from learnai_app.models import GeneratedContent, StudyMaterial
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the search index from the materials and generated content in the database. "
+        "Needed if the index got out of step, e.g. after rows were changed with raw SQL, and now and then "
+        "to drop the terms that re-indexed documents left behind in the contentless FTS5 table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        materials = StudyMaterial.objects.only('id', 'user_id', 'title', 'extracted_text')
+        contents = GeneratedContent.objects.filter(content_type__in=search.CONTENT_TYPES).select_related('material')
+        with transaction.atomic():
+            search.backend().clear()
+            for queryset, index in ((materials, search.index_materials), (contents, search.index_contents)):
+                batch = []
+                for obj in queryset.iterator(chunk_size=batch_size):
+                    batch.append(obj)
+                    if len(batch) >= batch_size:
+                        index(batch)
+                        batch = []
+                index(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {materials.count()} materials and {contents.count()} generated notes and summaries"
+        ))
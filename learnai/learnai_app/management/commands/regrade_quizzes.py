@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from learnai_app.grading import regrade_quizzes
+from learnai_app.models import Quiz
+
+
+class Command(BaseCommand):
+    help = "Re-grade stored quiz answers against the current answer keys and fix the results' scores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int, help="Quizzes to re-grade; all quizzes if none are given.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        quiz_ids = options['quiz_ids'] or Quiz.objects.order_by('id').values_list('id', flat=True).iterator()
+        answers, results = regrade_quizzes(quiz_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Re-graded {answers} answer(s) in {results} result(s)"))
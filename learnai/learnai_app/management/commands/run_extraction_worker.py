@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from learnai_app.extraction import shutdown_pool
+from learnai_app.jobs import claim_next_job, fail_job, requeue_stale_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of workers that extract text from uploaded study materials."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'EXTRACTION_WORKERS', None) or os.cpu_count() or 1,
+            help="Number of worker threads (default: EXTRACTION_WORKERS or the CPU count).",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=getattr(settings, 'EXTRACTION_POLL_INTERVAL', 2.0),
+            help="Seconds to sleep when the queue is empty.",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once there are no due jobs left instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.sweep_stale_jobs()
+
+        workers = [
+            threading.Thread(
+                target=self.work,
+                args=(options['poll_interval'], options['once']),
+                name=f"extraction-worker-{i}",
+            )
+            for i in range(max(options['workers'], 1))
+        ]
+        self.stdout.write(f"Starting {len(workers)} extraction worker(s)")
+        for worker in workers:
+            worker.start()
+
+        # Jobs whose worker died while this one runs are swept up here too,
+        # not only at the next start
+        sweep_interval = getattr(settings, 'EXTRACTION_STALE_SWEEP_INTERVAL', 60)
+        next_sweep = time.monotonic() + sweep_interval
+        try:
+            while any(worker.is_alive() for worker in workers):
+                time.sleep(0.5)
+                if time.monotonic() >= next_sweep:
+                    self.sweep_stale_jobs()
+                    next_sweep = time.monotonic() + sweep_interval
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the jobs in progress finish...")
+            self.stop.set()
+            for worker in workers:
+                worker.join()
+        finally:
+            shutdown_pool()
+            connections.close_all()
+
+    def sweep_stale_jobs(self):
+        try:
+            requeued, failed = requeue_stale_jobs()
+        except Exception as e:
+            logger.error(f"Could not sweep stale extraction jobs: {e}")
+            return
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+        if failed:
+            self.stdout.write(f"Failed {failed} stale job(s) that had no attempts left")
+
+    def work(self, poll_interval, once):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = claim_next_job()
+                if job is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+                try:
+                    job = run_job(job)
+                except Exception as e:
+                    # Saving the result failed (e.g. the database stayed
+                    # locked past every retry). Retry the job later like any
+                    # other failed attempt, and keep this thread running.
+                    logger.exception(f"Extraction job {job.id} failed")
+                    try:
+                        job = fail_job(job, e)
+                    except Exception as error:
+                        # Left 'running'; the stale job sweep requeues it
+                        logger.error(f"Could not record the failure of extraction job {job.id}: {error}")
+                        continue
+                self.stdout.write(f"[{threading.current_thread().name}] material {job.material_id}: {job.status}")
+        finally:
+            # This thread's connections, 'replica' as well as 'default'
+            connections.close_all()
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learnai_app import compression
+from learnai_app.models import GeneratedContent, StudyMaterial
+
+
+def corpus(limit):
+    """
+    Up to limit texts from the extracted text of materials and generated
+    content, alternating between the two.
+    """
+    materials = StudyMaterial.objects.exclude(extracted_text=None).only('extracted_text').order_by('-id')
+    contents = GeneratedContent.objects.only('content').order_by('-id')
+    texts = []
+    for queryset, field in ((materials, 'extracted_text'), (contents, 'content')):
+        for obj in queryset[:limit // 2].iterator(chunk_size=100):
+            text = getattr(obj, field)
+            if text:
+                texts.append(text)
+    return texts
+
+
+class Command(BaseCommand):
+    help = (
+        "Train a zstd dictionary on stored texts for TEXT_COMPRESSION_DICTIONARY. Values compressed "
+        "with a dictionary can only be read with that same dictionary, so keep the file once it is in use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write the dictionary to.")
+        parser.add_argument('--size', type=int, default=112640, help="Dictionary size in bytes.")
+        parser.add_argument('--samples', type=int, default=2000, help="Number of texts to train on.")
+
+    def handle(self, *args, **options):
+        if compression.zstandard is None:
+            raise CommandError("Training a dictionary needs the 'zstandard' package")
+
+        texts = corpus(options['samples'])
+        if len(texts) < 10:
+            raise CommandError(f"Only {len(texts)} texts stored, too few to train a dictionary on")
+        # Long documents are cut into pieces, since zstd learns from many
+        # small samples rather than a few large ones
+        samples = [
+            text[i:i + 16384].encode('utf-8')
+            for text in texts for i in range(0, len(text), 16384)
+        ]
+        try:
+            dictionary = compression.zstandard.train_dictionary(options['size'], samples)
+        except compression.zstandard.ZstdError as e:
+            raise CommandError(f"Training failed: {e}")
+        with open(options['output'], 'wb') as f:
+            f.write(dictionary.as_bytes())
+
+        plain = sum(len(sample) for sample in samples)
+        without = sum(len(compression.compress(t, codec='zstd', dictionary=False)) for t in texts)
+        with_dictionary = sum(len(compression.compress(t, codec='zstd', dictionary=dictionary)) for t in texts)
+        self.stdout.write(
+            f"Trained on {len(texts)} texts ({plain} bytes): {without} bytes compressed without the "
+            f"dictionary, {with_dictionary} with it"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}; set TEXT_COMPRESSION_DICTIONARY to use it"))
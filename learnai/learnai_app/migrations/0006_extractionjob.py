@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def queue_unprocessed_materials(apps, schema_editor):
+    # Materials uploaded before background extraction existed and never
+    # processed get a job so the worker picks them up.
+    StudyMaterial = apps.get_model('learnai_app', 'StudyMaterial')
+    ExtractionJob = apps.get_model('learnai_app', 'ExtractionJob')
+    ExtractionJob.objects.bulk_create([
+        ExtractionJob(material=material)
+        for material in StudyMaterial.objects.filter(
+            processed=False,
+            file_type__in=['pdf', 'docx', 'ppt', 'txt'],
+        ).only('id')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0005_alter_quizresult_options_quizresult_completed_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed'), ('done', 'Done')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extraction_jobs', to='learnai_app.studymaterial')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='extractionjob_due_idx')],
+            },
+        ),
+        migrations.RunPython(queue_unprocessed_materials, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0006_extractionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='learnai_app.studymaterial')),
+            ],
+            options={
+                'ordering': ['page_number'],
+                'unique_together': {('material', 'page_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0007_extractedpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studymaterial',
+            name='text_truncated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
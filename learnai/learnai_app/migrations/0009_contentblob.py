@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:12
+
+import django.db.models.deletion
+import learnai_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0008_studymaterial_text_truncated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(upload_to=learnai_app.models.blob_directory_path)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('extracted_text', models.TextField(blank=True, null=True)),
+                ('text_truncated', models.BooleanField(default=False)),
+                ('processed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studymaterial',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='studymaterial',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='materials', to='learnai_app.contentblob'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    # Count each user's existing rows once, with one grouped query per table
+    UserProfile = apps.get_model('learnai_app', 'UserProfile')
+    StudyMaterial = apps.get_model('learnai_app', 'StudyMaterial')
+    Quiz = apps.get_model('learnai_app', 'Quiz')
+    GeneratedContent = apps.get_model('learnai_app', 'GeneratedContent')
+
+    counts = {}
+    for field, queryset in (
+        ('materials_count', StudyMaterial.objects.all()),
+        ('quizzes_count', Quiz.objects.all()),
+        ('summaries_count', GeneratedContent.objects.filter(content_type='summary')),
+    ):
+        for row in queryset.values('user_id').annotate(n=Count('id')):
+            counts.setdefault(row['user_id'], {})[field] = row['n']
+
+    profiles = {profile.user_id: profile for profile in UserProfile.objects.filter(user_id__in=counts)}
+    missing = []
+    for user_id, values in counts.items():
+        profile = profiles.get(user_id)
+        if profile is None:
+            missing.append(UserProfile(user_id=user_id, **values))
+        else:
+            for field, value in values.items():
+                setattr(profile, field, value)
+    UserProfile.objects.bulk_update(
+        profiles.values(), ['materials_count', 'quizzes_count', 'summaries_count'], batch_size=500,
+    )
+    UserProfile.objects.bulk_create(missing, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0010_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='materials_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='quizzes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='summaries_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
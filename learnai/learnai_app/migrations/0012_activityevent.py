@@ -0,0 +1,73 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+CONTENT_TYPE_NAMES = {'summary': 'Summary', 'notes': 'Study Notes', 'flashcards': 'Flashcards'}
+
+
+def backfill_events(apps, schema_editor):
+    # Rebuild the feed from the rows that exist, with the same text the
+    # signal handlers write (see learnai_app/activity.py)
+    ActivityEvent = apps.get_model('learnai_app', 'ActivityEvent')
+    StudyMaterial = apps.get_model('learnai_app', 'StudyMaterial')
+    GeneratedContent = apps.get_model('learnai_app', 'GeneratedContent')
+    Quiz = apps.get_model('learnai_app', 'Quiz')
+    QuizResult = apps.get_model('learnai_app', 'QuizResult')
+
+    def events():
+        for m in StudyMaterial.objects.values('id', 'user_id', 'title', 'uploaded_at').iterator():
+            yield ActivityEvent(user_id=m['user_id'], kind='material', object_id=m['id'],
+                                action=f"Uploaded {m['title']}"[:500], created_at=m['uploaded_at'])
+        contents = GeneratedContent.objects.filter(content_type__in=CONTENT_TYPE_NAMES).values(
+            'id', 'user_id', 'content_type', 'material__title', 'created_at')
+        for c in contents.iterator():
+            action = f"Generated {CONTENT_TYPE_NAMES[c['content_type']]} for {c['material__title']}"
+            yield ActivityEvent(user_id=c['user_id'], kind='content', object_id=c['id'],
+                                action=action[:500], created_at=c['created_at'])
+        for q in Quiz.objects.values('id', 'user_id', 'title', 'material__title', 'created_at').iterator():
+            action = f"Generated Quiz for {q['material__title']}" if q['material__title'] is not None else f"Generated {q['title']}"
+            yield ActivityEvent(user_id=q['user_id'], kind='quiz', object_id=q['id'],
+                                action=action[:500], created_at=q['created_at'])
+        results = QuizResult.objects.values('id', 'user_id', 'quiz__title', 'score', 'total_questions', 'completed_at')
+        for r in results.iterator():
+            action = f"Completed {r['quiz__title']} ({r['score']}/{r['total_questions']})"
+            yield ActivityEvent(user_id=r['user_id'], kind='result', object_id=r['id'],
+                                action=action[:500], created_at=r['completed_at'])
+
+    batch = []
+    for event in events():
+        batch.append(event)
+        if len(batch) >= 1000:
+            ActivityEvent.objects.bulk_create(batch)
+            batch = []
+    ActivityEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0011_userprofile_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('material', 'Material uploaded'), ('content', 'Content generated'), ('quiz', 'Quiz generated'), ('result', 'Quiz completed')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='activityevent_feed_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
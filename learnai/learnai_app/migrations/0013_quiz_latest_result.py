@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0012_activityevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='is_completed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='latest_result',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='learnai_app.quizresult'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='latest_score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='latest_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['user', 'created_at'], name='quiz_user_created_idx'),
+        ),
+    ]
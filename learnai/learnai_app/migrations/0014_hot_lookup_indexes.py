@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0013_quiz_latest_result'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='extractionjob',
+            index=models.Index(fields=['material', 'created_at'], name='extractionjob_material_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedcontent',
+            index=models.Index(fields=['user', 'created_at'], name='content_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizresult',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['quiz', 'completed_at'], name='quizresult_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studymaterial',
+            index=models.Index(fields=['user', 'uploaded_at'], name='material_user_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:34
+
+import learnai_app.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0014_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentblob',
+            name='extracted_text',
+            field=learnai_app.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='generatedcontent',
+            name='content',
+            field=learnai_app.fields.CompressedTextField(),
+        ),
+        migrations.AlterField(
+            model_name='studymaterial',
+            name='extracted_text',
+            field=learnai_app.fields.CompressedTextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:36
+
+from django.db import migrations, transaction
+
+# (model, field) pairs stored with CompressedTextField
+COMPRESSED_FIELDS = [
+    ('StudyMaterial', 'extracted_text'),
+    ('ContentBlob', 'extracted_text'),
+    ('GeneratedContent', 'content'),
+]
+BATCH_SIZE = 500
+
+
+def _batches(model, field, alias):
+    # Keyset pagination, so each batch is one short transaction and a large
+    # table is never held in memory. The migration isn't atomic, so the
+    # reads have to be pinned to the migrated database or the router would
+    # send them to the replica
+    last_pk = 0
+    while True:
+        batch = list(model.objects.using(alias).filter(pk__gt=last_pk).order_by('pk').only('pk', field)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield batch
+
+
+def compress_existing_text(apps, schema_editor):
+    # Rows written before 0015 still hold plain text, which the field reads
+    # back as str; saving them through the field compresses them
+    alias = schema_editor.connection.alias
+    for model_name, field in COMPRESSED_FIELDS:
+        model = apps.get_model('learnai_app', model_name)
+        for batch in _batches(model, field, alias):
+            plain = [obj for obj in batch if isinstance(obj.__dict__[field], str)]
+            with transaction.atomic(using=alias):
+                model.objects.using(alias).bulk_update(plain, [field])
+
+
+def decompress_text(apps, schema_editor):
+    connection = schema_editor.connection
+    for model_name, field in COMPRESSED_FIELDS:
+        model = apps.get_model('learnai_app', model_name)
+        table = connection.ops.quote_name(model._meta.db_table)
+        column = connection.ops.quote_name(model._meta.get_field(field).column)
+        for batch in _batches(model, field, connection.alias):
+            rows = [(getattr(obj, field), obj.pk) for obj in batch if not isinstance(obj.__dict__[field], str)]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(f'UPDATE {table} SET {column} = %s WHERE id = %s', rows)
+
+
+class Migration(migrations.Migration):
+    # One transaction per batch instead of one for the whole table
+    atomic = False
+
+    dependencies = [
+        ('learnai_app', '0015_compressed_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(compress_existing_text, decompress_text),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.4 on 2026-10-18 03:05
+
+import json
+
+from django.db import migrations
+
+# See learnai_app/search.py. The owner column holds 'u<user id>', so a
+# search only reads the entries of one user; rowid is object_id * 2 for
+# materials and object_id * 2 + 1 for content. The prefix indexes keep
+# search-as-you-type queries ("mito*") from reading every matching term.
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE learnai_search USING fts5(
+    title, body, owner,
+    kind UNINDEXED, object_id UNINDEXED, material_id UNINDEXED, content_type UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+)
+"""
+INSERT = (
+    'INSERT INTO learnai_search (rowid, title, body, owner, kind, object_id, material_id, content_type) '
+    'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'
+)
+CONTENT_TYPES = ['summary', 'notes']
+BATCH_SIZE = 500
+
+
+def _plain_text(content):
+    if not content.startswith(('[', '{')):
+        return content
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    strings = []
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return '\n'.join(strings)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    StudyMaterial = apps.get_model('learnai_app', 'StudyMaterial')
+    GeneratedContent = apps.get_model('learnai_app', 'GeneratedContent')
+
+    def rows():
+        for m in StudyMaterial.objects.only('id', 'user_id', 'title', 'extracted_text').iterator(chunk_size=BATCH_SIZE):
+            yield (m.id * 2, m.title, m.extracted_text or '', f'u{m.user_id}', 'material', m.id, m.id, '')
+        contents = GeneratedContent.objects.filter(content_type__in=CONTENT_TYPES).select_related('material')
+        for c in contents.iterator(chunk_size=BATCH_SIZE):
+            yield (c.id * 2 + 1, c.material.title, _plain_text(c.content), f'u{c.user_id}', 'content',
+                   c.id, c.material_id, c.content_type)
+
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        batch = []
+        for row in rows():
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(INSERT, batch)
+                batch = []
+        cursor.executemany(INSERT, batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS learnai_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0016_compress_existing_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 03:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0017_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_digest', models.CharField(max_length=64)),
+                ('vectorizer', models.CharField(max_length=100)),
+                ('spans', models.JSONField(default=list)),
+                ('vectors', models.BinaryField()),
+                ('weights', models.BinaryField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='vector_index', to='learnai_app.studymaterial')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0018_materialindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedcontent',
+            name='original_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generatedcontent',
+            name='sent_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
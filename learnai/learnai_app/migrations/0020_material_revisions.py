@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0019_generatedcontent_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractedpage',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='studymaterial',
+            name='previous_revision',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='revisions', to='learnai_app.studymaterial'),
+        ),
+        migrations.AddField(
+            model_name='studymaterial',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 03:10
+
+import json
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def strip_quiz_answers(apps, schema_editor):
+    # Generated quizzes used to be stored with their answers; they are kept
+    # on the Question rows only now (see quizzes.without_answers())
+    GeneratedContent = apps.get_model('learnai_app', 'GeneratedContent')
+    alias = schema_editor.connection.alias
+    contents = GeneratedContent.objects.using(alias).filter(content_type='quiz').only('id', 'content')
+    changed = []
+    for content in contents.iterator(chunk_size=BATCH_SIZE):
+        try:
+            questions = json.loads(content.content)
+        except ValueError:
+            continue
+        if not isinstance(questions, list) or not any(isinstance(q, dict) and 'answer' in q for q in questions):
+            continue
+        content.content = json.dumps([
+            {field: value for field, value in q.items() if field != 'answer'} if isinstance(q, dict) else q
+            for q in questions
+        ])
+        changed.append(content)
+    GeneratedContent.objects.using(alias).bulk_update(changed, ['content'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0020_material_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='answers_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(strip_quiz_answers, migrations.RunPython.noop),
+    ]
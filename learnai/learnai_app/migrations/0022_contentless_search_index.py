@@ -0,0 +1,103 @@
+# Generated by Django 5.1.4 on 2026-10-18 03:40
+
+import json
+from importlib import import_module
+
+from django.db import migrations
+
+# See learnai_app/search.py. The FTS5 table keeps no copy of the text
+# (content=''); learnai_search_document maps each document (object_id * 2
+# for materials, object_id * 2 + 1 for content) to the rowid it is
+# currently indexed under. AUTOINCREMENT, so rowids are never reused.
+CREATE_TABLES = [
+    """
+    CREATE VIRTUAL TABLE learnai_search USING fts5(
+        title, body, owner,
+        content = '',
+        tokenize = 'porter unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )
+    """,
+    """
+    CREATE TABLE learnai_search_document (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document INTEGER NOT NULL UNIQUE,
+        material_id INTEGER NOT NULL,
+        content_type VARCHAR(20) NOT NULL
+    )
+    """,
+]
+INSERT_DOCUMENT = (
+    'INSERT INTO learnai_search_document (document, material_id, content_type) VALUES (%s, %s, %s) RETURNING id'
+)
+INSERT = 'INSERT INTO learnai_search (rowid, title, body, owner) VALUES (%s, %s, %s, %s)'
+CONTENT_TYPES = ['summary', 'notes']
+BATCH_SIZE = 500
+
+
+def _plain_text(content):
+    if not content.startswith(('[', '{')):
+        return content
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    strings = []
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return '\n'.join(strings)
+
+
+def create_contentless_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    StudyMaterial = apps.get_model('learnai_app', 'StudyMaterial')
+    GeneratedContent = apps.get_model('learnai_app', 'GeneratedContent')
+
+    def documents():
+        for m in StudyMaterial.objects.only('id', 'user_id', 'title', 'extracted_text').iterator(chunk_size=BATCH_SIZE):
+            yield (m.id * 2, m.id, ''), (m.title, m.extracted_text or '', f'u{m.user_id}')
+        contents = GeneratedContent.objects.filter(content_type__in=CONTENT_TYPES).select_related('material')
+        for c in contents.iterator(chunk_size=BATCH_SIZE):
+            yield (c.id * 2 + 1, c.material_id, c.content_type), (c.material.title, _plain_text(c.content), f'u{c.user_id}')
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE learnai_search')
+        for sql in CREATE_TABLES:
+            cursor.execute(sql)
+        batch = []
+        for document, row in documents():
+            cursor.execute(INSERT_DOCUMENT, document)
+            batch.append((cursor.fetchone()[0], *row))
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(INSERT, batch)
+                batch = []
+        cursor.executemany(INSERT, batch)
+
+
+def restore_stored_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE learnai_search')
+        cursor.execute('DROP TABLE learnai_search_document')
+    import_module('learnai_app.migrations.0017_search_index').create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learnai_app', '0021_quiz_answers_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_contentless_index, restore_stored_index),
+    ]
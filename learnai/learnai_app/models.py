@@ -1,21 +1,20 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+import logging
 import os
 from datetime import datetime
-import textract
-from PyPDF2 import PdfReader
+from .extraction import extract_pdf_text
+from .extractors import extract_text
+from .fields import CompressedTextField
+
+logger = logging.getLogger(__name__)
 
 def extract_text_pypdf2(pdf_path):
-    text = ""
     try:
-        with open(pdf_path, 'rb') as pdf_file:
-            pdf_reader = PdfReader(pdf_file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text()
-        return text
+        return extract_pdf_text(pdf_path)
     except Exception as e:
-        print(f"Error extracting text with PyPDF2: {e}")
+        logger.error(f"Error extracting text with PyPDF2: {e}")
         return None
     
 
@@ -23,6 +22,28 @@ def extract_text_pypdf2(pdf_path):
 def user_directory_path(instance, filename):
     # File will be uploaded to MEDIA_ROOT/user_<id>/<filename>
     return f'user_{instance.user.id}/{datetime.now().strftime("%Y%m%d_%H%M%S")}_{filename}'
+
+
+def blob_directory_path(instance, filename):
+    # Content-addressed: MEDIA_ROOT/blobs/<first 2 hex digits>/<sha256>/<filename>
+    return f'blobs/{instance.digest[:2]}/{instance.digest}/{filename}'
+
+
+class ContentBlob(models.Model):
+    """
+    A stored upload, identified by the SHA-256 of its contents. Identical
+    uploads share one blob, and with it one stored file and one extraction.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_directory_path)
+    size = models.PositiveBigIntegerField(default=0)
+    extracted_text = CompressedTextField(blank=True, null=True)
+    text_truncated = models.BooleanField(default=False)
+    processed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest
     
 
 class StudyMaterial(models.Model):
@@ -37,49 +58,143 @@ class StudyMaterial(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to=user_directory_path)
+    # Uploads made before deduplication have no blob and an empty content_hash
+    blob = models.ForeignKey(ContentBlob, on_delete=models.SET_NULL, null=True, blank=True, related_name='materials')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     file_type = models.CharField(max_length=10, choices=MATERIAL_TYPES)
-    extracted_text = models.TextField(blank=True, null=True)
+    extracted_text = CompressedTextField(blank=True, null=True)
+    # Set when the document was longer than EXTRACTION_MAX_PAGES/EXTRACTION_MAX_BYTES
+    text_truncated = models.BooleanField(default=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
+    # A re-upload of an edited document is a new revision of the material it
+    # replaces; its unchanged pages are copied from there (see jobs.py)
+    previous_revision = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='revisions')
+    revision = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # The material list: a user's materials, newest first
+            models.Index(fields=['user', 'uploaded_at'], name='material_user_uploaded_idx'),
+        ]
+
+    # File types that have a text extractor; images are stored as-is
+    EXTRACTABLE_TYPES = ['pdf', 'docx', 'ppt', 'txt']
+
+    # File extensions accepted for upload
+    ALLOWED_EXTENSIONS = ['pdf', 'docx', 'ppt', 'pptx', 'txt', 'jpg', 'jpeg', 'png']
+
+    @classmethod
+    def file_type_for(cls, filename):
+        """
+        The file_type for a file name, or None for unsupported extensions.
+        """
+        ext = os.path.splitext(filename)[1][1:].lower()
+        if ext in cls.ALLOWED_EXTENSIONS:
+            return ext if ext != 'pptx' else 'ppt'
+        return None
 
     def save(self, *args, **kwargs):
         # Set file type based on extension
-        ext = os.path.splitext(self.file.name)[1][1:].lower()
-        if ext in ['pdf', 'docx', 'ppt', 'pptx', 'txt', 'jpg', 'jpeg', 'png']:
-            self.file_type = ext if ext != 'pptx' else 'ppt'
+        file_type = self.file_type_for(self.file.name)
+        if file_type:
+            self.file_type = file_type
 
+        # Text extraction is no longer done here: it runs in the background
+        # extraction worker (see jobs.py and the run_extraction_worker command).
         super().save(*args, **kwargs)
 
-        # Extract text if not already processed
-        if not self.processed and self.file_type in ['pdf', 'docx', 'ppt', 'txt']:
-            self.extract_text()
+    @property
+    def needs_extraction(self):
+        return not self.processed and self.file_type in self.EXTRACTABLE_TYPES
+
+    def read_text(self):
+        """
+        Read the text out of the uploaded file.
+
+        Unlike extract_text() this does not save anything and lets errors
+        propagate, so the extraction worker can decide whether to retry.
+        See extractors.py for how each file type is read.
+        """
+        return extract_text(self.file.path, self.file_type)
 
     def extract_text(self):
         try:
-            if self.file_type == 'pdf':
-                text = ""
-                try:
-                    with open(self.file.path, 'rb') as pdf_file:  
-                        pdf_reader = PdfReader(pdf_file)
-                        for page_num in range(len(pdf_reader.pages)):
-                            page = pdf_reader.pages[page_num]
-                            page_text = page.extract_text()
-                            if page_text:  # Check if page_text is not None
-                                text += page_text + "\n"  # Add a newline between pages (optional)
-                except Exception as pdf_exception:
-                    print(f"Error extracting text from PDF with PyPDF2: {pdf_exception}")
-                    text = ""  # set to empty string to avoid errors.
-            else:
-                text = textract.process(self.file.path).decode('utf-8')
+            text = self.read_text()
             self.extracted_text = text
             self.processed = True
             self.save()
         except Exception as e:
-            print(f"Error extracting text: {e}")
+            logger.error(f"Error extracting text from material {self.id}: {e}")
             self.extracted_text = ""  # Important: Handle errors to prevent unexpected behavior
             self.processed = False
             self.save()  # save the model even on error
 
+
+class ExtractionJob(models.Model):
+    """
+    A queued request to extract the text of a StudyMaterial.
+
+    Jobs are picked up by the run_extraction_worker management command.
+    Failed attempts are retried with exponential backoff until max_attempts
+    is reached, after which the job stays in the 'failed' state.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    DONE = 'done'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+        (DONE, 'Done'),
+    ]
+
+    material = models.ForeignKey(StudyMaterial, on_delete=models.CASCADE, related_name='extraction_jobs')
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker polls for due jobs with this pair of columns
+            models.Index(fields=['status', 'run_after'], name='extractionjob_due_idx'),
+            # The latest job of a material, for materials/<pk>/status/
+            models.Index(fields=['material', 'created_at'], name='extractionjob_material_idx'),
+        ]
+
+    def __str__(self):
+        return f"Extraction of material {self.material_id} ({self.status})"
+
+class ExtractedPage(models.Model):
+    """
+    The extracted text of a single PDF page. Keeping pages separately lets a
+    page that failed be retried on its own instead of re-reading the document.
+    """
+    material = models.ForeignKey(StudyMaterial, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.PositiveIntegerField()  # 0-based
+    text = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    # What the text was extracted from, see extraction.page_fingerprint();
+    # empty for pages extracted before fingerprints were kept
+    fingerprint = models.CharField(max_length=64, blank=True)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['page_number']
+        unique_together = ('material', 'page_number')
+
+    @property
+    def failed(self):
+        return bool(self.error)
+
+
 class GeneratedContent(models.Model):
     CONTENT_TYPES = [
         ('summary', 'Summary'),
@@ -91,18 +206,41 @@ class GeneratedContent(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     material = models.ForeignKey(StudyMaterial, on_delete=models.CASCADE)
     content_type = models.CharField(max_length=20, choices=CONTENT_TYPES)
-    content = models.TextField()
+    content = CompressedTextField()
+    # Estimated tokens of the material's whole text, and of the prompts
+    # actually sent for it after retrieval and compression (see budget.py)
+    original_tokens = models.PositiveIntegerField(default=0)
+    sent_tokens = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True) 
 
     class Meta:
+        # The unique index also serves the lookups by (user, material, content_type)
         unique_together = ('user', 'material', 'content_type') 
+        indexes = [
+            # The content list: a user's content, newest first
+            models.Index(fields=['user', 'created_at'], name='content_user_created_idx'),
+        ]
 
 class Quiz(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     material = models.ForeignKey(StudyMaterial, on_delete=models.CASCADE, null=True, blank=True)
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # The latest completed result, copied here by quizzes.save_result() and
+    # reset by quizzes.reset_for_retake() so listing quizzes needs no joins
+    latest_result = models.ForeignKey('QuizResult', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    is_completed = models.BooleanField(default=False)
+    latest_score = models.PositiveIntegerField(default=0)
+    latest_total = models.PositiveIntegerField(default=0)
+    # Bumped whenever a question changes, so answer keys cached under the
+    # old version are never read again (see grading.py)
+    answers_version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='quiz_user_created_idx'),
+        ]
 
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions')
@@ -117,6 +255,10 @@ class UserProfile(models.Model):
     quizzes_taken = models.PositiveIntegerField(default=0)
     flashcards_generated = models.PositiveIntegerField(default=0)
     notes_generated = models.PositiveIntegerField(default=0)
+    # Row counts for the dashboard, maintained by stats.adjust()
+    materials_count = models.PositiveIntegerField(default=0)
+    quizzes_count = models.PositiveIntegerField(default=0)
+    summaries_count = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -134,6 +276,14 @@ class QuizResult(models.Model):
     class Meta:
         ordering = ['-completed_at']
         unique_together = ('user', 'quiz')  # One result per user per quiz unless retaken
+        indexes = [
+            # The latest completed result of each quiz (quizzes.refresh_latest_results)
+            models.Index(
+                fields=['quiz', 'completed_at'],
+                condition=models.Q(completed=True),
+                name='quizresult_completed_idx',
+            ),
+        ]
 
     def percentage(self):
         return round((self.score / self.total_questions) * 100) if self.total_questions > 0 else 0
@@ -142,4 +292,71 @@ class QuizAnswer(models.Model):
     quiz_result = models.ForeignKey(QuizResult, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_option = models.TextField()
-    is_correct = models.BooleanField()
\ No newline at end of file
+    is_correct = models.BooleanField()
+
+class LLMCacheEntry(models.Model):
+    """
+    Disk tier of the generated-content cache (see llm_cache.py). key is a
+    digest of the material text, content type, prompt version and model.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    content_type = models.CharField(max_length=20)
+    model_name = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=50)
+    value = models.TextField()  # JSON of the ai_service response dict
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class MaterialIndex(models.Model):
+    """
+    Vectors of the chunks of a material's extracted text, for retrieval (see
+    retrieval.py). Rebuilt when the text or the vectorizer changes.
+    """
+    material = models.OneToOneField(StudyMaterial, on_delete=models.CASCADE, related_name='vector_index')
+    text_digest = models.CharField(max_length=64)  # SHA-256 of the text that was indexed
+    vectorizer = models.CharField(max_length=100)  # name and parameters, see retrieval.py
+    spans = models.JSONField(default=list)  # [start, end] of each chunk in the text
+    # zlib-compressed float32 matrix, one unit-length row per chunk; rows
+    # are mostly zeros, so this is over ten times smaller than the raw matrix
+    vectors = models.BinaryField()
+    weights = models.BinaryField(null=True)  # float32 per-dimension query weights (IDF), if any
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Index of {self.material_id} ({len(self.spans)} chunks)"
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only log of what a user did, for the activity feed. The text shown
+    is stored with the event so reading the feed needs no joins, and events
+    outlive the objects they mention.
+    """
+    MATERIAL = 'material'
+    CONTENT = 'content'
+    QUIZ = 'quiz'
+    RESULT = 'result'
+    KINDS = [
+        (MATERIAL, 'Material uploaded'),
+        (CONTENT, 'Content generated'),
+        (QUIZ, 'Quiz generated'),
+        (RESULT, 'Quiz completed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_events')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=500)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Each feed page is one range scan of this index
+            models.Index(fields=['user', 'created_at', 'id'], name='activityevent_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.action}"
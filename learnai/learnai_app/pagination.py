@@ -0,0 +1,31 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class NewestFirstPagination(CursorPagination):
+    """
+    Keyset pagination, newest rows first: each page continues from the last
+    row of the previous one, so deep pages cost the same as the first.
+    Responses are {"next": url, "previous": url, "results": [...]}.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class MaterialCursorPagination(NewestFirstPagination):
+    ordering = ('-uploaded_at', '-id')
+
+
+class ActivityCursorPagination(NewestFirstPagination):
+    pass
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Search results are ordered by rank rather than by a column, so they are
+    paged by number: {"count": n, "next": url, "previous": url, "results": [...]}.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
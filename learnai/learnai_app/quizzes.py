@@ -0,0 +1,184 @@
+"""
+Persistence of generated quizzes and submitted quiz results.
+
+Payloads are validated before anything is written. Every write then happens
+inside one transaction with a fixed number of queries, however many
+questions or answers there are: the questions and answers are inserted with
+bulk_create(), and a submission is graded against the quiz's cached answer
+key (see grading.py).
+"""
+from datetime import datetime
+
+from django.db import transaction
+
+from .db import retry_on_lock
+from .grading import grade
+from .models import Question, Quiz, QuizAnswer, QuizResult
+
+
+class InvalidQuizPayload(ValueError):
+    pass
+
+
+def _non_negative_int(value, name):
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise InvalidQuizPayload(f"{name} must be a non-negative whole number")
+    return value
+
+
+def build_questions(questions_data):
+    """
+    Unsaved Question objects for the question dicts of a generated quiz.
+    """
+    if not isinstance(questions_data, list):
+        raise InvalidQuizPayload("Quiz content must be a list of questions")
+    questions = []
+    for i, data in enumerate(questions_data):
+        if not isinstance(data, dict):
+            raise InvalidQuizPayload(f"Question {i + 1} is not an object")
+        options = data.get('options', [])
+        if not isinstance(options, list):
+            raise InvalidQuizPayload(f"Options of question {i + 1} must be a list")
+        questions.append(Question(
+            question_text=str(data.get('question_text', '')),
+            answer=str(data.get('answer', '')),
+            options=options,
+        ))
+    return questions
+
+
+def without_answers(questions_data):
+    """
+    The question dicts of a generated quiz without their answers, for
+    storing and sending to the client. The answers are kept on the Question
+    rows only, where grading reads them.
+    """
+    return [
+        {field: value for field, value in data.items() if field != 'answer'} if isinstance(data, dict) else data
+        for data in questions_data
+    ]
+
+
+def create_quiz(user, material, questions_data):
+    """
+    Create a quiz with its questions. Nothing is written if the payload is
+    invalid.
+    """
+    questions = build_questions(questions_data)
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            user=user,
+            material=material,
+            title=f"Quiz: {material.title} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        )
+        for question in questions:
+            question.quiz = quiz
+        Question.objects.bulk_create(questions)
+    return quiz
+
+
+def parse_answers(answers):
+    """
+    Validate submitted answers: a list of {'questionId': int, 'selected': str}.
+    Returns (question_id, selected) pairs. Any 'correct' flag sent by older
+    clients is ignored; answers are graded here.
+    """
+    if not isinstance(answers, list):
+        raise InvalidQuizPayload("answers must be a list")
+    parsed = []
+    for i, answer in enumerate(answers):
+        if not isinstance(answer, dict) or not {'questionId', 'selected'} <= answer.keys():
+            raise InvalidQuizPayload(f"Answer {i + 1} needs questionId and selected")
+        parsed.append((
+            _non_negative_int(answer['questionId'], 'questionId'),
+            str(answer['selected']),
+        ))
+    return parsed
+
+
+@retry_on_lock
+def save_result(user, quiz, answers, is_retake=False):
+    """
+    Grade a quiz submission and record it with its answers. Answers to
+    questions that aren't part of the quiz are ignored. Returns the
+    QuizResult and the graded answers, see grading.grade().
+    """
+    score, total_questions, graded = grade(quiz, parse_answers(answers))
+
+    with transaction.atomic():
+        # If it's a retake, mark previous results as not completed
+        if is_retake:
+            QuizResult.objects.filter(user=user, quiz=quiz, completed=True).update(completed=False)
+
+        quiz_result = QuizResult.objects.create(
+            user=user,
+            quiz=quiz,
+            score=score,
+            total_questions=total_questions,
+            completed=True
+        )
+        QuizAnswer.objects.bulk_create([
+            QuizAnswer(
+                quiz_result=quiz_result,
+                question_id=question_id,
+                selected_option=selected,
+                is_correct=is_correct,
+            )
+            for question_id, selected, is_correct in graded
+        ])
+        Quiz.objects.filter(id=quiz.id).update(
+            latest_result=quiz_result,
+            is_completed=True,
+            latest_score=score,
+            latest_total=total_questions,
+        )
+    return quiz_result, graded
+
+
+def reset_for_retake(user, quiz):
+    """
+    Mark the user's completed results of a quiz as not completed (they stay
+    in the history) so the quiz can be taken again.
+    """
+    with transaction.atomic():
+        QuizResult.objects.filter(user=user, quiz=quiz, completed=True).update(completed=False)
+        Quiz.objects.filter(id=quiz.id).update(
+            latest_result=None, is_completed=False, latest_score=0, latest_total=0,
+        )
+
+
+def refresh_latest_results(quiz_ids, batch_size=500):
+    """
+    Recompute the latest-result columns of the given quizzes from their
+    results, batch_size quizzes per query. Returns the number of quizzes
+    updated.
+    """
+    quiz_ids = list(quiz_ids)
+    updated = 0
+    for start in range(0, len(quiz_ids), batch_size):
+        batch = quiz_ids[start:start + batch_size]
+        latest = {}
+        results = (
+            QuizResult.objects.filter(quiz_id__in=batch, completed=True)
+            .order_by('quiz_id', '-completed_at', '-id')
+            .values_list('quiz_id', 'id', 'score', 'total_questions')
+        )
+        for quiz_id, result_id, score, total_questions in results:
+            latest.setdefault(quiz_id, (result_id, score, total_questions))
+
+        quizzes = list(Quiz.objects.filter(id__in=batch).only(
+            'id', 'latest_result', 'is_completed', 'latest_score', 'latest_total',
+        ))
+        for quiz in quizzes:
+            result_id, score, total_questions = latest.get(quiz.id, (None, 0, 0))
+            quiz.latest_result_id = result_id
+            quiz.is_completed = result_id is not None
+            quiz.latest_score = score
+            quiz.latest_total = total_questions
+        Quiz.objects.bulk_update(
+            quizzes, ['latest_result', 'is_completed', 'latest_score', 'latest_total'], batch_size=batch_size,
+        )
+        updated += len(quizzes)
+    return updated
@@ -0,0 +1,301 @@
+"""
+Retrieval over the chunks of a material, so prompts can be built from the
+parts of a long material that matter instead of all of it.
+
+A material's extracted text is cut into chunks of RETRIEVAL_CHUNK_TOKENS
+and each chunk is turned into a vector by the RETRIEVAL_VECTORIZER. The
+vectors are stored as one compressed float32 matrix per material
+(MaterialIndex), built by the extraction worker once the text is known, or
+on first use. Rows have unit length, so scoring every chunk against a query
+is a single matrix-vector product.
+
+Prompts are filled with chunks picked by maximal marginal relevance (MMR):
+each pick is the chunk most relevant to the query that is also least like
+the chunks already picked, until the token budget is used up. For quizzes
+and flashcards the query is the material as a whole, which favours chunks
+that are central to it while still covering its different parts.
+"""
+import hashlib
+import logging
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .chunking import chunk_text
+from .models import MaterialIndex
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Words too common to say anything about what a chunk is about
+STOP_WORDS = frozenset("""
+a about above after again all also an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our out over own same she should so some such than that the their them then there these they this
+those through to too under until up very was we were what when where which while who whom why will with
+would you your
+""".split())
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+@lru_cache(maxsize=65536)
+def _bucket(term, dimensions):
+    # crc32 rather than hash(), which differs between processes
+    return zlib.crc32(term.encode('utf-8')) % dimensions
+
+
+class HashingVectorizer:
+    """
+    TF-IDF over hashed words and word pairs. Needs no vocabulary and no
+    training, so any text can be indexed on its own; the IDF weights are
+    computed over the chunks of the one material.
+    """
+
+    def __init__(self, dimensions=None, ngrams=2):
+        self.dimensions = dimensions or _setting('RETRIEVAL_DIMENSIONS', 2048)
+        self.ngrams = ngrams
+
+    @property
+    def name(self):
+        return f'hashing-tfidf-{self.dimensions}-{self.ngrams}'
+
+    def _terms(self, text):
+        words = [w for w in TOKEN_RE.findall(text.lower()) if w not in STOP_WORDS]
+        terms = list(words)
+        for n in range(2, self.ngrams + 1):
+            terms.extend(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return terms
+
+    def buckets(self, text):
+        """
+        The hashed dimension of every term of text, repeats included.
+        """
+        return [_bucket(term, self.dimensions) for term in self._terms(text)]
+
+    def _counts(self, texts):
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            buckets = self.buckets(text)
+            rows.extend([row] * len(buckets))
+            columns.extend(buckets)
+        counts = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1)
+        # Sublinear term frequency: the tenth repetition of a word adds less
+        # than the second
+        np.log1p(counts, out=counts)
+        return counts
+
+    def fit_transform(self, texts):
+        """
+        Vectors for the chunks of one material, and the weights to apply to
+        queries against them.
+        """
+        counts = self._counts(texts)
+        document_frequency = np.count_nonzero(counts, axis=0)
+        weights = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return normalize(counts * weights), weights
+
+    def transform(self, texts, weights):
+        return normalize(self._counts(texts) * weights)
+
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+@lru_cache(maxsize=None)
+def vectorizer():
+    return import_string(_setting('RETRIEVAL_VECTORIZER', 'learnai_app.retrieval.HashingVectorizer'))()
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_spans(text, max_tokens):
+    """
+    [start, end] offsets of the chunks of text (see chunking.py).
+    """
+    spans = []
+    position = 0
+    for chunk in chunk_text(text, max_tokens):
+        start = text.index(chunk, position)
+        position = start + len(chunk)
+        spans.append([start, position])
+    return spans
+
+
+class ChunkIndex:
+    """
+    A loaded MaterialIndex together with the text it was built from.
+    """
+
+    def __init__(self, text, spans, vectors, weights):
+        self.text = text
+        self.spans = spans
+        self.vectors = vectors
+        self.weights = weights
+        self.tokens = np.array([estimate_tokens(text[start:end]) for start, end in spans])
+
+    @classmethod
+    def from_model(cls, index, text):
+        if not index.spans:
+            return cls(text, [], np.zeros((0, 0), dtype=np.float32), None)
+        vectors = np.frombuffer(zlib.decompress(index.vectors), dtype=np.float32).reshape(len(index.spans), -1)
+        weights = np.frombuffer(bytes(index.weights), dtype=np.float32) if index.weights is not None else None
+        return cls(text, index.spans, vectors, weights)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def chunk(self, i):
+        start, end = self.spans[i]
+        return self.text[start:end]
+
+    def query_vector(self, query):
+        return vectorizer().transform([query], self.weights)[0]
+
+    def centroid(self):
+        """
+        The direction of the material as a whole.
+        """
+        return normalize(self.vectors.mean(axis=0))
+
+    def top_k(self, query_vector, k):
+        """
+        The k chunks most similar to the query: [(chunk, score)], best first.
+        """
+        scores = self.vectors @ query_vector
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def select(self, query_vector, token_budget, relevance_weight=None, candidates=None):
+        """
+        Chunks to fill a prompt with: picked by MMR among the most relevant
+        candidates until token_budget is spent, returned in document order
+        as [(chunk, score)].
+        """
+        relevance_weight = relevance_weight if relevance_weight is not None else _setting('RETRIEVAL_MMR_LAMBDA', 0.7)
+        top = self.top_k(query_vector, candidates or _setting('RETRIEVAL_CANDIDATES', 64))
+        if not top:
+            return []
+        order = np.array([i for i, _ in top])
+        relevance = np.array([score for _, score in top])
+        vectors = self.vectors[order]
+        similarity = np.zeros(len(order))  # to the closest chunk picked so far
+        available = np.ones(len(order), dtype=bool)
+        picked, used = [], 0
+        while available.any():
+            scores = relevance_weight * relevance - (1 - relevance_weight) * similarity
+            scores[~available] = -np.inf
+            j = int(np.argmax(scores))
+            available[j] = False
+            tokens = int(self.tokens[order[j]])
+            if used + tokens > token_budget:
+                continue  # a smaller chunk may still fit
+            picked.append((int(order[j]), float(relevance[j])))
+            used += tokens
+            similarity = np.maximum(similarity, vectors @ vectors[j])
+        return sorted(picked)
+
+    def excerpt(self, picked, separator='\n\n[...]\n\n'):
+        return separator.join(self.chunk(i).strip() for i, _ in picked)
+
+
+def build_index(material):
+    """
+    Index the material's extracted text, replacing any older index.
+    """
+    text = material.extracted_text or ''
+    spans = chunk_spans(text, _setting('RETRIEVAL_CHUNK_TOKENS', 256)) if text.strip() else []
+    chunks = [text[start:end] for start, end in spans]
+    if chunks:
+        vectors, weights = vectorizer().fit_transform(chunks)
+    else:
+        vectors, weights = np.zeros((0, 0), dtype=np.float32), None
+    MaterialIndex.objects.update_or_create(material=material, defaults={
+        'text_digest': text_digest(text),
+        'vectorizer': vectorizer().name,
+        'spans': spans,
+        'vectors': zlib.compress(vectors.astype(np.float32).tobytes(), 1),
+        'weights': weights.astype(np.float32).tobytes() if weights is not None else None,
+    })
+    return ChunkIndex(text, spans, vectors, weights)
+
+
+def get_index(material):
+    """
+    The material's ChunkIndex, built now if it is missing or out of date.
+    """
+    text = material.extracted_text or ''
+    index = MaterialIndex.objects.filter(material=material).first()
+    if index is None or index.text_digest != text_digest(text) or index.vectorizer != vectorizer().name:
+        return build_index(material)
+    return ChunkIndex.from_model(index, text)
+
+
+def prompt_text(material, content_type):
+    """
+    The text to generate content_type from. For types in
+    RETRIEVAL_CONTENT_TYPES, materials over RETRIEVAL_PROMPT_TOKENS are cut
+    down to their most central, least redundant chunks; everything else
+    gets the whole text.
+    """
+    text = material.extracted_text or ''
+    budget = _setting('RETRIEVAL_PROMPT_TOKENS', 6000)
+    if content_type not in _setting('RETRIEVAL_CONTENT_TYPES', ['quiz', 'flashcards']) or estimate_tokens(text) <= budget:
+        return text
+    index = get_index(material)
+    picked = index.select(index.centroid(), budget)
+    logger.info(f"Prompt for {content_type} of material {material.id}: {len(picked)} of {len(index)} chunks")
+    return index.excerpt(picked)
+
+
+def question_context(material, question):
+    """
+    Excerpts of the material relevant to a question, within
+    RETRIEVAL_ASK_TOKENS. Returns (text, sources), sources being where each
+    excerpt is in the text, in document order; ('', []) if nothing matches.
+    """
+    index = get_index(material)
+    if not len(index):
+        return '', []
+    budget = _setting('RETRIEVAL_ASK_TOKENS', 3000)
+    # Hashed terms can collide, so a chunk also has to share a word with the
+    # question to count as a match
+    words = {w for w in TOKEN_RE.findall(question.lower()) if w not in STOP_WORDS}
+    picked = [
+        (i, score) for i, score in index.select(index.query_vector(question), budget)
+        if score > 0 and words & set(TOKEN_RE.findall(index.chunk(i).lower()))
+    ]
+    sources = [
+        {'chunk': i, 'start': index.spans[i][0], 'end': index.spans[i][1], 'score': round(score, 4)}
+        for i, score in picked
+    ]
+    return index.excerpt(picked), sources
+
+
+def index_material(material):
+    """
+    Build a material's index after extraction. Failures are logged, since
+    get_index() builds the index on first use anyway.
+    """
+    try:
+        build_index(material)
+    except Exception as e:
+        logger.error(f"Indexing material {material.id} failed: {e}")
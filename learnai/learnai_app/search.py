@@ -0,0 +1,329 @@
+"""
+Full-text search over study materials and generated notes and summaries.
+
+Documents live in a search index kept next to the rows they come from: the
+signal handlers in signals.py update it on every save and delete, in the
+same transaction, and code writing rows with bulk_create() or update()
+calls index_materials() itself. The index is picked with SEARCH_BACKEND;
+the default is an SQLite FTS5 table (created in migration 0022), ranked
+with BM25 with title matches counting ten times as much as body matches.
+
+A user's documents are found through an 'owner' token indexed with every
+document, so a search only reads the index entries of the one user.
+
+The FTS5 table is contentless: it holds the index but no copy of the text,
+which stays compressed in the rows it came from (see fields.py). Snippets
+are cut from those rows, for the one page of hits being shown. A
+contentless table can't delete an entry without being given the text it
+was indexed from, so each document is indexed under a fresh rowid and the
+learnai_search_document table maps documents to their current rowid;
+searches only return current rowids. The terms of replaced entries stay
+in the index, unreachable, until rebuild_search_index is run.
+"""
+import html
+import json
+import re
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils.module_loading import import_string
+
+from .models import GeneratedContent, StudyMaterial
+
+MATERIAL = 'material'
+CONTENT = 'content'
+KINDS = [MATERIAL, CONTENT]
+
+# Generated content types worth searching; flashcards and quizzes are
+# found through the material they were made from
+CONTENT_TYPES = ['summary', 'notes']
+
+Document = namedtuple('Document', 'kind object_id user_id material_id content_type title body')
+Hit = namedtuple('Hit', 'kind object_id material_id content_type title snippet')
+
+TERM_RE = re.compile(r'\w+')
+# Placeholders for the start and end of a match, replaced with <mark> once
+# the text around them is escaped
+MATCH_START, MATCH_END = '\x02', '\x03'
+# A snippet starts this many words before the first match
+SNIPPET_LEAD_WORDS = 4
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def plain_text(content):
+    """
+    The text of generated content, which is either plain text or JSON.
+    """
+    if not content.startswith(('[', '{')):
+        return content
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    strings = []
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return '\n'.join(strings)
+
+
+def query_terms(query):
+    return TERM_RE.findall(query.lower())[:_setting('SEARCH_MAX_TERMS', 16)]
+
+
+def match_expression(terms):
+    """
+    An FTS5 query for the words typed by a user: every word must appear,
+    and the last one may be the start of a word, for search as you type.
+    """
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return ' '.join(phrases)
+
+
+def match_pattern(terms):
+    """
+    A regex finding the words of a search in text, to mark them in titles
+    and snippets. Words the index matched only after stemming, like
+    'running' for 'run', aren't marked.
+    """
+    words = [re.escape(term) + r'\b' for term in terms[:-1]] + [re.escape(terms[-1]) + r'\w*']
+    return re.compile(r'\b(?:' + '|'.join(words) + ')', re.IGNORECASE)
+
+
+def _marked(text):
+    return html.escape(text).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+def _mark(pattern, text):
+    return pattern.sub(lambda match: MATCH_START + match.group(0) + MATCH_END, text)
+
+
+def snippet(text, pattern, words):
+    """
+    About words words of text from just before the first match of pattern
+    (or from the start, if nothing matches), with the matches marked, as
+    escaped HTML.
+    """
+    match = pattern.search(text)
+    start = match.start() if match else 0
+    lead = list(TERM_RE.finditer(text, max(start - 100, 0), start))[-SNIPPET_LEAD_WORDS:]
+    if lead:
+        start = lead[0].start()
+    end = start
+    for word in islice(TERM_RE.finditer(text, start), words):
+        end = word.end()
+    if not TERM_RE.search(text, end):
+        end = len(text)  # only punctuation left
+    marked = _marked(_mark(pattern, text[start:end]))
+    return ('…' if start > 0 else '') + marked + ('…' if end < len(text) else '')
+
+
+class SearchResults:
+    """
+    The hits of a search, best first, fetched a slice at a time. Works as
+    the object list of a Django Paginator.
+    """
+
+    def __init__(self, backend, user_id, terms, kind=None):
+        self.backend = backend
+        self.user_id = user_id
+        self.terms = terms
+        self.kind = kind
+
+    def count(self):
+        return self.backend.count(self.user_id, self.terms, self.kind)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("SearchResults only supports slicing")
+        offset = index.start or 0
+        return self.backend.hits(self.user_id, self.terms, self.kind, offset, index.stop - offset)
+
+
+class FTS5SearchBackend:
+    # See migration 0022
+    table = 'learnai_search'
+    documents_table = 'learnai_search_document'
+    ranking = 'bm25(10.0, 1.0, 0.0)'
+    snippet_tokens = 24
+
+    def _document(self, kind, object_id):
+        # Materials and content share the table, so their ids are interleaved
+        return object_id * 2 + KINDS.index(kind)
+
+    def _owner(self, user_id):
+        return f'u{user_id}'
+
+    def _forget(self, cursor, documents):
+        cursor.executemany(
+            f'DELETE FROM {self.documents_table} WHERE document = %s',
+            [(document,) for document in documents],
+        )
+
+    def index(self, documents, using='default'):
+        documents = list(documents)
+        if not documents:
+            return
+        with connections[using].cursor() as cursor:
+            self._forget(cursor, [self._document(d.kind, d.object_id) for d in documents])
+            rows = []
+            for d in documents:
+                # AUTOINCREMENT, so a rowid whose terms are still in the
+                # index is never given to another document
+                cursor.execute(
+                    f'INSERT INTO {self.documents_table} (document, material_id, content_type) '
+                    f'VALUES (%s, %s, %s) RETURNING id',
+                    [self._document(d.kind, d.object_id), d.material_id, d.content_type],
+                )
+                rows.append((cursor.fetchone()[0], d.title, d.body, self._owner(d.user_id)))
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, body, owner) VALUES (%s, %s, %s, %s)', rows,
+            )
+
+    def remove(self, kind, object_ids, using='default'):
+        with connections[using].cursor() as cursor:
+            self._forget(cursor, [self._document(kind, object_id) for object_id in object_ids])
+
+    def clear(self, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.documents_table}')
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('delete-all')")
+
+    def _from_where(self, user_id, terms, kind):
+        sql = (
+            f'{self.table} JOIN {self.documents_table} d ON d.id = {self.table}.rowid '
+            f'WHERE {self.table} MATCH %s'
+        )
+        params = [f'owner : "{self._owner(user_id)}" AND {{title body}} : ({match_expression(terms)})']
+        if kind:
+            sql += ' AND d.document %% 2 = %s'
+            params.append(KINDS.index(kind))
+        return sql, params
+
+    def _connection(self):
+        return connections[router.db_for_read(StudyMaterial)]
+
+    def count(self, user_id, terms, kind=None):
+        from_where, params = self._from_where(user_id, terms, kind)
+        with self._connection().cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {from_where}', params)
+            return cursor.fetchone()[0]
+
+    def hits(self, user_id, terms, kind=None, offset=0, limit=20):
+        from_where, params = self._from_where(user_id, terms, kind)
+        with self._connection().cursor() as cursor:
+            cursor.execute(
+                f'SELECT d.document, d.material_id, d.content_type FROM {from_where} '
+                f'AND {self.table}.rank MATCH %s ORDER BY {self.table}.rank LIMIT %s OFFSET %s',
+                [*params, self.ranking, limit, offset],
+            )
+            rows = cursor.fetchall()
+        return self._hits(rows, match_pattern(terms))
+
+    def _hits(self, rows, pattern):
+        """
+        Hits for (document, material_id, content_type) rows, in order, with
+        the title and snippet cut from the rows the documents came from.
+        Documents whose row is gone by now are dropped.
+        """
+        if not rows:
+            return []
+        ids = {kind: [document // 2 for document, _, _ in rows if document % 2 == i] for i, kind in enumerate(KINDS)}
+        marked = {}  # (kind, object_id) -> (title, snippet)
+        # A snippet is cut as soon as its row is read, so only one
+        # decompressed text is held at a time
+        materials = StudyMaterial.objects.filter(id__in=ids[MATERIAL]).only('id', 'title', 'extracted_text')
+        for material in materials.iterator(chunk_size=len(rows)):
+            marked[MATERIAL, material.id] = (
+                _marked(_mark(pattern, material.title)),
+                snippet(material.extracted_text or '', pattern, self.snippet_tokens),
+            )
+        contents = GeneratedContent.objects.filter(id__in=ids[CONTENT]).select_related('material').only(
+            'id', 'content', 'material__title',
+        )
+        for content in contents.iterator(chunk_size=len(rows)):
+            marked[CONTENT, content.id] = (
+                _marked(_mark(pattern, content.material.title)),
+                snippet(plain_text(content.content), pattern, self.snippet_tokens),
+            )
+
+        hits = []
+        for document, material_id, content_type in rows:
+            kind, object_id = KINDS[document % 2], document // 2
+            if (kind, object_id) in marked:
+                title, body_snippet = marked[kind, object_id]
+                hits.append(Hit(kind, object_id, material_id, content_type or None, title, body_snippet))
+        return hits
+
+    def search(self, user_id, query, kind=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        return SearchResults(self, user_id, terms, kind)
+
+
+@lru_cache(maxsize=None)
+def backend():
+    return import_string(_setting('SEARCH_BACKEND', 'learnai_app.search.FTS5SearchBackend'))()
+
+
+def material_document(material):
+    return Document(MATERIAL, material.id, material.user_id, material.id, '',
+                    material.title, material.extracted_text or '')
+
+
+def content_document(content, title):
+    return Document(CONTENT, content.id, content.user_id, content.material_id, content.content_type,
+                    title, plain_text(content.content))
+
+
+def index_materials(materials, using='default'):
+    backend().index((material_document(material) for material in materials), using=using)
+
+
+def index_contents(contents, using='default'):
+    """
+    Index generated content; types outside CONTENT_TYPES are skipped.
+    Content is found by the title of its material, so select_related the
+    material when indexing many rows.
+    """
+    backend().index(
+        (content_document(content, content.material.title) for content in contents
+         if content.content_type in CONTENT_TYPES),
+        using=using,
+    )
+
+
+def index_material_contents(material, using='default'):
+    """
+    Re-index the content generated from a material, after its title changed.
+    """
+    contents = GeneratedContent.objects.using(using).filter(material=material, content_type__in=CONTENT_TYPES)
+    backend().index((content_document(content, material.title) for content in contents), using=using)
+
+
+def remove(kind, object_ids, using='default'):
+    backend().remove(kind, object_ids, using=using)
+
+
+def search(user, query, kind=None):
+    """
+    The user's documents matching the query, best first; see SearchResults.
+    """
+    return backend().search(user.id, query, kind)
@@ -1,7 +1,48 @@
 from rest_framework import serializers
-from .models import StudyMaterial, GeneratedContent, Quiz, Question, QuizAnswer, QuizResult
+from .models import StudyMaterial, GeneratedContent, Quiz, Question, QuizAnswer, QuizResult, ActivityEvent
 from django.contrib.auth.models import User
 
+
+def _query_list(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients shape list responses. Fields named in Meta.expandable_fields
+    (the large text columns) are left out unless asked for with
+    ?expand=extracted_text, and ?fields=id,title keeps only the fields listed.
+    Only applies to GET requests.
+    """
+
+    @classmethod
+    def selected_fields(cls, request):
+        expandable = set(cls.Meta.expandable_fields)
+        expand = _query_list(request, 'expand')
+        only = _query_list(request, 'fields')
+        return [
+            field for field in cls.Meta.fields
+            if (field not in expandable or field in expand) and (not only or field in only)
+        ]
+
+    @classmethod
+    def deferred_fields(cls, request):
+        """
+        The large columns the response won't include, for QuerySet.defer().
+        """
+        selected = cls.selected_fields(request)
+        return [field for field in cls.Meta.expandable_fields if field not in selected]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            selected = set(self.selected_fields(request))
+            for field in list(self.fields):
+                if field not in selected:
+                    self.fields.pop(field)
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -12,24 +53,32 @@ class StudyMaterialSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = StudyMaterial
-        fields = ['id', 'user', 'title', 'file', 'file_type', 'extracted_text', 'uploaded_at', 'processed']
-        read_only_fields = ['file_type', 'extracted_text', 'uploaded_at', 'processed']
+        fields = ['id', 'user', 'title', 'file', 'file_type', 'extracted_text', 'text_truncated', 'uploaded_at', 'processed', 'previous_revision', 'revision']
+        read_only_fields = ['file_type', 'extracted_text', 'text_truncated', 'uploaded_at', 'processed', 'previous_revision', 'revision']
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+class StudyMaterialRevisionSerializer(StudyMaterialSerializer):
+    # A revision keeps the title of the material it replaces unless given one
+    title = serializers.CharField(max_length=255, required=False)
+
+class StudyMaterialListSerializer(DynamicFieldsMixin, StudyMaterialSerializer):
+    class Meta(StudyMaterialSerializer.Meta):
+        expandable_fields = ['extracted_text']
+
 class GeneratedContentSerializer(serializers.ModelSerializer):
     class Meta:
         model = GeneratedContent
-        fields = ['id', 'material', 'content_type', 'content', 'created_at']
+        fields = ['id', 'material', 'content_type', 'content', 'original_tokens', 'sent_tokens', 'created_at']
+        read_only_fields = ['original_tokens', 'sent_tokens']
+
+class GeneratedContentListSerializer(DynamicFieldsMixin, GeneratedContentSerializer):
+    class Meta(GeneratedContentSerializer.Meta):
+        expandable_fields = ['content']
 
 class QuizSerializer(serializers.ModelSerializer):
-    # These field names must match the annotated fields in the view
-    is_completed = serializers.BooleanField(read_only=True, default=False)
-    latest_score = serializers.IntegerField(read_only=True, default=0)
-    latest_total = serializers.IntegerField(read_only=True, default=0)
-    
     class Meta:
         model = Quiz
         fields = [
@@ -41,12 +90,19 @@ class QuizSerializer(serializers.ModelSerializer):
             'latest_score',
             'latest_total'
         ]
+        read_only_fields = ['is_completed', 'latest_score', 'latest_total']
 
 class QuestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = ['id', 'quiz', 'question_text', 'answer', 'options']
 
+class QuizQuestionSerializer(serializers.ModelSerializer):
+    # For taking a quiz: everything but the answer
+    class Meta:
+        model = Question
+        fields = ['id', 'quiz', 'question_text', 'options']
+
 
 class QuizResultSerializer(serializers.ModelSerializer):
     class Meta:
@@ -56,4 +112,25 @@ class QuizResultSerializer(serializers.ModelSerializer):
 class QuizAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuizAnswer
-        fields = ['question', 'selected_option', 'is_correct']
\ No newline at end of file
+        fields = ['question', 'selected_option', 'is_correct']
+
+class ActivityEventSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='kind', read_only=True)
+    time = serializers.DateTimeField(source='created_at', read_only=True)
+
+    class Meta:
+        model = ActivityEvent
+        fields = ['id', 'type', 'object_id', 'action', 'time']
+
+
+class SearchHitSerializer(serializers.Serializer):
+    """
+    A search result (see search.Hit). title and snippet are HTML-escaped
+    text with the matched words wrapped in <mark>.
+    """
+    type = serializers.CharField(source='kind')
+    id = serializers.IntegerField(source='object_id')
+    material_id = serializers.IntegerField()
+    content_type = serializers.CharField(allow_null=True)
+    title = serializers.CharField()
+    snippet = serializers.CharField()
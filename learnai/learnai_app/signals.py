@@ -0,0 +1,91 @@
+"""
+Signal handlers keeping the dashboard counters (see stats.py) in step with
+the rows they count, writing the activity feed (see activity.py), keeping
+the search index up to date (see search.py) and retiring cached answer keys
+(see grading.py). Connected in LearnaiAppConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import activity, grading, search, stats
+from .quizzes import refresh_latest_results
+from .models import GeneratedContent, Question, Quiz, QuizResult, StudyMaterial
+
+
+# Fields that are part of a material's search document
+MATERIAL_SEARCH_FIELDS = {'title', 'extracted_text'}
+
+
+@receiver(post_save, sender=StudyMaterial)
+def material_saved(sender, instance, created, raw=False, using='default', update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.adjust(instance.user_id, materials_count=1)
+        activity.record(activity.material_event(instance))
+    if created or update_fields is None or MATERIAL_SEARCH_FIELDS & set(update_fields):
+        search.index_materials([instance], using=using)
+    if not created and (update_fields is None or 'title' in update_fields):
+        search.index_material_contents(instance, using=using)
+
+
+@receiver(post_delete, sender=StudyMaterial)
+def material_deleted(sender, instance, using='default', **kwargs):
+    stats.adjust(instance.user_id, materials_count=-1)
+    search.remove(search.MATERIAL, [instance.id], using=using)
+
+
+@receiver(post_save, sender=GeneratedContent)
+def content_saved(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    if created:
+        if instance.content_type == 'summary':
+            stats.adjust(instance.user_id, summaries_count=1)
+        # Quizzes get their event when the Quiz itself is created
+        if instance.content_type != 'quiz':
+            activity.record(activity.content_event(instance))
+    search.index_contents([instance], using=using)
+
+
+@receiver(post_delete, sender=GeneratedContent)
+def content_deleted(sender, instance, using='default', **kwargs):
+    if instance.content_type == 'summary':
+        stats.adjust(instance.user_id, summaries_count=-1)
+    if instance.content_type in search.CONTENT_TYPES:
+        search.remove(search.CONTENT, [instance.id], using=using)
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(instance.user_id, quizzes_count=1)
+        activity.record(activity.quiz_event(instance))
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    stats.adjust(instance.user_id, quizzes_count=-1)
+
+
+@receiver(post_save, sender=QuizResult)
+def quiz_result_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(instance.user_id, quizzes_taken=1)
+        activity.record(activity.result_event(instance))
+
+
+@receiver(post_delete, sender=QuizResult)
+def quiz_result_deleted(sender, instance, **kwargs):
+    stats.adjust(instance.user_id, quizzes_taken=-1)
+    # Deleting the latest result nulled the quiz's pointer to it but left
+    # the copied score; point the quiz at its previous result instead
+    if Quiz.objects.filter(id=instance.quiz_id, latest_result__isnull=True, is_completed=True).exists():
+        refresh_latest_results([instance.quiz_id])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        grading.invalidate(instance.quiz_id)
@@ -0,0 +1,112 @@
+"""
+Per-user dashboard statistics.
+
+The counts live on UserProfile and are kept up to date with atomic F()
+updates whenever materials, generated content, quizzes and quiz results are
+created or deleted (see signals.py). Code that bypasses model signals, like
+bulk_create(), calls adjust() itself. The dashboard endpoints read a snapshot
+of the counters that is cached per user and dropped on every change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import GeneratedContent, Quiz, StudyMaterial, UserProfile
+
+COUNTERS = (
+    'materials_count',
+    'quizzes_count',
+    'summaries_count',
+    'summaries_generated',
+    'notes_generated',
+    'flashcards_generated',
+    'quizzes_taken',
+)
+
+# Bumped on every generation of these types, including regenerations
+GENERATION_COUNTERS = {
+    'summary': 'summaries_generated',
+    'notes': 'notes_generated',
+    'flashcards': 'flashcards_generated',
+}
+
+
+def _cache_key(user_id):
+    return f'user-stats:{user_id}'
+
+
+def invalidate(user_id):
+    # After commit, so a concurrent reader can't cache the old counts again
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+def current_counts(user_id):
+    """
+    The row counts kept on UserProfile, counted from the tables.
+    """
+    return {
+        'materials_count': StudyMaterial.objects.filter(user_id=user_id).count(),
+        'quizzes_count': Quiz.objects.filter(user_id=user_id).count(),
+        'summaries_count': GeneratedContent.objects.filter(user_id=user_id, content_type='summary').count(),
+    }
+
+
+def _create_profile(user_id, deltas):
+    """
+    Create a missing profile. The row counts are taken from the tables, which
+    already include the change being recorded; event counters start at their
+    delta.
+    """
+    values = current_counts(user_id)
+    for field, delta in deltas.items():
+        values.setdefault(field, max(delta, 0))
+    try:
+        with transaction.atomic():
+            return UserProfile.objects.create(user_id=user_id, **values)
+    except IntegrityError:
+        # Created concurrently; record the change on that one instead
+        _update(user_id, deltas)
+        return None
+
+
+def _update(user_id, deltas):
+    return UserProfile.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+    })
+
+
+def adjust(user_id, **deltas):
+    """
+    Atomically add deltas to a user's counters, e.g.
+    adjust(user.id, materials_count=3). Decrements never go below zero and
+    never create a profile, so deleting a user doesn't recreate theirs.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if not _update(user_id, deltas) and any(delta > 0 for delta in deltas.values()):
+        _create_profile(user_id, deltas)
+    invalidate(user_id)
+
+
+def record_generation(user_id, content_type):
+    field = GENERATION_COUNTERS.get(content_type)
+    if field:
+        adjust(user_id, **{field: 1})
+
+
+def snapshot(user_id):
+    """
+    A dict of every counter for a user, from the cache or from one query.
+    """
+    key = _cache_key(user_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = UserProfile.objects.filter(user_id=user_id).values(*COUNTERS).first()
+        if stats is None:
+            _create_profile(user_id, {})
+            stats = UserProfile.objects.filter(user_id=user_id).values(*COUNTERS).get()
+        cache.set(key, stats, getattr(settings, 'STATS_CACHE_TIMEOUT', 300))
+    return stats
@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from learnai_app.models import GeneratedContent, Quiz, StudyMaterial
+
+
+def generated(material_text, content_types, texts=None):
+    for content_type in content_types:
+        if content_type == 'quiz':
+            content = [{'question_text': 'Question?', 'answer': 'A', 'options': ['A', 'B']}]
+        else:
+            content = f"Generated {content_type}"
+        yield content_type, {'content': content, 'type': content_type, 'input_tokens': 10}
+
+
+@mock.patch('learnai_app.views.iter_generate_many', side_effect=generated)
+class BatchGenerationTests(TestCase):
+    """
+    The batch endpoint saves every result of a request in one transaction.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='batch')
+        self.material = StudyMaterial.objects.create(
+            user=self.user, title='Material', file='batch.txt', file_type='txt',
+            extracted_text='Some text to generate from.', processed=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, content_types):
+        return self.client.post('/api/generate-content/batch/', {
+            'material_id': self.material.id, 'content_types': content_types,
+        }, format='json')
+
+    def test_saves_every_result(self, iter_generate_many):
+        response = self.post(['summary', 'flashcards', 'quiz'])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(list(results), ['summary', 'flashcards', 'quiz'])
+        self.assertEqual(results['summary']['content'], 'Generated summary')
+        self.assertEqual(
+            set(GeneratedContent.objects.filter(material=self.material).values_list('content_type', flat=True)),
+            {'summary', 'flashcards', 'quiz'},
+        )
+        self.assertEqual(Quiz.objects.get().id, results['quiz']['quiz_id'])
+
+    def test_failed_save_rolls_back_every_result(self, iter_generate_many):
+        record_generation = mock.patch('learnai_app.views.stats.record_generation', side_effect=[None, RuntimeError('disk full')])
+        with record_generation, self.assertLogs('django.request', 'ERROR'):
+            response = self.post(['summary', 'notes'])
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'disk full'})
+        self.assertFalse(GeneratedContent.objects.exists())
+
+    def test_existing_content_is_not_generated_again(self, iter_generate_many):
+        GeneratedContent.objects.create(user=self.user, material=self.material, content_type='summary', content='Old summary')
+        response = self.post(['summary', 'notes'])
+        self.assertEqual(response.json()['results']['summary']['content'], 'Old summary')
+        self.assertEqual(iter_generate_many.call_args.args[1], ['notes'])
@@ -0,0 +1,99 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from learnai_app import compression
+from learnai_app.models import StudyMaterial
+
+TEXT = 'The mitochondria is the powerhouse of the cell. ' * 40
+
+
+class CompressionTests(SimpleTestCase):
+
+    def test_zlib_round_trip(self):
+        value = compression.compress(TEXT, codec='zlib')
+        self.assertEqual(value[:1], compression.ZLIB)
+        self.assertLess(len(value), len(TEXT))
+        self.assertEqual(compression.decompress(value), TEXT)
+
+    def test_short_values_are_stored_raw(self):
+        value = compression.compress('Short – text')
+        self.assertEqual(value, compression.RAW + 'Short – text'.encode('utf-8'))
+        self.assertEqual(compression.decompress(value), 'Short – text')
+
+    def test_unknown_codec_and_tag(self):
+        with self.assertRaises(ImproperlyConfigured):
+            compression.compress(TEXT, codec='lzma')
+        with self.assertRaises(ValueError):
+            compression.decompress(b'\x09payload')
+
+    def test_zstd_needs_zstandard(self):
+        with mock.patch.object(compression, 'zstandard', None), self.assertRaises(ImproperlyConfigured):
+            compression.compress(TEXT, codec='zstd')
+
+    @skipUnless(compression.zstandard, "zstandard is not installed")
+    def test_zstd_round_trip(self):
+        value = compression.compress(TEXT, codec='zstd', dictionary=False)
+        self.assertEqual(value[:1], compression.ZSTD)
+        self.assertEqual(compression.decompress(value), TEXT)
+
+
+class CompressedTextFieldTests(TestCase):
+    """
+    CompressedTextField reads and writes text while the column holds the
+    tagged, compressed bytes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='compressed')
+
+    def create(self, text):
+        return StudyMaterial.objects.create(user=self.user, title='Material', file='compressed.txt', extracted_text=text)
+
+    def stored(self, material):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT extracted_text FROM {StudyMaterial._meta.db_table} WHERE id = %s', [material.id])
+            return cursor.fetchone()[0]
+
+    def test_round_trip(self):
+        material = self.create(TEXT)
+        self.assertEqual(bytes(self.stored(material))[:1], compression.ZLIB)
+        self.assertEqual(StudyMaterial.objects.get(id=material.id).extracted_text, TEXT)
+        self.assertIsNone(StudyMaterial.objects.get(id=self.create(None).id).extracted_text)
+
+    @skipUnless(compression.zstandard, "zstandard is not installed")
+    @override_settings(TEXT_COMPRESSION='zstd', TEXT_COMPRESSION_DICTIONARY=None)
+    def test_zstd_round_trip(self):
+        material = self.create(TEXT)
+        self.assertEqual(bytes(self.stored(material))[:1], compression.ZSTD)
+        self.assertEqual(StudyMaterial.objects.get(id=material.id).extracted_text, TEXT)
+
+    def test_zlib_values_are_read_after_switching_codec(self):
+        material = self.create(TEXT)
+        with override_settings(TEXT_COMPRESSION='zstd'):
+            self.assertEqual(StudyMaterial.objects.get(id=material.id).extracted_text, TEXT)
+
+    def test_legacy_plain_text_is_read_as_is(self):
+        material = self.create(None)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {StudyMaterial._meta.db_table} SET extracted_text = %s WHERE id = %s', [TEXT, material.id])
+        material = StudyMaterial.objects.get(id=material.id)
+        self.assertEqual(material.extracted_text, TEXT)
+
+        # Saving it again stores it compressed
+        material.save()
+        self.assertEqual(bytes(self.stored(material))[:1], compression.ZLIB)
+
+    def test_unread_value_is_saved_unchanged(self):
+        material = self.create(TEXT)
+        before = bytes(self.stored(material))
+        material = StudyMaterial.objects.get(id=material.id)
+        with mock.patch.object(compression, 'compress', wraps=compression.compress) as compress:
+            material.title = 'Renamed'
+            material.save()
+        compress.assert_not_called()
+        self.assertEqual(bytes(self.stored(material)), before)
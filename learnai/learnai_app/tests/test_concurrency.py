@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from learnai_app.concurrency import GenerationLimiter, Saturated
+from learnai_app.models import StudyMaterial
+
+
+class GenerationLimiterTests(SimpleTestCase):
+
+    def test_counts_slots_up_to_the_limit(self):
+        limiter = GenerationLimiter(3)
+        self.assertTrue(limiter.try_acquire(2))
+        self.assertFalse(limiter.try_acquire(2))
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        limiter.release(3)
+        self.assertEqual(limiter.active, 0)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    def test_slot_releases_on_error_and_raises_when_full(self):
+        limiter = GenerationLimiter(1)
+        with self.assertRaises(ValueError), limiter.slot():
+            self.assertEqual(limiter.active, 1)
+            raise ValueError()
+        self.assertEqual(limiter.active, 0)
+        limiter.try_acquire()
+        with self.assertRaises(Saturated), limiter.slot():
+            pass
+        self.assertEqual(limiter.active, 1)
+
+
+@override_settings(AI_RETRY_AFTER_SECONDS=7)
+class SaturatedEndpointTests(TestCase):
+    """
+    Generation endpoints answer 429 with Retry-After, without calling
+    Gemini, once every slot is taken.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='limited')
+        self.material = StudyMaterial.objects.create(
+            user=self.user, title='Material', file='limited.txt', file_type='txt',
+            extracted_text='Some text to generate from.', processed=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.limiter = GenerationLimiter(2)
+        patcher = mock.patch('learnai_app.views.limiter', self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, path, data):
+        with self.assertLogs('django.request', 'WARNING'):
+            return self.client.post(path, data, format='json')
+
+    def assertSaturated(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+
+    @mock.patch('learnai_app.views.generate_content')
+    def test_generate_content(self, generate_content):
+        self.limiter.try_acquire(2)
+        response = self.post('/api/generate-content/', {
+            'material_id': self.material.id, 'content_type': 'flashcards',
+        })
+        self.assertSaturated(response)
+        generate_content.assert_not_called()
+        self.assertEqual(self.limiter.active, 2)
+
+    @mock.patch('learnai_app.views.iter_generate_many')
+    def test_batch_needs_a_slot_per_generation(self, iter_generate_many):
+        self.limiter.try_acquire()
+        response = self.post('/api/generate-content/batch/', {
+            'material_id': self.material.id, 'content_types': ['flashcards', 'quiz'],
+        })
+        self.assertSaturated(response)
+        iter_generate_many.assert_not_called()
+        self.assertEqual(self.limiter.active, 1)
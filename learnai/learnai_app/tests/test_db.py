@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.db import OperationalError, connections
+from django.test import SimpleTestCase
+
+from learnai_app.db import retry_on_lock
+from learnai_app.models import StudyMaterial
+from learnai_app.routers import ReadReplicaRouter
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    def in_atomic_block(self, value):
+        return mock.patch.object(connections['default'], 'in_atomic_block', value)
+
+    def test_reads_go_to_the_replica_outside_transactions(self):
+        with self.in_atomic_block(False):
+            self.assertEqual(self.router.db_for_read(StudyMaterial), 'replica')
+
+    def test_reads_stay_on_default_inside_a_transaction(self):
+        with self.in_atomic_block(True):
+            self.assertEqual(self.router.db_for_read(StudyMaterial), 'default')
+
+    def test_writes_and_migrations_go_to_default(self):
+        self.assertEqual(self.router.db_for_write(StudyMaterial), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'learnai_app'))
+        self.assertFalse(self.router.allow_migrate('replica', 'learnai_app'))
+
+
+@mock.patch('learnai_app.db.time.sleep')
+class RetryOnLockTests(SimpleTestCase):
+
+    def locked_then(self, failures, result='done'):
+        return mock.Mock(
+            __name__='write',
+            side_effect=[OperationalError('database is locked')] * failures + [result],
+        )
+
+    def test_retries_until_the_lock_is_free(self, sleep):
+        func = self.locked_then(2)
+        with self.assertLogs('learnai_app.db', 'WARNING'):
+            self.assertEqual(retry_on_lock(func, attempts=3)(), 'done')
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_gives_up_after_the_last_attempt(self, sleep):
+        func = self.locked_then(3)
+        with self.assertLogs('learnai_app.db', 'WARNING'), self.assertRaises(OperationalError):
+            retry_on_lock(func, attempts=2)()
+        self.assertEqual(func.call_count, 3)
+
+    def test_other_errors_are_not_retried(self, sleep):
+        func = mock.Mock(__name__='write', side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            retry_on_lock(func)()
+        self.assertEqual(func.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_runs_once_inside_a_transaction(self, sleep):
+        func = self.locked_then(1)
+        with mock.patch.object(connections['default'], 'in_atomic_block', True), self.assertRaises(OperationalError):
+            retry_on_lock(func)()
+        self.assertEqual(func.call_count, 1)
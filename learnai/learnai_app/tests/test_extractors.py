@@ -0,0 +1,146 @@
+import codecs
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.test import SimpleTestCase, override_settings
+
+from learnai_app.extractors import (
+    TEXT_READ_SIZE,
+    UnsupportedFile,
+    detect_encoding,
+    extract_docx,
+    extract_plain_text,
+    extract_pptx,
+    extract_text,
+)
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+P = 'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+RELATIONSHIPS = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+
+DOCUMENT = f"""<?xml version="1.0" encoding="UTF-8"?>
+<w:document {W}><w:body>
+  <w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>
+    <w:r><w:t>Cell</w:t></w:r><w:r><w:t xml:space="preserve"> biology</w:t></w:r></w:p>
+  <w:tbl><w:tr><w:tc><w:p><w:r><w:t>Name</w:t><w:tab/><w:t>Role</w:t></w:r></w:p></w:tc></w:tr></w:tbl>
+  <w:p><w:r><w:t>Line one</w:t><w:br/><w:t>line two</w:t></w:r></w:p>
+</w:body></w:document>"""
+
+
+def slide(*paragraphs):
+    body = ''.join(f'<a:p><a:r><a:t>{text}</a:t></a:r></a:p>' for text in paragraphs)
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<p:sld {A} {P}><p:cSld><p:spTree><p:sp><p:txBody>{body}</p:txBody></p:sp></p:spTree></p:cSld></p:sld>"""
+
+
+# Slide files named against their order, to check the order is taken from
+# presentation.xml
+PRESENTATION = f"""<?xml version="1.0" encoding="UTF-8"?>
+<p:presentation {P} {R}><p:sldIdLst>
+  <p:sldId id="256" r:id="rId2"/><p:sldId id="257" r:id="rId1"/>
+</p:sldIdLst></p:presentation>"""
+
+PRESENTATION_RELS = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Relationships {RELATIONSHIPS}>
+  <Relationship Id="rId1" Type="slide" Target="slides/slide1.xml"/>
+  <Relationship Id="rId2" Type="slide" Target="/ppt/slides/slide2.xml"/>
+</Relationships>"""
+
+
+class ExtractorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def package(self, name, parts):
+        path = os.path.join(self.directory, name)
+        with zipfile.ZipFile(path, 'w') as package:
+            for part_name, xml in parts.items():
+                package.writestr(part_name, xml)
+        return path
+
+    def test_docx(self):
+        path = self.package('notes.docx', {'word/document.xml': DOCUMENT})
+        self.assertEqual(''.join(extract_docx(path)), 'Cell biology\nName\tRole\nLine one\nline two\n')
+
+    def test_pptx_slides_in_presentation_order(self):
+        path = self.package('slides.pptx', {
+            'ppt/presentation.xml': PRESENTATION,
+            'ppt/_rels/presentation.xml.rels': PRESENTATION_RELS,
+            'ppt/slides/slide1.xml': slide('Second slide'),
+            'ppt/slides/slide2.xml': slide('First slide', 'Point'),
+        })
+        self.assertEqual(''.join(extract_pptx(path)), 'First slide\nPoint\n\nSecond slide\n\n')
+
+    def test_non_zip_files_are_unsupported(self):
+        path = self.write('legacy.ppt', b'\xd0\xcf\x11\xe0 not a zip')
+        with self.assertRaises(UnsupportedFile):
+            next(extract_pptx(path))
+        with self.assertRaises(UnsupportedFile):
+            next(extract_docx(path))
+
+    def test_plain_text_in_its_own_encoding(self):
+        text = 'Grüße\r\naus Köln\n'
+        for encoding in ('utf-8', 'utf-8-sig', 'utf-16', 'cp1252'):
+            with self.subTest(encoding=encoding):
+                path = self.write(f'{encoding}.txt', text.encode(encoding))
+                self.assertEqual(''.join(extract_plain_text(path)), 'Grüße\naus Köln\n')
+
+    def test_plain_text_is_read_in_pieces(self):
+        text = 'é' * (TEXT_READ_SIZE + 10)
+        path = self.write('long.txt', text.encode('utf-8'))
+        pieces = list(extract_plain_text(path))
+        self.assertEqual(len(pieces), 2)
+        self.assertEqual(''.join(pieces), text)
+
+    @override_settings(TEXT_EXTRACTORS={'txt': [
+        'learnai_app.extractors.extract_pptx',
+        'learnai_app.extractors.extract_plain_text',
+    ]})
+    def test_falls_back_to_the_next_extractor(self):
+        path = self.write('notes.txt', b'Plain notes')
+        self.assertEqual(extract_text(path, 'txt'), 'Plain notes')
+
+    @override_settings(TEXT_EXTRACTORS={'txt': ['learnai_app.extractors.extract_docx']})
+    def test_raises_the_last_error_when_nothing_can_read_the_file(self):
+        path = self.write('notes.txt', b'Plain notes')
+        with self.assertRaises(UnsupportedFile):
+            extract_text(path, 'txt')
+        with self.assertRaises(UnsupportedFile):
+            extract_text(path, 'epub')
+
+
+class DetectEncodingTests(SimpleTestCase):
+
+    def test_byte_order_marks(self):
+        for encoding, bom, expected in [
+            ('utf-8', codecs.BOM_UTF8, 'utf-8-sig'),
+            ('utf-16-le', codecs.BOM_UTF16_LE, 'utf-16'),
+            ('utf-16-be', codecs.BOM_UTF16_BE, 'utf-16'),
+            ('utf-32-le', codecs.BOM_UTF32_LE, 'utf-32'),
+        ]:
+            with self.subTest(encoding=encoding):
+                self.assertEqual(detect_encoding(bom + 'Text'.encode(encoding)), expected)
+
+    def test_utf8_cut_off_mid_character(self):
+        sample = 'Grüß'.encode('utf-8')[:-1]
+        self.assertEqual(detect_encoding(sample), 'utf-8')
+
+    def test_western_text_is_read_as_cp1252(self):
+        # Decodes the same in cp1250 and several other code pages
+        self.assertEqual(detect_encoding(('Grüße aus Köln, schöne Straße. ' * 20).encode('cp1252')), 'cp1252')
+
+    def test_other_code_pages(self):
+        sample = 'Zażółć gęślą jaźń, próba kodowania tekstu po polsku. '.encode('cp1250') * 10
+        self.assertEqual(detect_encoding(sample), 'cp1250')
@@ -0,0 +1,75 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from learnai_app.models import GeneratedContent, Question, Quiz, StudyMaterial
+
+QUESTIONS = [
+    {'question_text': 'Capital of France?', 'answer': 'Paris', 'options': ['Paris', 'Lyon']},
+    {'question_text': 'Two plus two?', 'answer': '4', 'options': ['3', '4']},
+]
+
+
+class ServerGradingTests(TestCase):
+    """
+    Quiz answers stay on the server until a submission is graded there.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='grading')
+        self.material = StudyMaterial.objects.create(
+            user=self.user, title='Material', file='grading.txt', file_type='txt',
+            extracted_text='Some text to generate from.', processed=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generate_quiz(self):
+        ai_response = {'content': [dict(q) for q in QUESTIONS], 'type': 'quiz', 'input_tokens': 10}
+        with mock.patch('learnai_app.views.generate_content', return_value=ai_response):
+            response = self.client.post('/api/generate-content/', {
+                'material_id': self.material.id, 'content_type': 'quiz',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertNoAnswers(self, questions):
+        self.assertEqual(len(questions), len(QUESTIONS))
+        for question in questions:
+            self.assertNotIn('answer', question)
+
+    def test_generated_quiz_is_sent_and_stored_without_answers(self):
+        data = self.generate_quiz()
+        self.assertNoAnswers(data['content'])
+        self.assertNoAnswers(json.loads(GeneratedContent.objects.get(content_type='quiz').content))
+        quiz = Quiz.objects.get(id=data['quiz_id'])
+        self.assertEqual(sorted(quiz.questions.values_list('answer', flat=True)), ['4', 'Paris'])
+
+    def test_quiz_details_have_no_answers(self):
+        quiz_id = self.generate_quiz()['quiz_id']
+        response = self.client.get(f'/api/quizzes/{quiz_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNoAnswers(response.json()['questions'])
+
+    def test_submission_is_graded_by_the_server(self):
+        quiz_id = self.generate_quiz()['quiz_id']
+        paris, four = Question.objects.filter(quiz_id=quiz_id).order_by('id')
+        response = self.client.post('/api/quiz-results/', {
+            'quiz_id': quiz_id,
+            'score': 2,
+            'total_questions': 2,
+            'answers': [
+                {'questionId': paris.id, 'selected': ' paris ', 'correct': False},
+                {'questionId': four.id, 'selected': '3', 'correct': True},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['score'], data['total_questions']), (1, 2))
+        self.assertEqual(
+            [(a['questionId'], a['correct'], a['answer']) for a in data['answers']],
+            [(paris.id, True, 'Paris'), (four.id, False, '4')],
+        )
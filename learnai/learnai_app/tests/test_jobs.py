@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from learnai_app.jobs import claim_next_job, requeue_stale_jobs, run_job
+from learnai_app.management.commands.run_extraction_worker import Command
+from learnai_app.models import ExtractionJob, StudyMaterial
+
+
+class ExtractionJobTests(TestCase):
+    """
+    Claiming, retrying and recovering extraction jobs.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='jobs')
+
+    def material(self, text=None):
+        material = StudyMaterial(user=self.user, title='Notes', file_type='txt')
+        if text is None:
+            material.file.name = 'missing/notes.txt'
+            material.save()
+        else:
+            material.file.save('notes.txt', ContentFile(text.encode('utf-8')))
+        return material
+
+    def job(self, material, **fields):
+        return ExtractionJob.objects.create(material=material, **fields)
+
+    def test_claim_takes_due_jobs_only(self):
+        later = self.job(self.material(), run_after=timezone.now() + timedelta(minutes=5))
+        due = self.job(self.material())
+
+        claimed = claim_next_job()
+        self.assertEqual(claimed.pk, due.pk)
+        self.assertEqual((claimed.status, claimed.attempts), (ExtractionJob.RUNNING, 1))
+        self.assertIsNone(claim_next_job())
+        later.refresh_from_db()
+        self.assertEqual(later.status, ExtractionJob.QUEUED)
+
+    def test_run_job_saves_text(self):
+        material = self.material('Photosynthesis turns light into sugar.')
+        self.job(material)
+
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, ExtractionJob.DONE)
+        material.refresh_from_db()
+        self.assertTrue(material.processed)
+        self.assertEqual(material.extracted_text, 'Photosynthesis turns light into sugar.')
+
+    def test_failed_attempt_is_retried_after_backoff(self):
+        self.job(self.material(), max_attempts=2)
+
+        with self.assertLogs('learnai_app.jobs', 'ERROR'):
+            job = run_job(claim_next_job())
+        self.assertEqual(job.status, ExtractionJob.QUEUED)
+        self.assertTrue(job.last_error)
+        self.assertGreaterEqual(job.run_after, job.started_at)
+
+        # The second attempt is the last one
+        ExtractionJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('learnai_app.jobs', 'ERROR'):
+            job = run_job(claim_next_job())
+        self.assertEqual((job.status, job.attempts), (ExtractionJob.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        retry = self.job(self.material(), status=ExtractionJob.RUNNING, started_at=long_ago, attempts=1)
+        exhausted = self.job(
+            self.material(), status=ExtractionJob.RUNNING, started_at=long_ago, attempts=5, max_attempts=5,
+        )
+        running = self.job(self.material(), status=ExtractionJob.RUNNING, started_at=timezone.now(), attempts=1)
+
+        self.assertEqual(requeue_stale_jobs(), (1, 1))
+        statuses = dict(ExtractionJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[retry.pk], ExtractionJob.QUEUED)
+        self.assertEqual(statuses[exhausted.pk], ExtractionJob.FAILED)
+        self.assertEqual(statuses[running.pk], ExtractionJob.RUNNING)
+        self.assertTrue(ExtractionJob.objects.get(pk=exhausted.pk).last_error)
+
+    def test_worker_survives_a_job_that_raises(self):
+        first = self.job(self.material('First'), run_after=timezone.now() - timedelta(seconds=1))
+        second = self.job(self.material('Second'))
+
+        command = Command(stdout=StringIO())
+        command.stop = mock.Mock(is_set=mock.Mock(return_value=False))
+        real_run_job = run_job
+
+        def run_job_locked_once(job):
+            if job.pk == first.pk:
+                raise OperationalError('database is locked')
+            return real_run_job(job)
+
+        with mock.patch(
+            'learnai_app.management.commands.run_extraction_worker.run_job', side_effect=run_job_locked_once,
+        ), self.assertLogs('learnai_app', 'ERROR'):
+            command.work(poll_interval=0, once=True)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, ExtractionJob.QUEUED)
+        self.assertEqual(first.last_error, 'database is locked')
+        self.assertEqual(second.status, ExtractionJob.DONE)
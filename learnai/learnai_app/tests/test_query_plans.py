@@ -0,0 +1,124 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from learnai_app.models import (
+    ActivityEvent, ExtractionJob, GeneratedContent, Question, Quiz, QuizAnswer, QuizResult, StudyMaterial,
+)
+
+# Read endpoints on the hot path; {material}, {content} and {quiz} are
+# filled in with rows of the user making the requests
+ENDPOINTS = [
+    'materials/',
+    'materials/{material}/',
+    'materials/{material}/status/',
+    'content/',
+    'content/{content}/',
+    'content/existing/?material_id={material}',
+    'quizzes/',
+    'quizzes/{quiz}/',
+    'quizzes/{quiz}/history/',
+    'dashboard/stats/',
+    'dashboard/activity/',
+    'activity/',
+    'user-stats/',
+]
+
+USERS = 20
+MATERIALS_PER_USER = 200
+
+SCAN_RE = re.compile(r'\bSCAN (\w+)')
+SORT_RE = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+PLANNED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+TABLES = {model._meta.db_table for model in (
+    User, ActivityEvent, ExtractionJob, GeneratedContent, Question, Quiz, QuizAnswer, QuizResult, StudyMaterial,
+)}
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is only understood for SQLite")
+# No cache, so every request runs its queries
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryPlanTests(TestCase):
+    """
+    Seed a large synthetic dataset, request every hot read endpoint and check
+    the query plan of each query they run: none may scan a whole table or
+    sort rows that an index could have returned in order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([
+            User(username=f'query-plan-{i}', password='!') for i in range(USERS)
+        ])
+        materials = StudyMaterial.objects.bulk_create([
+            StudyMaterial(user=user, title=f"Material {i}", file=f'plans/{i}.txt', file_type='txt',
+                          extracted_text='text', processed=True)
+            for user in users for i in range(MATERIALS_PER_USER)
+        ], batch_size=500)
+        contents = GeneratedContent.objects.bulk_create([
+            GeneratedContent(user_id=material.user_id, material=material, content_type=content_type, content='{}')
+            for material in materials for content_type in ('summary', 'notes')
+        ], batch_size=500)
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(user_id=material.user_id, material=material, title=f"Quiz: {material.title}")
+            for material in materials[::2]
+        ], batch_size=500)
+        questions = Question.objects.bulk_create([
+            Question(quiz=quiz, question_text=f"Question {i}?", answer='A', options=['A', 'B'])
+            for quiz in quizzes for i in range(5)
+        ], batch_size=500)
+        results = QuizResult.objects.bulk_create([
+            QuizResult(user_id=quiz.user_id, quiz=quiz, score=3, total_questions=5, completed=i % 3 != 0)
+            for i, quiz in enumerate(quizzes)
+        ], batch_size=500)
+        results_by_quiz = {result.quiz_id: result.id for result in results}
+        QuizAnswer.objects.bulk_create([
+            QuizAnswer(quiz_result_id=results_by_quiz[question.quiz_id], question=question,
+                       selected_option='A', is_correct=True)
+            for question in questions
+        ], batch_size=500)
+        ExtractionJob.objects.bulk_create([
+            ExtractionJob(material=material, status=ExtractionJob.DONE) for material in materials
+        ], batch_size=500)
+        ActivityEvent.objects.bulk_create([
+            ActivityEvent(user_id=material.user_id, kind=ActivityEvent.MATERIAL, object_id=material.id,
+                          action=f"Uploaded {material.title}")
+            for material in materials
+        ], batch_size=500)
+
+        # Request as a user in the middle of the table
+        cls.user = users[len(users) // 2]
+        cls.ids = {
+            'material': next(m.id for m in materials if m.user_id == cls.user.id),
+            'content': next(c.id for c in contents if c.user_id == cls.user.id),
+            'quiz': next(q.id for q in quizzes if q.user_id == cls.user.id),
+        }
+
+    def test_endpoints_use_indexes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for endpoint in ENDPOINTS:
+            path = endpoint.format(**self.ids)
+            with self.subTest(path=path):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(f'/api/{path}')
+                self.assertLess(response.status_code, 400)
+                for query in queries.captured_queries:
+                    self.assertIndexed(query['sql'])
+
+    def assertIndexed(self, sql):
+        if not sql.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        details = '\n'.join([sql, *(f'    {line}' for line in plan)])
+        scanned = [match.group(1) for line in plan for match in SCAN_RE.finditer(line)]
+        self.assertFalse(TABLES.intersection(scanned), f"Full table scan:\n{details}")
+        self.assertFalse(any(SORT_RE.search(line) for line in plan), f"Sort without an index:\n{details}")
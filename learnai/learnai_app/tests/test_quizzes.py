@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from learnai_app.grading import correct_answer
+from learnai_app.models import StudyMaterial
+from learnai_app.quizzes import create_quiz, save_result
+
+# Queries to store a generated quiz and a submission, whatever the number
+# of questions. Inside a TestCase, transaction.atomic() sets a savepoint
+# and releases it, which are counted too.
+CREATE_QUERIES = 6
+SUBMIT_QUERIES = 8
+
+
+class QuizQueryCountTests(TestCase):
+    """
+    Quizzes and submissions are written with bulk inserts, so the number of
+    queries doesn't grow with the number of questions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='quiz-queries')
+        cls.material = StudyMaterial.objects.create(user=cls.user, title='Material', file='quiz.txt')
+
+    def setUp(self):
+        # A cold answer key, so a submission always builds it
+        cache.clear()
+
+    def questions_data(self, size):
+        return [
+            {'question_text': f"Question {i}?", 'answer': 'A', 'options': ['A', 'B', 'C', 'D']}
+            for i in range(size)
+        ]
+
+    def test_create_quiz(self):
+        for size in (5, 50):
+            with self.subTest(questions=size), self.assertNumQueries(CREATE_QUERIES):
+                quiz = create_quiz(self.user, self.material, self.questions_data(size))
+            self.assertEqual(quiz.questions.count(), size)
+
+    def test_save_result(self):
+        for size in (5, 50):
+            quiz = create_quiz(self.user, self.material, self.questions_data(size))
+            answers = [
+                {'questionId': question_id, 'selected': 'A'}
+                for question_id in quiz.questions.values_list('id', flat=True)
+            ]
+            with self.subTest(questions=size), self.assertNumQueries(SUBMIT_QUERIES):
+                result, _ = save_result(self.user, quiz, answers)
+            self.assertEqual((result.score, result.total_questions), (size, size))
+            self.assertEqual(result.answers.count(), size)
+
+
+class AnswerKeyTests(TestCase):
+
+    def test_correction_retires_cached_key(self):
+        user = User.objects.create_user(username='answer-key')
+        material = StudyMaterial.objects.create(user=user, title='Material', file='key.txt')
+        quiz = create_quiz(user, material, [{'question_text': "Question?", 'answer': 'A', 'options': ['A', 'B']}])
+        question = quiz.questions.get()
+        answers = [{'questionId': question.id, 'selected': 'B'}]
+
+        result, _ = save_result(user, quiz, answers)
+        self.assertEqual(result.score, 0)
+        correct_answer(question, 'B')
+        result.refresh_from_db()
+        self.assertEqual(result.score, 1)
+
+        # The key cached above is still in the cache, under the old version
+        quiz.refresh_from_db()
+        other = User.objects.create_user(username='answer-key-other')
+        result, _ = save_result(other, quiz, answers)
+        self.assertEqual(result.score, 1)
@@ -0,0 +1,119 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from learnai_app.extraction import iter_pdf_pages
+from learnai_app.jobs import extract_pdf_material
+from learnai_app.models import StudyMaterial
+
+
+def make_pdf(texts):
+    """
+    A PDF with one line of Helvetica text on each page.
+    """
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for text in texts:
+        page = PageObject.create_blank_page(width=612, height=792)
+        contents = DecodedStreamObject()
+        contents.set_data(f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1'))
+        page[NameObject('/Contents')] = writer._add_object(contents)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        writer.add_page(page)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class PageReuseTests(TestCase):
+    """
+    A new revision of a PDF only extracts the pages that changed.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='revisions')
+
+    def material(self, texts, previous=None):
+        material = StudyMaterial(
+            user=self.user,
+            title='Slides',
+            file_type='pdf',
+            previous_revision=previous,
+            revision=previous.revision + 1 if previous else 1,
+        )
+        material.file.save('slides.pdf', ContentFile(make_pdf(texts)))
+        return material
+
+    def extracted_pages(self, material):
+        """
+        Run extract_pdf_material() and return it with the number of pages
+        whose text was actually extracted.
+        """
+        with mock.patch.object(PageObject, 'extract_text', autospec=True, side_effect=PageObject.extract_text) as extract_text:
+            result = extract_pdf_material(material)
+        return result, extract_text.call_count
+
+    def test_worker_results_carry_fingerprints(self):
+        material = self.material(['First page', 'Second page'])
+        results = list(iter_pdf_pages(material.file.path, parallel=False))
+        self.assertEqual([r.text for r in results], ['First page', 'Second page'])
+        self.assertTrue(all(len(r.fingerprint) == 64 for r in results))
+
+        skipped = list(iter_pdf_pages(material.file.path, parallel=False, known=frozenset([results[0].fingerprint])))
+        self.assertEqual([(r.text, r.error) for r in skipped], [(None, None), ('Second page', None)])
+        self.assertEqual(skipped[0].fingerprint, results[0].fingerprint)
+
+    def test_unchanged_pages_are_copied_from_previous_revision(self):
+        first = self.material(['Intro', 'Methods', 'Results'])
+        (text, truncated), extracted = self.extracted_pages(first)
+        self.assertEqual(text, 'Intro\nMethods\nResults\n')
+        self.assertEqual(extracted, 3)
+
+        second = self.material(['Intro', 'Better methods', 'Results'], previous=first)
+        with self.assertLogs('learnai_app.jobs', 'INFO') as logs:
+            (text, truncated), extracted = self.extracted_pages(second)
+        self.assertEqual(text, 'Intro\nBetter methods\nResults\n')
+        self.assertFalse(truncated)
+        self.assertEqual(extracted, 1)
+        self.assertIn('2 of 3 pages unchanged', logs.output[0])
+        first_fingerprints = list(first.pages.order_by('page_number').values_list('fingerprint', flat=True))
+        second_fingerprints = list(second.pages.order_by('page_number').values_list('fingerprint', flat=True))
+        self.assertEqual(second_fingerprints[0::2], first_fingerprints[0::2])
+        self.assertNotEqual(second_fingerprints[1], first_fingerprints[1])
+
+    def test_previous_pages_without_fingerprints_are_backfilled(self):
+        first = self.material(['Intro', 'Methods'])
+        extract_pdf_material(first)
+        first.pages.update(fingerprint='')
+
+        second = self.material(['Intro', 'Methods', 'Appendix'], previous=first)
+        (text, truncated), extracted = self.extracted_pages(second)
+        self.assertEqual(text, 'Intro\nMethods\nAppendix\n')
+        self.assertEqual(extracted, 1)
+        self.assertFalse(first.pages.filter(fingerprint='').exists())
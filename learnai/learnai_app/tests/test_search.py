@@ -0,0 +1,100 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from learnai_app import search
+from learnai_app.models import GeneratedContent, StudyMaterial
+
+
+@skipUnless(connection.vendor == 'sqlite', "The default search backend is SQLite FTS5")
+class SearchTests(TestCase):
+    """
+    The search index follows saves and deletes, and the search endpoint
+    only returns the user's own documents.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher')
+        self.material = self.create_material(self.user, 'Cell biology', 'The mitochondria is the powerhouse of the cell.')
+
+    def create_material(self, user, title, text):
+        return StudyMaterial.objects.create(
+            user=user, title=title, file='search.txt', file_type='txt', extracted_text=text, processed=True,
+        )
+
+    def found(self, query, user=None, kind=None):
+        return [(hit.kind, hit.object_id) for hit in search.search(user or self.user, query, kind)[0:20]]
+
+    def test_finds_materials_by_body_and_title_prefix(self):
+        self.assertEqual(self.found('powerhouse'), [('material', self.material.id)])
+        self.assertEqual(self.found('cell bio'), [('material', self.material.id)])
+        self.assertEqual(self.found('chloroplast'), [])
+
+    def test_marks_matches_in_title_and_snippet(self):
+        hit = search.search(self.user, 'mitochondria cell')[0:1][0]
+        self.assertEqual(hit.title, '<mark>Cell</mark> biology')
+        self.assertIn('<mark>mitochondria</mark>', hit.snippet)
+        self.assertIn('the <mark>cell</mark>.', hit.snippet)
+
+    def test_reindexes_changed_text(self):
+        self.material.extracted_text = 'Ribosomes build proteins.'
+        self.material.save(update_fields=['extracted_text'])
+        self.assertEqual(self.found('powerhouse'), [])
+        self.assertEqual(self.found('ribosomes'), [('material', self.material.id)])
+        self.assertEqual(search.search(self.user, 'ribosomes').count(), 1)
+
+    def test_removes_deleted_materials(self):
+        self.material.delete()
+        self.assertEqual(self.found('powerhouse'), [])
+
+    def test_only_searches_the_users_documents(self):
+        other = User.objects.create_user(username='other-searcher')
+        self.create_material(other, 'Other', 'Another powerhouse.')
+        self.assertEqual(self.found('powerhouse'), [('material', self.material.id)])
+
+    def test_indexes_summaries_and_notes_only(self):
+        summary = GeneratedContent.objects.create(
+            user=self.user, material=self.material, content_type='summary', content='Cells respire aerobically.',
+        )
+        GeneratedContent.objects.create(
+            user=self.user, material=self.material, content_type='flashcards',
+            content='[{"front": "aerobically", "back": "with oxygen"}]',
+        )
+        self.assertEqual(self.found('aerobically'), [('content', summary.id)])
+        self.assertEqual(self.found('cell', kind=search.CONTENT), [('content', summary.id)])
+
+        summary.delete()
+        self.assertEqual(self.found('aerobically'), [])
+
+    def test_rebuild_drops_replaced_entries(self):
+        self.material.extracted_text = 'Ribosomes build proteins.'
+        self.material.save(update_fields=['extracted_text'])
+        self.assertEqual(self.index_entries('powerhouse'), 1)  # unreachable, but still indexed
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.index_entries('powerhouse'), 0)
+        self.assertEqual(self.found('ribosomes'), [('material', self.material.id)])
+
+    def index_entries(self, word):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM learnai_search WHERE learnai_search MATCH %s', [word])
+            return cursor.fetchone()[0]
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/search/', {'q': 'powerhouse'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        result = response.data['results'][0]
+        self.assertEqual((result['type'], result['id'], result['material_id']), ('material', self.material.id, self.material.id))
+        self.assertIn('<mark>powerhouse</mark>', result['snippet'])
+
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(client.get('/api/search/', {'q': 'x', 'type': 'quiz'}).status_code, 400)
+        self.assertEqual(client.get('/api/search/', {'q': '  '}).data['count'], 0)
@@ -0,0 +1,32 @@
+"""
+Token estimates, per model.
+
+Tokens are estimated from the length of the text with a per-model ratio of
+characters per token (AI_MODEL_BUDGETS), which is close enough to size
+chunks and prompts without calling a tokenizer. This is the one estimator
+used for both; see chunking.py and budget.py.
+"""
+import math
+
+from django.conf import settings
+
+DEFAULT_BUDGET = {
+    'chars_per_token': 4.0,
+    'max_input_tokens': 48000,
+}
+
+
+def model_budget(model_name=None):
+    """
+    The budget of a model; DEFAULT_BUDGET for models without one, or if
+    model_name is None.
+    """
+    return {**DEFAULT_BUDGET, **getattr(settings, 'AI_MODEL_BUDGETS', {}).get(model_name, {})}
+
+
+def chars_per_token(model_name=None):
+    return model_budget(model_name)['chars_per_token']
+
+
+def estimate_tokens(text, model_name=None):
+    return math.ceil(len(text) / chars_per_token(model_name))
@@ -4,18 +4,29 @@ from .views import (
     RegisterView,
     StudyMaterialListCreateView,
     StudyMaterialDetailView,
+    StudyMaterialBulkUploadView,
+    StudyMaterialRevisionView,
     GeneratedContentListView,
     QuizListView,
     DashboardStatsView,
     RecentActivityView,
+    ActivityFeedView,
+    SearchView,
     generate_ai_content,
+    generate_ai_content_stream,
+    generate_ai_content_async,
+    generate_ai_content_batch,
     get_user_stats,
     submit_quiz_results,
     get_quiz_details,
+    correct_question_answer,
     check_existing_content,
     GeneratedContentDetailView,
     get_quiz_history,
     retake_quiz,
+    get_extraction_status,
+    ask_material,
+    get_ai_cache_stats,
     )
 
 urlpatterns = [
@@ -25,7 +36,11 @@ urlpatterns = [
     
     # Study Materials
     path('materials/', StudyMaterialListCreateView.as_view(), name='material-list'),
+    path('materials/bulk/', StudyMaterialBulkUploadView.as_view(), name='material-bulk-upload'),
     path('materials/<int:pk>/', StudyMaterialDetailView.as_view(), name='material-detail'),
+    path('materials/<int:pk>/status/', get_extraction_status, name='material-extraction-status'),
+    path('materials/<int:pk>/ask/', ask_material, name='material-ask'),
+    path('materials/<int:pk>/revisions/', StudyMaterialRevisionView.as_view(), name='material-revisions'),
     
     # Generated Content
     path('content/', GeneratedContentListView.as_view(), name='content-list'),
@@ -36,12 +51,19 @@ urlpatterns = [
     # Dashboard
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
     path('dashboard/activity/', RecentActivityView.as_view(), name='recent-activity'),
+    path('activity/', ActivityFeedView.as_view(), name='activity-feed'),
+    path('search/', SearchView.as_view(), name='search'),
     path('generate-content/', generate_ai_content, name='generate-content'),
+    path('generate-content/stream/', generate_ai_content_stream, name='generate-content-stream'),
+    path('generate-content/async/', generate_ai_content_async, name='generate-content-async'),
+    path('generate-content/batch/', generate_ai_content_batch, name='generate-content-batch'),
     path('user-stats/', get_user_stats, name='user-stats'),
+    path('ai-cache/stats/', get_ai_cache_stats, name='ai-cache-stats'),
 
 
     path('quiz-results/', submit_quiz_results, name='submit-quiz-results'),
     path('quizzes/<int:pk>/', get_quiz_details, name='quiz-details'),
+    path('questions/<int:pk>/answer/', correct_question_answer, name='question-answer'),
 
     path('content/existing/', check_existing_content, name='check-existing-content'),
 
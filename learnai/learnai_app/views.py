@@ -7,14 +7,29 @@ from datetime import datetime
 
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from .models import StudyMaterial, GeneratedContent, Quiz, Question, UserProfile, QuizAnswer, QuizResult
-from .serializers import StudyMaterialSerializer, GeneratedContentSerializer, QuizSerializer, QuizResultSerializer, QuizAnswerSerializer, QuestionSerializer
-from rest_framework.permissions import IsAuthenticated
+from .models import StudyMaterial, GeneratedContent, Quiz, Question, UserProfile, QuizAnswer, QuizResult, ActivityEvent
+from .serializers import StudyMaterialSerializer, StudyMaterialListSerializer, StudyMaterialRevisionSerializer, GeneratedContentSerializer, GeneratedContentListSerializer, QuizSerializer, QuizResultSerializer, QuizAnswerSerializer, QuestionSerializer, QuizQuestionSerializer, ActivityEventSerializer, SearchHitSerializer
+from .pagination import ActivityCursorPagination, MaterialCursorPagination, NewestFirstPagination, SearchPagination
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser
 
 
-from .ai_service import generate_content
-from django.http import JsonResponse
+from .ai_service import CONTENT_TYPES, MODEL_NAME, agenerate_content, answer_question, generate_content, iter_generate_many, stream_content
+from .concurrency import Saturated, limiter, saturated_response
+from . import llm_cache, retrieval, search, stats, tokens
+from .blobs import material_fields, shared_generation, store_blob
+from .bulk_upload import ingest
+from .jobs import enqueue_extraction, extraction_status
+from .grading import correct_answer
+from .quizzes import create_quiz, reset_for_retake, save_result, without_answers
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Sum
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 import json
 
@@ -41,15 +56,69 @@ class RegisterView(generics.CreateAPIView):
 
 
 class StudyMaterialListCreateView(generics.ListCreateAPIView):
-    serializer_class = StudyMaterialSerializer
+    serializer_class = StudyMaterialListSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = MaterialCursorPagination
     
     def get_queryset(self):
-        return StudyMaterial.objects.filter(user=self.request.user).order_by('-uploaded_at')
+        # The extracted text is only loaded when the client asks for it
+        return StudyMaterial.objects.filter(user=self.request.user).select_related('user').defer(
+            *StudyMaterialListSerializer.deferred_fields(self.request)
+        ).order_by('-uploaded_at')
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Extraction runs in the background worker; the upload returns as
+        # soon as the file is stored. Poll materials/<pk>/status/ for progress.
+        # Identical files are stored once and extracted once.
+        blob = store_blob(serializer.validated_data['file'])
+        material = serializer.save(user=self.request.user, **material_fields(blob))
+        enqueue_extraction(material)
+
+class StudyMaterialBulkUploadView(generics.GenericAPIView):
+    """
+    Upload many files at once, as repeated 'files' parts and/or ZIP archives.
+    Responds with a per-file manifest; extraction runs in the background.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        uploaded_files = request.FILES.getlist('files')
+        if not uploaded_files:
+            return Response({'error': 'No files uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        manifest = ingest(request.user, uploaded_files)
+        created = sum(1 for entry in manifest if entry['material_id'])
+        return Response({
+            'created': created,
+            'rejected': len(manifest) - created,
+            'files': manifest,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+class StudyMaterialRevisionView(generics.CreateAPIView):
+    """
+    Upload an edited version of a material as its next revision. Only the
+    pages that changed are extracted again, and generation reuses the cached
+    results of every chunk of text that didn't change.
+    """
+    serializer_class = StudyMaterialRevisionSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def perform_create(self, serializer):
+        try:
+            previous = StudyMaterial.objects.only('id', 'title', 'revision').get(id=self.kwargs['pk'], user=self.request.user)
+        except StudyMaterial.DoesNotExist:
+            raise NotFound('Material not found')
+        blob = store_blob(serializer.validated_data['file'])
+        material = serializer.save(
+            user=self.request.user,
+            title=serializer.validated_data.get('title') or previous.title,
+            previous_revision=previous,
+            revision=previous.revision + 1,
+            **material_fields(blob),
+        )
+        enqueue_extraction(material)
 
 class StudyMaterialDetailView(generics.RetrieveDestroyAPIView):
     serializer_class = StudyMaterialSerializer
@@ -58,45 +127,70 @@ class StudyMaterialDetailView(generics.RetrieveDestroyAPIView):
     def get_queryset(self):
         return StudyMaterial.objects.filter(user=self.request.user)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_extraction_status(request, pk):
+    """
+    Report the progress of the background text extraction for a material
+    """
+    try:
+        material = StudyMaterial.objects.get(id=pk, user=request.user)
+    except StudyMaterial.DoesNotExist:
+        return JsonResponse({'error': 'Material not found'}, status=404)
+    return JsonResponse(extraction_status(material))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ask_material(request, pk):
+    """
+    Answer a question about a material from the parts of it most relevant
+    to the question (see retrieval.py). Returns the answer and where in the
+    extracted text the excerpts it was given come from.
+    """
+    question = str(request.data.get('question') or '').strip()
+    if not question:
+        return JsonResponse({'error': 'A question is required'}, status=400)
+    try:
+        material = StudyMaterial.objects.get(id=pk, user=request.user)
+    except StudyMaterial.DoesNotExist:
+        return JsonResponse({'error': 'Material not found'}, status=404)
+    if not material.extracted_text:
+        return JsonResponse({'error': 'No extracted text available'}, status=400)
+
+    excerpts, sources = retrieval.question_context(material, question)
+    if not sources:
+        return JsonResponse({'answer': None, 'sources': [], 'message': 'Nothing in this material matches the question'})
+
+    if not limiter.try_acquire():
+        return saturated_response()
+    try:
+        ai_response = answer_question(excerpts, question)
+    finally:
+        limiter.release()
+    if not ai_response:
+        return JsonResponse({'error': 'Failed to answer the question'}, status=500)
+    return JsonResponse({'answer': ai_response['content'], 'sources': sources})
+
+
 class GeneratedContentListView(generics.ListAPIView):
-    serializer_class = GeneratedContentSerializer
+    serializer_class = GeneratedContentListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NewestFirstPagination
     
     def get_queryset(self):
-        return GeneratedContent.objects.filter(user=self.request.user).order_by('-created_at')
+        return GeneratedContent.objects.filter(user=self.request.user).defer(
+            *GeneratedContentListSerializer.deferred_fields(self.request)
+        ).order_by('-created_at')
 
 class QuizListView(generics.ListCreateAPIView):
     serializer_class = QuizSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NewestFirstPagination
     
     def get_queryset(self):
-        # Annotate each quiz with its latest result status
-        from django.db.models import Max, OuterRef, Subquery
-        from django.db.models.functions import Coalesce
-
-        # Subquery to get the latest result for each quiz
-        latest_results = QuizResult.objects.filter(
-            quiz=OuterRef('pk'),
-            user=self.request.user,
-            completed=True  # Only look at completed quizzes
-        ).order_by('-completed_at')
-
-        quizzes = Quiz.objects.filter(user=self.request.user).annotate(
-            is_completed=Coalesce(
-                Subquery(latest_results.values('completed')[:1]),
-                False
-            ),
-            latest_score=Coalesce(
-                Subquery(latest_results.values('score')[:1]),
-                0
-            ),
-            latest_total=Coalesce(
-                Subquery(latest_results.values('total_questions')[:1]),
-                0
-            )
-        ).order_by('-created_at')
-
-        return quizzes
+        # The latest result status is kept on the quiz row itself
+        return Quiz.objects.filter(user=self.request.user).order_by('-created_at')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -105,48 +199,118 @@ class DashboardStatsView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        stats = {
-            'uploaded_documents': StudyMaterial.objects.filter(user=user).count(),
-            'study_materials': StudyMaterial.objects.filter(user=user).count(),
-            'generated_summaries': GeneratedContent.objects.filter(user=user, content_type='summary').count(),
-            'practice_quizzes': Quiz.objects.filter(user=user).count(),
-        }
-        return Response(stats)
+        counts = stats.snapshot(request.user.id)
+        return Response({
+            'uploaded_documents': counts['materials_count'],
+            'study_materials': counts['materials_count'],
+            'generated_summaries': counts['summaries_count'],
+            'practice_quizzes': counts['quizzes_count'],
+        })
 
 class RecentActivityView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        recent_materials = StudyMaterial.objects.filter(user=user).order_by('-uploaded_at')[:3]
-        recent_content = GeneratedContent.objects.filter(user=user).order_by('-created_at')[:3]
-        
-        activities = []
-        
-        for material in recent_materials:
-            activities.append({
-                'id': material.id,
-                'action': f"Uploaded {material.title}",
-                'time': material.uploaded_at,
-                'type': 'material'
-            })
-        
-        for content in recent_content:
-            activities.append({
-                'id': content.id,
-                'action': f"Generated {content.get_content_type_display()} for {content.material.title}",
-                'time': content.created_at,
-                'type': 'content'
-            })
-        
-        # Sort by time descending
-        activities.sort(key=lambda x: x['time'], reverse=True)
-        
-        return Response(activities[:4])
-    
+        events = ActivityEvent.objects.filter(user=request.user).order_by('-created_at', '-id')[:4]
+        return Response(ActivityEventSerializer(events, many=True).data)
+
+
+class ActivityFeedView(generics.ListAPIView):
+    """
+    The whole activity feed, newest first, a page at a time. Follow the
+    'next' link to load more.
+    """
+    serializer_class = ActivityEventSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ActivityCursorPagination
+
+    def get_queryset(self):
+        return ActivityEvent.objects.filter(user=self.request.user)
+
+
+class SearchView(generics.ListAPIView):
+    """
+    Full-text search over the user's materials and generated notes and
+    summaries, best matches first: ?q=words[&type=material|content].
+    """
+    serializer_class = SearchHitSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = SearchPagination
 
+    def get_queryset(self):
+        kind = self.request.query_params.get('type') or None
+        if kind is not None and kind not in search.KINDS:
+            raise ValidationError({'type': f"Expected one of {', '.join(search.KINDS)}"})
+        return search.search(self.request.user, self.request.query_params.get('q', ''), kind)
+
+
+def _decode_content(content):
+    return json.loads(content) if content.startswith('[') or content.startswith('{') else content
+
+
+def _existing_content_response(user, material, content_type):
+    """
+    Response data for content that was already generated and may be reused
+    (summaries and notes), or None.
+    """
+    if content_type not in ['summary', 'notes']:
+        return None
+    existing = GeneratedContent.objects.filter(
+        user=user,
+        material=material,
+        content_type=content_type
+    ).first()
+    if not existing:
+        return None
+    return {
+        'content_id': existing.id,
+        'content': _decode_content(existing.content),
+        'type': content_type,
+        'message': 'Using previously generated content'
+    }
+
+
+def _save_generated_content(user, material, content_type, ai_response):
+    """
+    Store a generation result and return the response data for it.
+    """
+    content = ai_response['content']
+    if content_type == 'quiz' and isinstance(content, list):
+        content = without_answers(content)
+
+    # Save or update generated content
+    content_data = {
+        'content': json.dumps(content) if isinstance(content, (list, dict)) else content,
+        # Content reused from an identical upload sent nothing
+        'original_tokens': tokens.estimate_tokens(material.extracted_text or '', MODEL_NAME),
+        'sent_tokens': ai_response.get('input_tokens', 0),
+    }
+    
+    with transaction.atomic():
+        generated_content, created = GeneratedContent.objects.update_or_create(
+            user=user,
+            material=material,
+            content_type=content_type,
+            defaults=content_data
+        )
+        
+        # If it's a quiz, create quiz records
+        if content_type == 'quiz' and isinstance(ai_response['content'], list):
+            quiz = create_quiz(user, material, ai_response['content'])
+            return {
+                'quiz_id': quiz.id,
+                'content': content,  # Return the content for immediate use
+                'message': 'Quiz generated successfully'
+            }
 
+    # Update user profile stats for other content types
+    stats.record_generation(user.id, content_type)
+    
+    return {
+        'content_id': generated_content.id,
+        'content': content,
+        'type': content_type
+    }
 
 
 @api_view(['POST'])
@@ -167,108 +331,284 @@ def generate_ai_content(request):
             return JsonResponse({'error': 'No extracted text available'}, status=400)
             
         # Check if content exists and regeneration is allowed
-        if not regenerate and content_type in ['summary', 'notes']:
-            existing = GeneratedContent.objects.filter(
-                user=request.user,
-                material=material,
-                content_type=content_type
-            ).first()
+        if not regenerate:
+            existing = _existing_content_response(request.user, material, content_type)
             if existing:
-                return JsonResponse({
-                    'content_id': existing.id,
-                    'content': json.loads(existing.content) if existing.content.startswith('[') or existing.content.startswith('{') else existing.content,
-                    'type': content_type,
-                    'message': 'Using previously generated content'
-                })
+                return JsonResponse(existing)
+
+        # Reuse what was generated for an identical upload, if allowed
+        ai_response = None if regenerate else shared_generation(material, content_type)
 
         # Generate content using AI
-        ai_response = generate_content(material.extracted_text, content_type)
+        if ai_response is None:
+            if not limiter.try_acquire():
+                return saturated_response()
+            try:
+                ai_response = generate_content(retrieval.prompt_text(material, content_type), content_type)
+            finally:
+                limiter.release()
         
         if not ai_response:
             return JsonResponse({'error': 'Failed to generate content'}, status=500)
             
-        # Save or update generated content
-        content_data = {
-            'content': json.dumps(ai_response['content']) if isinstance(ai_response['content'], (list, dict)) else ai_response['content']
-        }
+        return JsonResponse(_save_generated_content(request.user, material, content_type, ai_response))
         
-        generated_content, created = GeneratedContent.objects.update_or_create(
-            user=request.user,
-            material=material,
-            content_type=content_type,
-            defaults=content_data
-        )
-        
-        # If it's a quiz, create quiz records
-        if content_type == 'quiz' and isinstance(ai_response['content'], list):
-            quiz = Quiz.objects.create(
-                user=request.user,
-                material=material,
-                title=f"Quiz: {material.title} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-            )
-            
-            for question_data in ai_response['content']:
-                Question.objects.create(
-                    quiz=quiz,
-                    question_text=question_data.get('question_text', ''),
-                    answer=question_data.get('answer', ''),
-                    options=question_data.get('options', [])
-                )
-            
-            return JsonResponse({
-                'quiz_id': quiz.id,
-                'content': ai_response['content'],  # Return the content for immediate use
-                'message': 'Quiz generated successfully'
-            })
+    except StudyMaterial.DoesNotExist:
+        return JsonResponse({'error': 'Material not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_ai_content_stream(request):
+    """
+    Streaming variant of generate_ai_content: sends the generated text as
+    server-sent events while Gemini produces it.
+
+    Events:
+        delta: {"text": ...}       a piece of generated text; not sent
+                                   for quizzes, whose raw JSON holds
+                                   the answers
+        done:  same data as the generate-content/ response, once the
+               content has been saved
+        error: {"error": ...}
+    """
+    material_id = request.data.get('material_id')
+    content_type = request.data.get('content_type')
+    regenerate = request.data.get('regenerate', False)
+
+    try:
+        material = StudyMaterial.objects.get(id=material_id, user=request.user)
+    except StudyMaterial.DoesNotExist:
+        return JsonResponse({'error': 'Material not found'}, status=404)
+    if not material.extracted_text:
+        return JsonResponse({'error': 'No extracted text available'}, status=400)
+    if content_type not in CONTENT_TYPES:
+        return JsonResponse({'error': 'Invalid content type'}, status=400)
+
+    user = request.user
+
+    def events():
+        try:
+            if not regenerate:
+                existing = _existing_content_response(user, material, content_type)
+                if existing:
+                    yield _sse_event('done', existing)
+                    return
+
+            ai_response = None if regenerate else shared_generation(material, content_type)
+            if ai_response is None:
+                if not limiter.try_acquire():
+                    yield _sse_event('error', {'error': 'Too many generations in progress. Please try again shortly.'})
+                    return
+                try:
+                    for item in stream_content(retrieval.prompt_text(material, content_type), content_type):
+                        if 'delta' in item:
+                            if content_type != 'quiz':
+                                yield _sse_event('delta', {'text': item['delta']})
+                        else:
+                            ai_response = item['result']
+                finally:
+                    limiter.release()
+
+            if not ai_response:
+                yield _sse_event('error', {'error': 'Failed to generate content'})
+                return
+            yield _sse_event('done', _save_generated_content(user, material, content_type, ai_response))
+        except Exception as e:
+            yield _sse_event('error', {'error': str(e)})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_ai_content_batch(request):
+    """
+    Generate several content types for one material in a single request.
+
+    The generations run concurrently. By default all results are saved in
+    one transaction and returned together as {"results": {type: data}}.
+    With "stream": true each result is saved and sent as a server-sent
+    'result' event as soon as it is ready, followed by a 'done' event.
+    Past AI_MAX_CONCURRENT_GENERATIONS the response is a 429, or an 'error'
+    event when streaming.
+    """
+    material_id = request.data.get('material_id')
+    content_types = request.data.get('content_types') or CONTENT_TYPES
+    regenerate = request.data.get('regenerate', False)
+    stream = request.data.get('stream', False)
+
+    if not isinstance(content_types, list) or any(t not in CONTENT_TYPES for t in content_types):
+        return JsonResponse({'error': f"content_types must be a list of {', '.join(CONTENT_TYPES)}"}, status=400)
+    content_types = list(dict.fromkeys(content_types))
+
+    try:
+        material = StudyMaterial.objects.get(id=material_id, user=request.user)
+    except StudyMaterial.DoesNotExist:
+        return JsonResponse({'error': 'Material not found'}, status=404)
+    if not material.extracted_text:
+        return JsonResponse({'error': 'No extracted text available'}, status=400)
+
+    user = request.user
+    ready = {}  # content_type -> response data that needs no generation
+    responses = {}  # content_type -> ai_service result to save
+    for content_type in content_types:
+        if not regenerate:
+            existing = _existing_content_response(user, material, content_type)
+            if existing:
+                ready[content_type] = existing
+                continue
+            shared = shared_generation(material, content_type)
+            if shared:
+                responses[content_type] = shared
+    to_generate = [t for t in content_types if t not in ready and t not in responses]
+
+    def generated():
+        # The slots are taken when generation starts and released in the
+        # same frame, so a stream that is closed before it gets here, or
+        # never read at all, holds none
+        if to_generate and not limiter.try_acquire(len(to_generate)):
+            raise Saturated()
+        try:
+            yield from responses.items()
+            texts = {content_type: retrieval.prompt_text(material, content_type) for content_type in to_generate}
+            yield from iter_generate_many(material.extracted_text, to_generate, texts)
+        finally:
+            if to_generate:
+                limiter.release(len(to_generate))
+
+    if stream:
+        def events():
+            try:
+                for content_type, data in ready.items():
+                    yield _sse_event('result', {'type': content_type, **data})
+                for content_type, ai_response in generated():
+                    if not ai_response:
+                        yield _sse_event('error', {'type': content_type, 'error': 'Failed to generate content'})
+                        continue
+                    data = _save_generated_content(user, material, content_type, ai_response)
+                    yield _sse_event('result', {'type': content_type, **data})
+                yield _sse_event('done', {'material_id': material.id})
+            except Saturated:
+                yield _sse_event('error', {'error': 'Too many generations in progress. Please try again shortly.'})
+            except Exception as e:
+                yield _sse_event('error', {'error': str(e)})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    try:
+        results = dict(generated())
+        output = dict(ready)
+        with transaction.atomic():
+            for content_type, ai_response in results.items():
+                if ai_response:
+                    output[content_type] = _save_generated_content(user, material, content_type, ai_response)
+                else:
+                    output[content_type] = {'error': 'Failed to generate content'}
+    except Saturated:
+        return saturated_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    succeeded = any('error' not in data for data in output.values())
+    return JsonResponse({
+        'material_id': material.id,
+        'results': {t: output[t] for t in content_types},
+    }, status=200 if succeeded else 500)
+
+
+def _jwt_user(request):
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
+
+
+@csrf_exempt
+async def generate_ai_content_async(request):
+    """
+    Async variant of generate_ai_content for ASGI deployments. A pending
+    Gemini call holds no worker thread, so one process can serve hundreds of
+    concurrent generations; past AI_MAX_CONCURRENT_GENERATIONS it answers
+    429 with a Retry-After header.
+
+    DRF views can't be async, so authentication is done here directly.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    user = await sync_to_async(_jwt_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    material_id = data.get('material_id')
+    content_type = data.get('content_type')
+    regenerate = data.get('regenerate', False)
+
+    try:
+        material = await StudyMaterial.objects.aget(id=material_id, user=user)
         
-        # Update user profile stats for other content types
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
-        if content_type == 'summary':
-            profile.summaries_generated += 1
-        elif content_type == 'notes':
-            profile.notes_generated += 1
-        elif content_type == 'flashcards':
-            profile.flashcards_generated += 1
-        profile.save()
-        
-        return JsonResponse({
-            'content_id': generated_content.id,
-            'content': ai_response['content'],
-            'type': content_type
-        })
-        
+        if not material.extracted_text:
+            return JsonResponse({'error': 'No extracted text available'}, status=400)
+
+        if not regenerate:
+            existing = await sync_to_async(_existing_content_response)(user, material, content_type)
+            if existing:
+                return JsonResponse(existing)
+
+        ai_response = None if regenerate else await sync_to_async(shared_generation)(material, content_type)
+
+        if ai_response is None:
+            if not limiter.try_acquire():
+                return saturated_response()
+            try:
+                material_text = await sync_to_async(retrieval.prompt_text)(material, content_type)
+                ai_response = await agenerate_content(material_text, content_type)
+            finally:
+                limiter.release()
+
+        if not ai_response:
+            return JsonResponse({'error': 'Failed to generate content'}, status=500)
+
+        payload = await sync_to_async(_save_generated_content)(user, material, content_type, ai_response)
+        return JsonResponse(payload)
+
     except StudyMaterial.DoesNotExist:
         return JsonResponse({'error': 'Material not found'}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_stats(request):
     """
     Get user statistics for dashboard
     """
-    try:
-        profile = UserProfile.objects.get(user=request.user)
-        return JsonResponse({
-            'uploaded_documents': StudyMaterial.objects.filter(user=request.user).count(),
-            'study_materials': StudyMaterial.objects.filter(user=request.user).count(),
-            'generated_summaries': profile.summaries_generated,
-            'practice_quizzes': profile.quizzes_taken,
-            'flashcards_created': profile.flashcards_generated,
-            'notes_created': profile.notes_generated
-        })
-    except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'uploaded_documents': 0,
-            'study_materials': 0,
-            'generated_summaries': 0,
-            'practice_quizzes': 0,
-            'flashcards_created': 0,
-            'notes_created': 0
-        })
-    
+    counts = stats.snapshot(request.user.id)
+    return JsonResponse({
+        'uploaded_documents': counts['materials_count'],
+        'study_materials': counts['materials_count'],
+        'generated_summaries': counts['summaries_generated'],
+        'practice_quizzes': counts['quizzes_taken'],
+        'flashcards_created': counts['flashcards_generated'],
+        'notes_created': counts['notes_generated']
+    })
 
 
 @api_view(['POST'])
@@ -283,62 +623,36 @@ def submit_quiz_results(request):
         if not quiz:
             return JsonResponse({'error': 'Quiz not found'}, status=404)
             
-        score = request.data.get('score')
-        total_questions = request.data.get('total_questions')
+        # score, total_questions and the answers' correct flags sent by
+        # older clients are ignored; the submission is graded here
         answers = request.data.get('answers', [])
         is_retake = request.data.get('is_retake', False)
         
         # Check if quiz was already completed and this is not a retake
-        existing_result = QuizResult.objects.filter(
-            user=request.user,
-            quiz=quiz,
-            completed=True
-        ).first()
-        
-        if existing_result and not is_retake:
+        if quiz.is_completed and not is_retake:
             return JsonResponse({
                 'error': 'Quiz already completed. Use retake option to try again.',
-                'result_id': existing_result.id
+                'result_id': quiz.latest_result_id
             }, status=400)
         
-        # If it's a retake, mark previous results as not completed
-        if is_retake:
-            QuizResult.objects.filter(
-                user=request.user,
-                quiz=quiz,
-                completed=True
-            ).update(completed=False)
-        
-        # Create new quiz result
-        quiz_result = QuizResult.objects.create(
-            user=request.user,
-            quiz=quiz,
-            score=score,
-            total_questions=total_questions,
-            completed=True
-        )
-        
-        # Create quiz answers
-        for answer in answers:
-            try:
-                question = Question.objects.get(id=answer['questionId'], quiz=quiz)
-                QuizAnswer.objects.create(
-                    quiz_result=quiz_result,
-                    question=question,
-                    selected_option=answer['selected'],
-                    is_correct=answer['correct']
-                )
-            except Question.DoesNotExist:
-                continue
-        
-        # Update user profile
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
-        profile.quizzes_taken += 1
-        profile.save()
+        # Validates the payload; raises InvalidQuizPayload (a ValueError)
+        quiz_result, graded = save_result(request.user, quiz, answers, is_retake)
+        correct_answers = dict(quiz.questions.values_list('id', 'answer'))
         
         return JsonResponse({
             'result_id': quiz_result.id,
+            'score': quiz_result.score,
+            'total_questions': quiz_result.total_questions,
             'percentage': quiz_result.percentage(),
+            'answers': [
+                {
+                    'questionId': question_id,
+                    'selected': selected,
+                    'correct': is_correct,
+                    'answer': correct_answers[question_id],
+                }
+                for question_id, selected, is_correct in graded
+            ],
             'message': 'Quiz results saved successfully'
         })
         
@@ -368,11 +682,7 @@ def retake_quiz(request, quiz_id):
         quiz = Quiz.objects.get(id=quiz_id, user=request.user)
         
         # Mark previous result as not completed (for history)
-        QuizResult.objects.filter(
-            user=request.user,
-            quiz=quiz,
-            completed=True
-        ).update(completed=False)
+        reset_for_retake(request.user, quiz)
         
         return JsonResponse({
             'message': 'Quiz reset for retaking',
@@ -382,6 +692,30 @@ def retake_quiz(request, quiz_id):
         return JsonResponse({'error': 'Quiz not found'}, status=404)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def correct_question_answer(request, pk):
+    """
+    Fix the correct answer of a question of one of the user's quizzes and
+    re-grade every submission that answered it
+    """
+    answer = request.data.get('answer')
+    if not isinstance(answer, str) or not answer.strip():
+        return JsonResponse({'error': 'answer is required'}, status=400)
+    try:
+        question = Question.objects.get(id=pk, quiz__user=request.user)
+    except Question.DoesNotExist:
+        return JsonResponse({'error': 'Question not found'}, status=404)
+
+    answers_changed, results_changed = correct_answer(question, answer)
+    return JsonResponse({
+        'question_id': question.id,
+        'answer': question.answer,
+        'answers_regraded': answers_changed,
+        'results_regraded': results_changed,
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_quiz_details(request, pk):
@@ -390,7 +724,8 @@ def get_quiz_details(request, pk):
         questions = Question.objects.filter(quiz=quiz)
         
         quiz_serializer = QuizSerializer(quiz)
-        question_serializer = QuestionSerializer(questions, many=True)
+        # Answers are not sent; submissions are graded by the server
+        question_serializer = QuizQuestionSerializer(questions, many=True)
         
         return JsonResponse({
             'quiz': quiz_serializer.data,
@@ -441,4 +776,16 @@ class GeneratedContentDetailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return GeneratedContent.objects.filter(user=self.request.user)
\ No newline at end of file
+        return GeneratedContent.objects.filter(user=self.request.user)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_ai_cache_stats(request):
+    """
+    Hit/miss/eviction counters of the generated-content cache, and the
+    tokens saved by retrieval and compression across all generated content
+    """
+    data = llm_cache.stats()
+    data['tokens'] = GeneratedContent.objects.aggregate(original=Sum('original_tokens'), sent=Sum('sent_tokens'))
+    return JsonResponse(data)